@@ -0,0 +1,193 @@
+"""
+《亞洲人生存大挑戰》即時累計統計與排行榜
+
+每場遊戲結束（main 設好 end_flag）時呼叫 record_run 增量更新，
+不需要重掃存檔：
+- 勝 / 敗場數、通關率
+- 每一關的死亡次數
+- 最終 HP 分布（固定寬度 bucket 的串流直方圖，可估分位數）
+- 依最終 HP 排序的前 K 名排行榜（min-heap）
+
+所有查詢都只看固定大小的計數器或大小為 K 的 heap，
+跟累積了幾場遊戲無關。
+"""
+
+import heapq
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+MAX_STAGE = 7
+LEADERBOARD_SIZE = 10
+
+# HP 直方圖：0～HP_HIST_MAX，每 HP_BUCKET_WIDTH 一格，超過的算最後一格
+HP_BUCKET_WIDTH = 5
+HP_HIST_MAX = 200
+HP_BUCKETS = HP_HIST_MAX // HP_BUCKET_WIDTH + 1
+
+
+class AggregateStats:
+    """累計統計本體，可序列化成 JSON 持久化"""
+
+    def __init__(self, top_k: int = LEADERBOARD_SIZE):
+        self.top_k = top_k
+        self.total_runs = 0
+        self.wins = 0
+        self.losses = 0
+        self.stage_deaths = [0] * (MAX_STAGE + 1)   # index = 關卡編號
+        self.hp_hist = [0] * HP_BUCKETS
+        self._heap: List[list] = []                 # [hp, seq, 資訊]
+        self._lock = threading.Lock()
+
+    # ---- 更新 ----
+
+    def record_run(self, state: Dict[str, Any]):
+        hp = max(0, int(state.get("hp", 0)))
+        end_flag = state.get("end_flag")
+        logs = state.get("logs", [])
+
+        with self._lock:
+            self.total_runs += 1
+            if end_flag == "win":
+                self.wins += 1
+            elif end_flag == "lose":
+                self.losses += 1
+                stage = int(logs[-1].get("turn", 0)) if logs else 0
+                if 0 < stage <= MAX_STAGE:
+                    self.stage_deaths[stage] += 1
+
+            self.hp_hist[min(hp // HP_BUCKET_WIDTH, HP_BUCKETS - 1)] += 1
+
+            entry = [hp, self.total_runs, {
+                "hp": hp,
+                "end_flag": end_flag,
+                "world_seed": state.get("world_seed"),
+                "stages": len(logs),
+                "time": int(time.time()),
+            }]
+            if len(self._heap) < self.top_k:
+                heapq.heappush(self._heap, entry)
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+
+    def merge(self, other: "AggregateStats"):
+        """把另一份統計（例如另一個 worker 行程的）併進來"""
+        data = other.to_dict()
+        with self._lock:
+            base = self.total_runs
+            self.total_runs += data["total_runs"]
+            self.wins += data["wins"]
+            self.losses += data["losses"]
+            self.stage_deaths = [a + b for a, b in zip(self.stage_deaths, data["stage_deaths"])]
+            self.hp_hist = [a + b for a, b in zip(self.hp_hist, data["hp_hist"])]
+            for hp, seq, info in data["leaderboard"]:
+                # 序號往後平移，兩邊的序號才不會撞在一起
+                entry = [hp, base + seq, info]
+                if len(self._heap) < self.top_k:
+                    heapq.heappush(self._heap, entry)
+                elif entry[:2] > self._heap[0][:2]:
+                    heapq.heapreplace(self._heap, entry)
+
+    # ---- 查詢 ----
+
+    def win_rate(self) -> float:
+        finished = self.wins + self.losses
+        return self.wins / finished if finished else 0.0
+
+    def deadliest_stage(self) -> Optional[int]:
+        best = max(range(1, MAX_STAGE + 1), key=lambda s: self.stage_deaths[s])
+        return best if self.stage_deaths[best] else None
+
+    def hp_quantile(self, q: float) -> Optional[int]:
+        """由直方圖估計最終 HP 的分位數（回傳該 bucket 的下界）"""
+        with self._lock:
+            total, hist = self.total_runs, list(self.hp_hist)
+        if not total:
+            return None
+        target = q * (total - 1)
+        seen = 0
+        for idx, count in enumerate(hist):
+            seen += count
+            if seen > target:
+                return idx * HP_BUCKET_WIDTH
+        return (HP_BUCKETS - 1) * HP_BUCKET_WIDTH
+
+    def leaderboard(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ranked = sorted(self._heap, key=lambda e: (e[0], e[1]), reverse=True)
+        return [e[2] for e in ranked]
+
+    # ---- 持久化 ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "top_k": self.top_k,
+                "total_runs": self.total_runs,
+                "wins": self.wins,
+                "losses": self.losses,
+                "stage_deaths": list(self.stage_deaths),
+                "hp_bucket_width": HP_BUCKET_WIDTH,
+                "hp_hist": list(self.hp_hist),
+                "leaderboard": [list(e) for e in self._heap],
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AggregateStats":
+        stats = cls(top_k=int(data.get("top_k", LEADERBOARD_SIZE)))
+        stats.total_runs = int(data.get("total_runs", 0))
+        stats.wins = int(data.get("wins", 0))
+        stats.losses = int(data.get("losses", 0))
+        deaths = list(data.get("stage_deaths", []))[:MAX_STAGE + 1]
+        stats.stage_deaths[:len(deaths)] = deaths
+        if data.get("hp_bucket_width") == HP_BUCKET_WIDTH:
+            hist = list(data.get("hp_hist", []))[:HP_BUCKETS]
+            stats.hp_hist[:len(hist)] = hist
+        stats._heap = [list(e) for e in data.get("leaderboard", [])]
+        heapq.heapify(stats._heap)
+        return stats
+
+
+def load_stats(path: pathlib.Path) -> AggregateStats:
+    path = pathlib.Path(path)
+    if not path.exists():
+        return AggregateStats()
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return AggregateStats.from_dict(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"[警告] 累計統計檔讀取失敗，重新開始累計。錯誤：{e}")
+        return AggregateStats()
+
+
+def save_stats(stats: AggregateStats, path: pathlib.Path):
+    path = pathlib.Path(path)
+    # 暫存檔名帶行程 / 執行緒編號，多個 session 同時存檔也不會互相踩到
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(stats.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def print_stats(stats: AggregateStats):
+    print("===== 累計戰績 =====")
+    print(f"總場數：{stats.total_runs}（勝 {stats.wins} / 敗 {stats.losses}）")
+    print(f"通關率：{stats.win_rate():.1%}")
+    deadliest = stats.deadliest_stage()
+    if deadliest:
+        print(f"最致命的關卡：第 {deadliest} 關（{stats.stage_deaths[deadliest]} 人倒下）")
+    median = stats.hp_quantile(0.5)
+    if median is not None:
+        print(f"最終 HP 中位數：約 {median}")
+    print("\n===== 最終 HP 排行榜 =====")
+    for rank, entry in enumerate(stats.leaderboard(), start=1):
+        print(f"{rank}. HP {entry['hp']}（{entry['end_flag']}，seed {entry['world_seed']}）")
+
+
+if __name__ == "__main__":
+    import sys
+    target = sys.argv[1] if len(sys.argv) > 1 else "lab2.2_output/aggregates.json"
+    print_stats(load_stats(target))
@@ -0,0 +1,366 @@
+"""
+《亞洲人生存大挑戰》存檔的欄式分析工具
+
+把大量存檔的 logs 攤平成一欄一檔的 NumPy 陣列（raw binary + meta.json），
+之後用 np.memmap 直接對應進記憶體做向量化的 group-by：
+- 玩家都死在哪一關
+- 哪些 tag 最常出現
+- 每一關的 HP 走勢（平均、分位數）
+
+可以一直 append 新的存檔，不用每次重建。meta.json 記著匯入過哪些檔案
+（單一存檔記內容的 sha1，.asar 彙整檔記已匯入的快照數），同一批檔案重複 ingest 不會重複計算，
+彙整檔後來 append 的快照也只會補匯入新的那幾份。需要 numpy（pip install numpy）。
+
+用法：
+  python analytics.py ingest <store 目錄> <存檔 / 資料夾...>
+  python analytics.py report <store 目錄>
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import sys
+from typing import Dict, Any, List, Iterable, Iterator, Tuple
+
+import numpy as np
+
+import save_format
+
+STORE_VERSION = 1
+
+# 每筆 log 一列
+ROW_COLUMNS = {
+    "run_id": np.int64,
+    "turn": np.int8,
+    "stage_id": np.int8,
+    "hp_change": np.int32,
+    "hp_after": np.int32,
+    "tag_id": np.int32,
+    "difficulty": np.int8,     # -1：該關沒有難度
+    "is_correct": np.int8,     # -1：該關沒有對錯
+    "answer_style": np.int8,   # -1：該關沒有回答風格
+}
+
+# 每場遊戲一列
+RUN_COLUMNS = {
+    "run_hp": np.int32,
+    "run_turns": np.int8,
+    "run_end_flag": np.int8,   # 0：未結束、1：win、2：lose
+    "run_world_seed": np.int64,
+}
+
+DIFFICULTIES = ["low", "medium", "high", "extreme"]
+ANSWER_STYLES = ["balanced", "bragging", "too_humble", "defensive", "refuse", "other"]
+STAGE_NUMERALS = "一二三四五六七"
+MAX_STAGE = len(STAGE_NUMERALS)
+
+
+def stage_id_of(entry: Dict[str, Any]) -> int:
+    """由「第X關：…」解析關卡編號，解析不了就退回 turn"""
+    stage = str(entry.get("stage", ""))
+    if len(stage) >= 2 and stage[0] == "第" and stage[1] in STAGE_NUMERALS:
+        return STAGE_NUMERALS.index(stage[1]) + 1
+    return int(entry.get("turn", 0))
+
+
+def _code(value, table: List[str]) -> int:
+    return table.index(value) if value in table else -1
+
+
+def _is_save_file(path: pathlib.Path) -> bool:
+    return path.suffix in (".asav", ".asar") or (path.suffix == ".json" and path.name.startswith("save_"))
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[pathlib.Path]:
+    """把參數裡的資料夾展開成其中的存檔（save_*.json、.asav、.asar）"""
+    for p in paths:
+        p = pathlib.Path(p)
+        if p.is_dir():
+            yield from sorted(f for f in p.rglob("*") if _is_save_file(f))
+        else:
+            yield p
+
+
+def iter_states(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """支援 save_*.json、.asav 快照、.asar 彙整檔，或包含這些檔案的資料夾"""
+    for p in iter_files(paths):
+        if p.suffix == ".asar":
+            with save_format.SaveArchive(p) as archive:
+                for view in archive:
+                    yield view.to_state()
+        else:
+            yield save_format.load_any(p)
+
+
+def _file_digest(path: pathlib.Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ColumnStore:
+    """一欄一檔的 append-only 欄式儲存，meta.json 裡的列數才是真正的長度"""
+
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+        self.meta_path = self.root / "meta.json"
+        if self.meta_path.exists():
+            with self.meta_path.open("r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta.get("version") != STORE_VERSION:
+                raise ValueError(f"不支援的 store 版本：{self.meta.get('version')}")
+        else:
+            self.meta = {"version": STORE_VERSION, "n_rows": 0, "n_runs": 0, "tags": []}
+        # 絕對路徑 → {"sha1": ...}（單一存檔）或 {"runs": 已匯入的快照數}（.asar）
+        self.meta.setdefault("sources", {})
+        self._tag_ids = {t: i for i, t in enumerate(self.meta["tags"])}
+        self._cache: Dict[str, np.ndarray] = {}
+
+    # ---- 寫入 ----
+
+    def _column_path(self, name: str) -> pathlib.Path:
+        return self.root / f"{name}.bin"
+
+    def _tag_id(self, tag: str) -> int:
+        if tag not in self._tag_ids:
+            self._tag_ids[tag] = len(self.meta["tags"])
+            self.meta["tags"].append(tag)
+        return self._tag_ids[tag]
+
+    def _truncate_to_meta(self, columns: Dict[str, Any], n: int):
+        """上次寫到一半就中斷的話，把多出來的尾巴切掉"""
+        for name, dtype in columns.items():
+            path = self._column_path(name)
+            size = n * np.dtype(dtype).itemsize
+            if path.exists() and path.stat().st_size != size:
+                with path.open("r+b") as f:
+                    f.truncate(size)
+
+    def append_states(self, states: Iterable[Dict[str, Any]], batch_size: int = 10000) -> int:
+        """把多場遊戲的 logs 轉成欄位並 append，回傳新增的場數"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._truncate_to_meta(ROW_COLUMNS, self.meta["n_rows"])
+        self._truncate_to_meta(RUN_COLUMNS, self.meta["n_runs"])
+
+        added = 0
+        rows = {name: [] for name in ROW_COLUMNS}
+        runs = {name: [] for name in RUN_COLUMNS}
+        for state in states:
+            run_id = self.meta["n_runs"] + len(runs["run_hp"])
+            for entry in state.get("logs", []):
+                rows["run_id"].append(run_id)
+                rows["turn"].append(int(entry.get("turn", 0)))
+                rows["stage_id"].append(stage_id_of(entry))
+                rows["hp_change"].append(int(entry.get("hp_change", 0)))
+                rows["hp_after"].append(int(entry.get("hp_after", 0)))
+                rows["tag_id"].append(self._tag_id(str(entry.get("tag", ""))))
+                rows["difficulty"].append(_code(entry.get("difficulty"), DIFFICULTIES))
+                correct = entry.get("is_correct")
+                rows["is_correct"].append(-1 if correct is None else int(bool(correct)))
+                rows["answer_style"].append(_code(entry.get("answer_style"), ANSWER_STYLES))
+            runs["run_hp"].append(int(state.get("hp", 0)))
+            runs["run_turns"].append(len(state.get("logs", [])))
+            runs["run_end_flag"].append(
+                save_format.END_FLAG_CODES.get(state.get("end_flag"), 0)
+            )
+            runs["run_world_seed"].append(int(state.get("world_seed", 0)))
+            added += 1
+            if len(runs["run_hp"]) >= batch_size:
+                self._flush(rows, runs)
+        self._flush(rows, runs)
+        return added
+
+    def ingest(self, paths: Iterable[str], batch_size: int = 10000) -> Tuple[int, int]:
+        """
+        依檔案匯入，回傳（新增場數, 略過的檔案數）。
+        匯入過、內容沒變的檔案略過；.asar 只匯入上次之後 append 的快照；讀不了的檔案印警告後略過。
+        每一場交出去之前先更新來源紀錄（.asar 記到這一份為止的快照數），
+        所以任何一次 _flush 寫進 meta.json 的來源紀錄，對應的資料一定在同一次或更早的 _flush 裡。
+        """
+        sources = self.meta["sources"]
+        skipped = 0
+
+        def states() -> Iterator[Dict[str, Any]]:
+            nonlocal skipped
+            for path in iter_files(paths):
+                key = str(path.resolve())
+                seen = sources.get(key) or {}
+                try:
+                    if path.suffix == ".asar":
+                        with save_format.SaveArchive(path) as archive:
+                            total, done = len(archive), seen.get("runs", 0)
+                            if total <= done:
+                                skipped += 1
+                                continue
+                            for idx in range(done, total):
+                                state = archive[idx].to_state()
+                                sources[key] = {"runs": idx + 1}
+                                yield state
+                    else:
+                        digest = _file_digest(path)
+                        if seen.get("sha1") == digest:
+                            skipped += 1
+                            continue
+                        state = save_format.load_any(path)
+                        sources[key] = {"sha1": digest}
+                        yield state
+                except (OSError, ValueError) as e:
+                    print(f"[警告] 略過無法讀取的存檔 {path}：{e}")
+                    skipped += 1
+
+        added = self.append_states(states(), batch_size)
+        return added, skipped
+
+    def _flush(self, rows: Dict[str, list], runs: Dict[str, list]):
+        n_new_runs = len(runs["run_hp"])
+        if not n_new_runs:
+            return
+        n_new_rows = len(rows["run_id"])
+        for columns, buffers in ((ROW_COLUMNS, rows), (RUN_COLUMNS, runs)):
+            for name, dtype in columns.items():
+                with self._column_path(name).open("ab") as f:
+                    f.write(np.asarray(buffers[name], dtype=dtype).tobytes())
+                buffers[name].clear()
+        self.meta["n_rows"] += n_new_rows
+        self.meta["n_runs"] += n_new_runs
+        self._write_meta()
+        self._cache.clear()
+
+    def _write_meta(self):
+        tmp = self.meta_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+
+    # ---- 讀取 ----
+
+    def column(self, name: str) -> np.ndarray:
+        """以 memmap 取得唯讀欄位"""
+        if name not in self._cache:
+            if name in ROW_COLUMNS:
+                dtype, n = ROW_COLUMNS[name], self.meta["n_rows"]
+            else:
+                dtype, n = RUN_COLUMNS[name], self.meta["n_runs"]
+            if n == 0:
+                arr = np.zeros(0, dtype=dtype)
+            else:
+                arr = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(n,))
+            self._cache[name] = arr
+        return self._cache[name]
+
+    @property
+    def tags(self) -> List[str]:
+        return self.meta["tags"]
+
+
+# ======== 向量化查詢 ========
+
+def group_count(keys: np.ndarray, minlength: int = 0) -> np.ndarray:
+    keys = keys[keys >= 0]
+    return np.bincount(keys.astype(np.int64), minlength=minlength)
+
+
+def group_mean(keys: np.ndarray, values: np.ndarray, minlength: int = 0) -> np.ndarray:
+    keys = keys.astype(np.int64)
+    counts = np.bincount(keys, minlength=minlength)
+    sums = np.bincount(keys, weights=values, minlength=minlength)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def group_quantiles(keys: np.ndarray, values: np.ndarray,
+                    qs: Tuple[float, ...], minlength: int = 0) -> np.ndarray:
+    """
+    每組的分位數（nearest-rank）。一次 lexsort 排好 (key, value)，
+    再用每組的起點與長度算出索引，不需要逐組迴圈。
+    回傳形狀 (組數, len(qs))，空組為 nan。
+    """
+    keys = keys.astype(np.int64)
+    order = np.lexsort((values, keys))
+    sorted_values = np.asarray(values)[order]
+    counts = np.bincount(keys, minlength=minlength)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    q = np.asarray(qs, dtype=np.float64)
+    idx = starts[:, None] + np.floor(q[None, :] * np.maximum(counts - 1, 0)[:, None]).astype(np.int64)
+    out = np.full((len(counts), len(q)), np.nan)
+    has = counts > 0
+    out[has] = sorted_values[idx[has]]
+    return out
+
+
+def death_counts_by_stage(store: ColumnStore) -> np.ndarray:
+    """每一關的死亡次數（index = 關卡編號）"""
+    stage = store.column("stage_id")
+    dead = store.column("hp_after") <= 0
+    return group_count(stage[dead], minlength=MAX_STAGE + 1)
+
+
+def top_tags(store: ColumnStore, top: int = 10) -> List[Tuple[str, int]]:
+    counts = group_count(store.column("tag_id"), minlength=len(store.tags))
+    order = np.argsort(counts)[::-1][:top]
+    return [(store.tags[i], int(counts[i])) for i in order if counts[i] > 0]
+
+
+def hp_trajectory(store: ColumnStore,
+                  qs: Tuple[float, ...] = (0.1, 0.5, 0.9)) -> Dict[str, np.ndarray]:
+    """每一關結束時 hp_after 的筆數、平均與分位數"""
+    stage = store.column("stage_id")
+    hp = store.column("hp_after")
+    return {
+        "count": group_count(stage, minlength=MAX_STAGE + 1),
+        "mean": group_mean(stage, hp, minlength=MAX_STAGE + 1),
+        "quantiles": group_quantiles(stage, hp, qs, minlength=MAX_STAGE + 1),
+        "qs": np.asarray(qs),
+    }
+
+
+def win_rate(store: ColumnStore) -> float:
+    flags = store.column("run_end_flag")
+    finished = np.count_nonzero(flags > 0)
+    return float(np.count_nonzero(flags == 1) / finished) if finished else 0.0
+
+
+def print_report(store: ColumnStore):
+    print(f"共 {store.meta['n_runs']} 場、{store.meta['n_rows']} 筆關卡紀錄")
+    print(f"通關率：{win_rate(store):.1%}\n")
+
+    print("===== 死亡關卡分布 =====")
+    deaths = death_counts_by_stage(store)
+    for stage in range(1, MAX_STAGE + 1):
+        print(f"第{STAGE_NUMERALS[stage - 1]}關：{int(deaths[stage])}")
+
+    print("\n===== 最常見的 tag =====")
+    for tag, count in top_tags(store):
+        print(f"{tag}: {count}")
+
+    print("\n===== 各關 HP 走勢 =====")
+    traj = hp_trajectory(store)
+    header = " / ".join(f"p{int(q * 100)}" for q in traj["qs"])
+    print(f"關卡  筆數  平均  {header}")
+    for stage in range(1, MAX_STAGE + 1):
+        if not traj["count"][stage]:
+            continue
+        qs = " / ".join(f"{v:.0f}" for v in traj["quantiles"][stage])
+        print(f"第{STAGE_NUMERALS[stage - 1]}關  {int(traj['count'][stage])}  "
+              f"{traj['mean'][stage]:.1f}  {qs}")
+
+
+def _cli(argv: List[str]) -> int:
+    if len(argv) >= 3 and argv[0] == "ingest":
+        store = ColumnStore(argv[1])
+        added, skipped = store.ingest(argv[2:])
+        print(f"[系統] 新增 {added} 場（略過 {skipped} 個已匯入或讀不了的檔案），"
+              f"store 內共 {store.meta['n_runs']} 場。")
+    elif len(argv) == 2 and argv[0] == "report":
+        print_report(ColumnStore(argv[1]))
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_cli(sys.argv[1:]))
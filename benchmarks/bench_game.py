@@ -0,0 +1,328 @@
+"""
+關卡函式與 LLM 層的基準測試
+
+用行程內的決定性假 LLM（MockLLM，不睡、不連網）加上預先寫好的玩家輸入，
+量每一輪的純程式開銷：
+- play_stage_1 ～ play_stage_7
+- parse_llm_json（乾淨 / 前後有雜訊 / 壞掉的輸出）與 call_llm_json
+- check_kinship_correct、classify_major_and_score
+- save_state（JSON 與二進位快照）
+
+每項回報 ops/sec、p50 / p99 延遲，以及 tracemalloc 量到的單次配置峰值；
+再和 baseline.json 比較，p50 慢超過門檻就算退步（結束碼 1）。
+
+不同機器（甚至同一台機器不同時刻）的絕對時間差很多，所以每一項量完之前都先跑一次
+固定的參考小基準（_reference：JSON 編解碼、字串與 dict 操作，和遊戲程式的開銷組成類似），
+baseline 存的是各項 p50 ÷ 緊鄰的參考 p50 的比值，比較時也用比值，換台機器照樣能比。
+每項重複量 --repeat 輪（每輪各自配一次參考），取比值的中位數，偶發的排程雜訊不會單獨造成退步；
+門檻依項目分（THRESHOLDS）：關卡與存檔會碰檔案系統、執行緒，抖動比純 CPU 的項目大，門檻也放寬。
+關卡項目每次呼叫前都換一份空的 NOTE_LIBRARY / RESPONSE_CACHE（不計時），量的時間不會隨快取越長越大而漂移。
+
+用法：
+  python benchmarks/bench_game.py [-n 次數] [--repeat 3] [--only stage] [--threshold 0.25]
+  python benchmarks/bench_game.py --save-baseline      # 重新產生 baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import game  # noqa: E402
+import note_library  # noqa: E402
+import response_cache  # noqa: E402
+import session_io  # noqa: E402
+from mock_llm import MockLLM  # noqa: E402
+
+BASELINE_PATH = pathlib.Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+# 名稱前綴 → 門檻；沒列到的用 DEFAULT_THRESHOLD
+THRESHOLDS = {
+    "stage_": 0.5,
+    "save_state_": 0.5,
+}
+DEFAULT_REPEAT = 3
+REFERENCE_SAMPLES = 200
+WARMUP = 5
+ALLOC_SAMPLES = 20
+MIN_SAMPLE_NS = 50_000     # 幾 µs 的項目每個樣本連跑多次，湊到至少這麼久再除回單次
+
+
+# ======== 待測項目 ========
+
+STAGE_INPUTS = {
+    1: ["male"],
+    2: ["醫學系"],
+    3: ["1"],
+    4: ["2"],
+    5: ["2"],
+    6: ["還好啦"],
+    7: ["舅媽"],
+}
+STAGE_FUNCS = {
+    1: "play_stage_1_birth",
+    2: "play_stage_2_major",
+    3: "play_stage_3_job",
+    4: "play_stage_4_marriage",
+    5: "play_stage_5_children",
+    6: "play_stage_6_newyear",
+    7: "play_stage_7_kinship",
+}
+
+CLEAN_JSON = json.dumps({"result": "結果敘述" * 20, "note": "你不是成績單附屬品。"}, ensure_ascii=False)
+NOISY_JSON = "好的，以下是結果：\n```json\n" + CLEAN_JSON + "\n```\n希望你喜歡！"
+BROKEN_JSON = "好的，以下是結果：{\"result\": \"寫到一半就斷掉"
+MAJORS = ["國立台灣大學醫學系", "資訊工程學系", "企業管理學系", "哲學系", "海洋生物與太空考古學程"]
+
+
+def _quiet(fn: Callable, inputs: List[str] = ()) -> Callable[[], Any]:
+    """把 print / input 導到假的 stdin / stdout，量測時不會被終端機輸出拖慢"""
+    def run():
+        with session_io.bind(session_io.ScriptedInput(inputs), io.StringIO()):
+            return fn()
+    return run
+
+
+def _fresh_shared_caches():
+    """換上空的跨場次筆記庫與回應快取（路徑相對於暫存工作目錄，檔案不存在就從空的開始）"""
+    game.NOTE_LIBRARY = note_library.NoteLibrary(game.NOTE_LIBRARY.path)
+    game.RESPONSE_CACHE = response_cache.ResponseCache(game.RESPONSE_CACHE.path)
+
+
+def _stage_case(turn: int) -> Callable[[], Any]:
+    stage_fn = getattr(game, STAGE_FUNCS[turn])
+
+    def run():
+        state = game.init_game_state(seed=None)
+        state["turn"] = turn
+        return stage_fn(state)
+    case = _quiet(run, STAGE_INPUTS[turn])
+    case.reset = _fresh_shared_caches
+    return case
+
+
+def _parse_broken():
+    try:
+        game.parse_llm_json(BROKEN_JSON)
+    except ValueError:
+        return None
+    raise AssertionError("壞掉的 JSON 居然解析成功了")
+
+
+def _save_case(fmt: str) -> Callable[[], Any]:
+    state = game.init_game_state(seed=42)
+    state["notes"] = [f"第 {i} 則人生小筆記" for i in range(7)]
+    state["logs"] = [{"turn": i, "stage": f"第{i}關", "choice": "選項", "hp_change": -5,
+                      "hp_after": 100 - 5 * i, "tag": "tag", "result": "結果敘述" * 30}
+                     for i in range(1, 8)]
+
+    def run():
+        game.SAVE_FORMAT = fmt
+        game.save_state(state)
+    return _quiet(run)
+
+
+_REFERENCE_DATA = {"title": "科技業工程師", "description": "薪水高但爆肝。" * 8, "hidden_hp": 10,
+                   "tags": [f"tag_{i}" for i in range(16)]}
+
+
+def _reference():
+    """只用標準函式庫的固定工作量，用來把各項時間換算成跟機器無關的比值"""
+    total = 0
+    for i in range(5):
+        raw = json.dumps(dict(_REFERENCE_DATA, hidden_hp=i), ensure_ascii=False)
+        data = json.loads(raw)
+        words = {tag: len(tag) + i for tag in data["tags"]}
+        total += sum(words.values()) + len(data["description"].replace("爆肝", "").strip())
+    return total
+
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    cases = {f"stage_{turn}": _stage_case(turn) for turn in STAGE_FUNCS}
+    cases.update({
+        "parse_json_clean": lambda: game.parse_llm_json(CLEAN_JSON),
+        "parse_json_noisy": lambda: game.parse_llm_json(NOISY_JSON),
+        "parse_json_broken": _parse_broken,
+        "call_llm_json": lambda: game.call_llm_json(game.JOB_SYSTEM_PROMPT, game.JOB_USER_PROMPT),
+        "check_kinship_correct": lambda: [game.check_kinship_correct(a, ["舅媽", "舅母"])
+                                          for a in ("舅媽", "舅 母", "阿姨", "")],
+        "classify_major_and_score": _quiet(lambda: [game.classify_major_and_score(m) for m in MAJORS]),
+        "save_state_json": _save_case("json"),
+        "save_state_binary": _save_case("binary"),
+    })
+    return cases
+
+
+# ======== 量測 ========
+
+def measure(fn: Callable[[], Any], n: int) -> Dict[str, float]:
+    """
+    fn 若帶 reset 屬性，每次呼叫前先跑一次 reset（不計時、也不計配置）。
+    沒有 reset 的項目，一次太短就每個樣本連跑 inner 次再除回單次，計時器解析度與排程雜訊才不會蓋過本體。
+    """
+    reset = getattr(fn, "reset", None)
+    warm_ns = []
+    for _ in range(WARMUP):
+        if reset:
+            reset()
+        t0 = time.perf_counter_ns()
+        fn()
+        warm_ns.append(time.perf_counter_ns() - t0)
+    inner = 1 if reset else max(1, MIN_SAMPLE_NS // max(1, min(warm_ns)))
+    samples = []
+    for _ in range(n):
+        if reset:
+            reset()
+        t0 = time.perf_counter_ns()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter_ns() - t0) / inner)
+    samples.sort()
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(n, ALLOC_SAMPLES)):
+        if reset:
+            reset()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    total_s = sum(samples) / 1e9   # 換算成單次呼叫的總時間
+    return {
+        "ops_per_sec": round(n / total_s, 1) if total_s else 0.0,
+        "p50_us": round(samples[len(samples) // 2] / 1000, 1),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000, 1),
+        "alloc_peak_kib": round(statistics.median(peaks) / 1024, 1),
+    }
+
+
+def reference_p50() -> float:
+    """參考小基準的 p50（µs），不量配置"""
+    for _ in range(WARMUP):
+        _reference()
+    samples = []
+    for _ in range(REFERENCE_SAMPLES):
+        t0 = time.perf_counter_ns()
+        _reference()
+        samples.append(time.perf_counter_ns() - t0)
+    samples.sort()
+    return samples[len(samples) // 2] / 1000
+
+
+def measure_repeated(fn: Callable[[], Any], n: int, repeat: int) -> Tuple[Dict[str, float], float]:
+    """量 repeat 輪，每輪前先量一次參考；回傳 p50 比值居中那一輪的結果與比值"""
+    rounds = []
+    for _ in range(max(1, repeat)):
+        reference_us = reference_p50()
+        res = measure(fn, n)
+        rounds.append((res["p50_us"] / reference_us, res))
+    rounds.sort(key=lambda r: r[0])
+    ratio, res = rounds[len(rounds) // 2]
+    return res, round(ratio, 4)
+
+
+def threshold_for(name: str, override: float = None) -> float:
+    if override is not None:
+        return override
+    for prefix, threshold in THRESHOLDS.items():
+        if name.startswith(prefix):
+            return threshold
+    return DEFAULT_THRESHOLD
+
+
+def compare(ratios: Dict[str, float], baseline: Dict[str, float],
+            threshold: float = None) -> List[Tuple[str, float, float]]:
+    """回傳（相對於參考項的）p50 比 baseline 慢超過各自門檻的項目、倍數與門檻；threshold 給了就全部用它"""
+    regressions = []
+    for name, ratio in ratios.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        slowdown = ratio / base
+        limit = threshold_for(name, threshold)
+        if slowdown > 1 + limit:
+            regressions.append((name, slowdown, limit))
+    return regressions
+
+
+def setup_environment(workdir: pathlib.Path):
+    """
+    所有輸出寫到暫存資料夾；LLM 換成 MockLLM；推測式旁白額度給足、全部同時跑，量測期間行為不會中途改變；
+    關掉微批次（它的時間窗是睡掉的牆鐘時間，不是程式開銷，而且不跟著機器快慢縮放）
+    """
+    os.chdir(workdir)
+    game.LLM_BACKEND = MockLLM()
+    game.MICRO_BATCH_ENABLED = False
+    game.SPECULATOR = game.OutcomeSpeculator(game.SPECULATIVE_WIDTH, 10 ** 9, parallel=game.SPECULATIVE_WIDTH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="關卡與 LLM 層基準測試")
+    parser.add_argument("-n", type=int, default=200, help="每項量測次數")
+    parser.add_argument("--only", help="只跑名稱包含這個字串的項目")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每項重複幾輪、取中位數")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="p50 比 baseline 慢超過這個比例就算退步（不給就用各項目的 THRESHOLDS）")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="把這次結果存成新的 baseline")
+    args = parser.parse_args()
+
+    baseline_path = pathlib.Path(args.baseline).resolve()
+    baseline = {}
+    if baseline_path.exists():
+        with baseline_path.open("r", encoding="utf-8") as f:
+            baseline = json.load(f).get("relative", {})
+
+    results, ratios = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        setup_environment(pathlib.Path(tmp))
+        try:
+            for name, fn in build_cases().items():
+                if args.only and args.only not in name:
+                    continue
+                results[name], ratios[name] = measure_repeated(fn, args.n, args.repeat)
+                res, base = results[name], baseline.get(name)
+                delta = ""
+                if base:
+                    delta = f"  ({ratios[name] / base - 1:+.0%} vs baseline)"
+                print(f"{name:<26} {res['ops_per_sec']:>10.1f} ops/s  p50 {res['p50_us']:>9.1f} µs  "
+                      f"p99 {res['p99_us']:>9.1f} µs  alloc {res['alloc_peak_kib']:>7.1f} KiB{delta}")
+        finally:
+            os.chdir(cwd)
+
+    if args.save_baseline:
+        # results 的絕對時間只留著參考，比較只看 relative
+        with baseline_path.open("w", encoding="utf-8") as f:
+            json.dump({"time": int(time.time()), "python": sys.version.split()[0], "n": args.n,
+                       "repeat": args.repeat,
+                       "relative": ratios,
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n[系統] baseline 已更新：{baseline_path}")
+        return
+
+    regressions = compare(ratios, baseline, args.threshold)
+    if regressions:
+        print("\n[警告] 以下項目的 p50 比 baseline 慢超過門檻：")
+        for name, ratio, limit in regressions:
+            print(f"  {name}：{ratio:.2f} 倍（門檻 {limit:.0%}）")
+        sys.exit(1)
+    if baseline:
+        print("\n[系統] 沒有項目比 baseline 慢超過門檻。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+冷啟動基準測試
+
+量兩個數字（各跑 N 次，每次都是全新的 Python 行程）：
+- import：`import game` 花多久
+- first_render：從啟動 game.main() 到印出開場標題花多久
+  （API Key 由環境變數提供，不會卡在輸入提示）
+
+用法：
+  python benchmarks/bench_startup.py [-n 次數] [--record 歷史檔.jsonl]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+BANNER = "《亞洲人生存大挑戰》"
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    env.setdefault("OPENAI_API_KEY", "sk-bench-startup")
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def time_import() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import game"], env=_env(), check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_first_render(workdir: pathlib.Path) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import game; game.main()"],
+        env=_env(), cwd=workdir,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, encoding="utf-8",
+    )
+    try:
+        for line in proc.stdout:
+            if BANNER in line:
+                return time.perf_counter() - start
+        raise RuntimeError("沒有看到開場標題，game.main() 可能提早結束了。")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def summarize(samples) -> dict:
+    ordered = sorted(samples)
+    return {
+        "min_ms": round(ordered[0] * 1000, 1),
+        "median_ms": round(statistics.median(ordered) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="game.py 冷啟動基準測試")
+    parser.add_argument("-n", type=int, default=10, help="重複次數")
+    parser.add_argument("--record", help="把結果 append 到這個 JSONL 歷史檔")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = pathlib.Path(tmp)
+        result = {
+            "time": int(time.time()),
+            "python": sys.version.split()[0],
+            "import": summarize([time_import() for _ in range(args.n)]),
+            "first_render": summarize([time_first_render(workdir) for _ in range(args.n)]),
+        }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
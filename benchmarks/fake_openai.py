@@ -0,0 +1,179 @@
+"""
+本機的假 chat-completions API（壓力測試用）
+
+POST /v1/chat/completions（或 /chat/completions）回傳與 OpenAI 相同格式的回應，
+內容由 mock_llm.MockLLM 依 system prompt 產生，各關要的 JSON 都是合法的。
+可設定：
+- 延遲分布：fixed / uniform / lognormal（中位數 + sigma），另可加長尾機率
+- 錯誤率：依比例回 500 或 429
+用 ThreadingHTTPServer，每個請求一條執行緒，延遲用 sleep 模擬，不佔 CPU。
+
+用法：
+  python benchmarks/fake_openai.py [--port 8765] [--latency-ms 800] [--dist lognormal]
+                                   [--sigma 0.5] [--error-rate 0.01] [--rate-limit 0.0]
+遊戲端把 openai.api_base 設成 http://127.0.0.1:<port>/v1 即可。
+"""
+
+import argparse
+import json
+import pathlib
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from mock_llm import MockLLM  # noqa: E402
+
+
+class FakeConfig:
+    def __init__(self, latency_ms: float = 800.0, dist: str = "lognormal", sigma: float = 0.5,
+                 tail_prob: float = 0.0, tail_ms: float = 5000.0,
+                 error_rate: float = 0.0, rate_limit: float = 0.0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.dist = dist
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """回傳這次要睡幾秒"""
+        with self._lock:
+            if self.tail_prob and self._rng.random() < self.tail_prob:
+                return self.tail_ms / 1000
+            if self.dist == "fixed":
+                ms = self.latency_ms
+            elif self.dist == "uniform":
+                ms = self._rng.uniform(0, 2 * self.latency_ms)
+            else:
+                # lognormal 的中位數 = exp(mu)，直接拿 latency_ms 當中位數
+                ms = self.latency_ms * self._rng.lognormvariate(0, self.sigma)
+            return max(0.0, ms) / 1000
+
+    def sample_error(self) -> int:
+        """0 = 正常回應，否則回傳要回的 HTTP 狀態碼"""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit:
+            return 429
+        if roll < self.rate_limit + self.error_rate:
+            return 500
+        return 0
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096   # 一次湧進上千個連線時不要被 listen backlog 擋掉
+
+    def __init__(self, address, config: FakeConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.mock = MockLLM()
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key: str, delta: int = 1):
+        with self.stats_lock:
+            self.stats[key] += delta
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive，壓測時不必每次重開 TCP
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server: FakeOpenAIServer = self.server
+        server._count("requests")
+        server._count("in_flight")
+        try:
+            time.sleep(server.config.sample_latency())
+            status = server.config.sample_error()
+            if status:
+                server._count("errors")
+                self._send_json(status, {"error": {"message": "fake error", "type": "server_error"}})
+                return
+            messages = request.get("messages", [])
+            system_prompt = messages[0]["content"] if messages else ""
+            user_prompt = messages[1]["content"] if len(messages) > 1 else ""
+            content = server.mock.content(system_prompt, user_prompt)
+            self._send_json(200, {
+                "id": f"chatcmpl-fake-{server.stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(system_prompt) + len(user_prompt),
+                          "completion_tokens": len(content),
+                          "total_tokens": len(system_prompt) + len(user_prompt) + len(content)},
+            })
+        finally:
+            server._count("in_flight", -1)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(config: FakeConfig, port: int = 0, host: str = "127.0.0.1") -> FakeOpenAIServer:
+    """在背景執行緒啟動；port=0 讓系統挑一個空的 port（看 server.server_address）"""
+    server = FakeOpenAIServer((host, port), config)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def add_config_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="延遲中位數（毫秒）")
+    parser.add_argument("--dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal 的 sigma")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="長尾延遲的機率")
+    parser.add_argument("--tail-ms", type=float, default=5000.0, help="長尾延遲（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回 500 的比例")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="回 429 的比例")
+    parser.add_argument("--seed", type=int, help="延遲與錯誤的亂數 seed")
+
+
+def config_from_args(args) -> FakeConfig:
+    return FakeConfig(args.latency_ms, args.dist, args.sigma, args.tail_prob, args.tail_ms,
+                      args.error_rate, args.rate_limit, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機假 chat-completions API")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(("127.0.0.1", args.port), config_from_args(args))
+    print(f"[系統] 假 OpenAI API：http://127.0.0.1:{args.port}/v1（Ctrl+C 結束）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[系統] 共 {server.stats['requests']} 個請求，錯誤 {server.stats['errors']}，"
+              f"同時最多 {server.stats['max_in_flight']} 個")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+壓力測試：本機假 OpenAI API + 合成玩家
+
+啟動 fake_openai.py 的假 chat-completions 伺服器，再讓一批合成玩家同時跑完整七關
+（game.run_session，每位玩家一條執行緒，輸入 / 輸出經 session_io 分開）。
+玩家每次作答前會「思考」一段時間（think-time 模型），量到的每關延遲
+是「玩家送出答案 → 遊戲要下一個輸入」之間的時間，不含思考時間。
+
+併發數依 --ramp 逐級往上加，每一級回報：
+- 每關延遲 p50 / p95 / p99、完成場次、失敗場次
+- 吞吐量（場 / 秒、關 / 秒）與假伺服器同時在處理的最大請求數
+吞吐量不再跟著併發數成長、或 p99 比上一級暴增時，標記為飽和點。
+
+用法：
+  python benchmarks/loadtest.py [--ramp 10,50,100,200] [--games 1]
+        [--think exp --think-ms 2000] [--latency-ms 800 --dist lognormal --error-rate 0.01]
+        [--use-openai] [--json 結果.json] [--profile 剖析資料夾] [--female-ratio 0]
+預設透過內建的 HTTP 後端（game.LLM_BACKEND）打假伺服器；--use-openai 改成讓
+openai 套件本身連過去（openai.api_base 指向假伺服器），連 openai 的那一層一起量。
+--profile 會在整段壓測期間開啟 profiling.py 的配置 / CPU 剖析，結束時寫出報表。
+合成玩家預設都選 male：female 開局就 -10000 HP，第一關就結束，會讓每關延遲與吞吐量失真；
+想量「一開局就結束」的短場次，用 --female-ratio 指定這類玩家的比例。
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import game  # noqa: E402
+import profiling  # noqa: E402
+import session_io  # noqa: E402
+import fake_openai  # noqa: E402
+
+DEFAULT_RAMP = "10,50,100,200"
+SATURATION_GAIN = 0.10      # 併發數加倍、吞吐量卻成長不到 10% 就算飽和
+SATURATION_P99_JUMP = 2.0   # 或 p99 比上一級多出兩倍以上
+
+MAJORS = ["醫學系", "資訊工程", "企業管理", "法律系", "哲學系", "音樂系", "海洋科學", "歷史系"]
+NEWYEAR_ANSWERS = ["還好啦", "就普通", "還在努力中", "不方便說", "很好啊超棒", "我很爛啦"]
+KINSHIP_ANSWERS = ["舅媽", "阿姨", "嬸嬸", "姑丈", "不知道"]
+
+
+class HttpChatBackend:
+    """最小的 chat-completions HTTP 客戶端，每條執行緒一條 keep-alive 連線"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def __call__(self, model: str, messages: List[Dict[str, str]], temperature: float, **kwargs):
+        body = json.dumps({"model": model, "messages": messages, "temperature": temperature})
+        conn = self._conn()
+        try:
+            conn.request("POST", self.path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if resp.status != 200:
+            raise RuntimeError(f"假 API 回應 HTTP {resp.status}")
+        return json.loads(payload)
+
+
+class ThinkTime:
+    """玩家每次作答前的思考時間（秒）"""
+
+    def __init__(self, model: str, mean_ms: float, rng: random.Random):
+        self.model = model
+        self.mean_s = mean_ms / 1000
+        self.rng = rng
+
+    def sample(self) -> float:
+        if self.model == "none" or self.mean_s <= 0:
+            return 0.0
+        if self.model == "fixed":
+            return self.mean_s
+        if self.model == "lognormal":
+            return self.mean_s * self.rng.lognormvariate(0, 0.6)
+        return self.rng.expovariate(1 / self.mean_s)
+
+
+class Recorder:
+    def __init__(self):
+        self.turn_latencies: List[float] = []
+        self.sessions_ok = 0
+        self.sessions_failed = 0
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def turn(self, seconds: float):
+        with self._lock:
+            self.turn_latencies.append(seconds)
+
+    def session(self, error: Optional[str]):
+        with self._lock:
+            if error is None:
+                self.sessions_ok += 1
+            else:
+                self.sessions_failed += 1
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+
+class PlayerInput:
+    """合成玩家的 stdin：遊戲要輸入時，先記下上一關花了多久，再思考一下才作答"""
+
+    def __init__(self, lines: List[str], think: ThinkTime, recorder: Recorder):
+        self._lines = iter(lines)
+        self._think = think
+        self._recorder = recorder
+        self.last_answer = time.perf_counter()
+
+    def readline(self, *args):
+        self._recorder.turn(time.perf_counter() - self.last_answer)
+        time.sleep(self._think.sample())
+        try:
+            line = next(self._lines)
+        except StopIteration:
+            line = ""
+        self.last_answer = time.perf_counter()
+        return line + "\n" if line else ""
+
+
+def player_script(rng: random.Random, female_ratio: float = 0.0) -> List[str]:
+    return [
+        "female" if rng.random() < female_ratio else "male",
+        rng.choice(MAJORS),
+        rng.choice("123"),
+        rng.choice("123"),
+        rng.choice("123"),
+        rng.choice(NEWYEAR_ANSWERS),
+        rng.choice(KINSHIP_ANSWERS),
+    ]
+
+
+def play(player_id: str, games: int, think_model: str, think_ms: float,
+         recorder: Recorder, seed: int, female_ratio: float = 0.0):
+    rng = random.Random(seed)
+    think = ThinkTime(think_model, think_ms, rng)
+    for g in range(games):
+        stdin = PlayerInput(player_script(rng, female_ratio), think, recorder)
+        error = None
+        try:
+            with session_io.bind(stdin, io.StringIO()):
+                game.run_session(session_id=f"{player_id}_{g}")
+            # 最後一個輸入之後到遊戲結束（回顧、存檔）也算一關
+            recorder.turn(time.perf_counter() - stdin.last_answer)
+        except Exception as e:
+            error = type(e).__name__
+        recorder.session(error)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_level(concurrency: int, games: int, think_model: str, think_ms: float,
+              server: fake_openai.FakeOpenAIServer, seed: int,
+              female_ratio: float = 0.0) -> Dict[str, Any]:
+    recorder = Recorder()
+    with server.stats_lock:
+        server.stats["max_in_flight"] = 0
+        requests_before = server.stats["requests"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="player") as executor:
+        for i in range(concurrency):
+            executor.submit(play, f"c{concurrency}p{i}", games, think_model, think_ms,
+                            recorder, seed * 100003 + i, female_ratio)
+    elapsed = time.perf_counter() - start
+
+    lat = sorted(recorder.turn_latencies)
+    return {
+        "concurrency": concurrency,
+        "sessions_ok": recorder.sessions_ok,
+        "sessions_failed": recorder.sessions_failed,
+        "errors": recorder.errors,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(recorder.sessions_ok / elapsed, 2),
+        "turns_per_s": round(len(lat) / elapsed, 2),
+        "turn_p50_ms": round(percentile(lat, 0.50) * 1000, 1),
+        "turn_p95_ms": round(percentile(lat, 0.95) * 1000, 1),
+        "turn_p99_ms": round(percentile(lat, 0.99) * 1000, 1),
+        "turn_max_ms": round((lat[-1] if lat else 0.0) * 1000, 1),
+        "llm_requests": server.stats["requests"] - requests_before,
+        "llm_max_in_flight": server.stats["max_in_flight"],
+    }
+
+
+def find_saturation(levels: List[Dict[str, Any]]) -> Optional[int]:
+    for prev, cur in zip(levels, levels[1:]):
+        load_gain = cur["concurrency"] / prev["concurrency"] - 1
+        tput_gain = cur["turns_per_s"] / prev["turns_per_s"] - 1 if prev["turns_per_s"] else 0
+        if load_gain > 0 and tput_gain < SATURATION_GAIN * load_gain:
+            return cur["concurrency"]
+        if prev["turn_p99_ms"] and cur["turn_p99_ms"] > SATURATION_P99_JUMP * prev["turn_p99_ms"]:
+            return cur["concurrency"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成玩家壓力測試")
+    parser.add_argument("--ramp", default=DEFAULT_RAMP, help="逐級的併發玩家數，逗號分隔")
+    parser.add_argument("--games", type=int, default=1, help="每位玩家連續玩幾場")
+    parser.add_argument("--think", choices=["none", "fixed", "exp", "lognormal"], default="exp")
+    parser.add_argument("--think-ms", type=float, default=2000.0, help="平均思考時間（毫秒）")
+    parser.add_argument("--use-openai", action="store_true", help="透過 openai 套件連假伺服器")
+    parser.add_argument("--workdir", help="遊戲輸出資料夾（預設用暫存資料夾，跑完刪掉）")
+    parser.add_argument("--json", help="把每一級的結果寫成 JSON")
+    parser.add_argument("--profile", help="壓測期間開啟配置 / CPU 剖析，報表寫到這個資料夾")
+    parser.add_argument("--female-ratio", type=float, default=0.0,
+                        help="選 female（第一關就結束）的玩家比例，預設 0")
+    fake_openai.add_config_args(parser)
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.ramp.split(",") if x.strip()]
+    # 上千條玩家執行緒大多在 sleep，堆疊給小一點
+    threading.stack_size(512 * 1024)
+    server = fake_openai.start_server(fake_openai.config_from_args(args))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    if args.use_openai:
+        client = game.get_openai()
+        client.api_key = "sk-loadtest"
+        client.api_base = base_url
+    else:
+        game.LLM_BACKEND = HttpChatBackend(base_url)
+    session_io.install()
+
+    tmp = None
+    workdir = args.workdir
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory()
+        workdir = tmp.name
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    if args.profile:
+        profiling.start(pathlib.Path(cwd) / args.profile)
+    try:
+        print(f"{'併發':>6} {'成功':>6} {'失敗':>5} {'場/秒':>8} {'關/秒':>8} "
+              f"{'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'LLM 最大併發':>12}")
+        for level in levels:
+            res = run_level(level, args.games, args.think, args.think_ms, server,
+                            seed=args.seed or 0, female_ratio=args.female_ratio)
+            results.append(res)
+            print(f"{res['concurrency']:>6} {res['sessions_ok']:>6} {res['sessions_failed']:>5} "
+                  f"{res['sessions_per_s']:>8.2f} {res['turns_per_s']:>8.2f} {res['turn_p50_ms']:>9.1f} "
+                  f"{res['turn_p95_ms']:>9.1f} {res['turn_p99_ms']:>9.1f} {res['llm_max_in_flight']:>12}")
+            if res["errors"]:
+                print(f"       失敗原因：{res['errors']}")
+    finally:
+        profiling.stop()
+        os.chdir(cwd)
+        server.shutdown()
+        if tmp is not None:
+            tmp.cleanup()
+
+    saturation = find_saturation(results)
+    if saturation:
+        print(f"\n[系統] 飽和點：約在 {saturation} 位併發玩家（吞吐量不再成長或 p99 暴增）。")
+    else:
+        print("\n[系統] 在測試範圍內還沒看到飽和。")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": results, "saturation": saturation},
+                      f, ensure_ascii=False, indent=2)
+        print(f"[系統] 結果已寫到：{args.json}")
+
+
+if __name__ == "__main__":
+    main()
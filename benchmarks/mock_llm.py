@@ -0,0 +1,63 @@
+"""
+決定性的假 LLM（基準測試與壓力測試共用）
+
+依 system prompt 認出是哪一種生成（工作、對象、過年題、稱謂題、科系、語氣判斷、旁白、回顧），
+回傳格式正確的固定內容。可以直接當 game.LLM_BACKEND，
+也可以只拿 content() 給 fake_openai.py 的 HTTP 假伺服器用。
+"""
+
+import json
+from typing import Dict, List
+
+import game
+
+class MockLLM:
+    """依 system prompt 回傳固定內容，格式與 openai.ChatCompletion.create 相同"""
+
+    def __init__(self):
+        self.calls = 0
+        self._by_prompt = {
+            game.JOB_SYSTEM_PROMPT: {"jobs": [
+                {"title": "科技業工程師", "description": "薪水高但爆肝。", "hidden_hp": 10, "tag": "job_high_pay"},
+                {"title": "基層公務員", "description": "穩定規律。", "hidden_hp": 5, "tag": "job_stable"},
+                {"title": "獨立接案", "description": "自由但不穩定。", "hidden_hp": -20, "tag": "job_low_status"},
+            ]},
+            game.PARTNER_SYSTEM_PROMPT: {"partners": [
+                {"title": "家世很好的人", "description": "雙方家庭壓力大。", "hidden_hp": 5, "tag": "partner_family_approved"},
+                {"title": "個性很好的人", "description": "長輩不反對。", "hidden_hp": 0, "tag": "partner_balanced"},
+                {"title": "自由靈魂", "description": "長輩很擔心。", "hidden_hp": -15, "tag": "partner_unconventional"},
+            ]},
+            game.NEWYEAR_SYSTEM_PROMPT: {"question": "現在薪水多少啊？", "difficulty": "medium"},
+            game.KINSHIP_SYSTEM_PROMPT: {"question": "媽媽的哥哥的太太要怎麼稱呼？",
+                                         "difficulty": "medium", "answers": ["舅媽"]},
+            game.MAJOR_FALLBACK_SYSTEM_PROMPT: {"tier": "mid"},
+        }
+        self._text_by_prompt = {
+            game.OUTCOME_SYSTEM_PROMPT: json.dumps({"result": "你在眾人的目光裡做出選擇，日子照樣往前走。",
+                                                    "note": "不是我不行，是世界太難搞。"}, ensure_ascii=False),
+            game.RECAP_SYSTEM_PROMPT: ("第X關，你在眾人的期待裡選了自己的路，心裡有點忐忑，"
+                                       "但筆記說得好：不是我不行，是世界太難搞。"),
+        }
+
+    def content(self, system_prompt: str, user_prompt: str) -> str:
+        data = self._by_prompt.get(system_prompt)
+        if data is not None:
+            return json.dumps(data, ensure_ascii=False)
+        text = self._text_by_prompt.get(system_prompt)
+        if text is not None:
+            return text
+        if "語氣分析器" in system_prompt:
+            if game.BATCH_INSTRUCTION in system_prompt:
+                n = user_prompt.count("【第 ")
+                return json.dumps({"results": [{"answer_style": "balanced"}] * n})
+            return json.dumps({"answer_style": "balanced"})
+        # 最終回顧（prompt 寫在 generate_review 裡）和其他沒認出來的都回一段純文字
+        return "這一關你撐過去了，雖然有點狼狽，但很像你。"
+
+    def __call__(self, model: str, messages: List[Dict[str, str]], temperature: float, **kwargs):
+        self.calls += 1
+        content = self.content(messages[0]["content"], messages[1]["content"])
+        return {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(messages[1]["content"]), "completion_tokens": len(content)},
+        }
@@ -0,0 +1,257 @@
+"""
+預先生成內容的儲存區
+
+離線批次（見 pregen.py）產生的工作清單、結婚對象、過年拷問題、親戚稱謂題，
+驗證後存成 <root>/<kind>.jsonl，每行一筆：
+    {"id": "...", "kind": "...", "difficulty": "...", "data": {...}}
+
+遊戲執行時各關先從這裡挑一筆，挑不到才現場呼叫 LLM。
+索引：kind → 清單、(kind, difficulty) → 清單、id → 去重。
+
+多行程部署（見 supervisor.py）時，先用 export_pool 把整個 store 匯出成一個
+唯讀的 pool 檔，各 worker 用 MmapContentPool 以 mmap 開啟：內容本體只存在
+OS 的 page cache 一份，各行程共用，挑到哪一筆才解碼哪一筆。
+"""
+
+import copy
+import hashlib
+import json
+import mmap
+import pathlib
+import random
+import struct
+import threading
+from typing import Dict, Any, List, Optional
+
+KINDS = ("jobs", "partners", "newyear", "kinship")
+
+
+def content_id(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class ContentStore:
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+        self._ids: Dict[str, set] = {}
+        self._by_difficulty: Dict[str, Dict[str, List[int]]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str) -> pathlib.Path:
+        return self.root / f"{kind}.jsonl"
+
+    def _index(self, kind: str, record: Dict[str, Any]):
+        items = self._items[kind]
+        self._ids[kind].add(record["id"])
+        if record.get("difficulty"):
+            self._by_difficulty[kind].setdefault(record["difficulty"], []).append(len(items))
+        items.append(record)
+
+    def _ensure_loaded(self, kind: str):
+        if kind in self._items:
+            return
+        with self._lock:
+            if kind in self._items:
+                return
+            self._items[kind] = []
+            self._ids[kind] = set()
+            self._by_difficulty[kind] = {}
+            path = self._path(kind)
+            if not path.exists():
+                return
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 寫到一半的最後一行
+                    if record.get("id") not in self._ids[kind]:
+                        self._index(kind, record)
+
+    def add(self, kind: str, data: Dict[str, Any]) -> bool:
+        """新增一筆已驗證的內容，重複的會略過；回傳是否真的新增"""
+        if kind not in KINDS:
+            raise ValueError(f"不認得的內容種類：{kind}")
+        self._ensure_loaded(kind)
+        record = {
+            "id": content_id(data),
+            "kind": kind,
+            "difficulty": data.get("difficulty"),
+            "data": data,
+        }
+        with self._lock:
+            if record["id"] in self._ids[kind]:
+                return False
+            self.root.mkdir(parents=True, exist_ok=True)
+            with self._path(kind).open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._index(kind, record)
+        return True
+
+    def count(self, kind: str) -> int:
+        self._ensure_loaded(kind)
+        return len(self._items[kind])
+
+    def items(self, kind: str) -> List[Dict[str, Any]]:
+        self._ensure_loaded(kind)
+        return [r["data"] for r in self._items[kind]]
+
+    def records(self, kind: str) -> List[Dict[str, Any]]:
+        """含 difficulty 的完整紀錄（匯出 pool 用）"""
+        self._ensure_loaded(kind)
+        return list(self._items[kind])
+
+    def pick(self, kind: str,
+             rng: Optional[random.Random] = None,
+             difficulty: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """隨機挑一筆（回傳副本，呼叫端可以放心修改）；沒有就回傳 None"""
+        self._ensure_loaded(kind)
+        rng = rng or random
+        items = self._items[kind]
+        if difficulty is not None:
+            idxs = self._by_difficulty[kind].get(difficulty, [])
+            if not idxs:
+                return None
+            record = items[rng.choice(idxs)]
+        else:
+            if not items:
+                return None
+            record = rng.choice(items)
+        return copy.deepcopy(record["data"])
+
+
+# ======== mmap 共用內容池 ========
+#
+# 檔案格式：
+#   header  <4sBxxxI>：magic "ACPL"、版本、meta 長度
+#   meta    JSON：{"kinds": {kind: {"count": n, "table": offset}}, "difficulties": [...]}
+#   table   每個 kind 一張，每筆 <IIH2x>：內容 offset、長度、difficulty 編號（0 = 無）
+#   records 每筆內容的 data（UTF-8 JSON）
+# meta 裡的 table offset 與 table 裡的內容 offset 都是從 meta 結尾起算。
+
+POOL_MAGIC = b"ACPL"
+POOL_VERSION = 1
+POOL_HEADER = struct.Struct("<4sBxxxI")
+POOL_ENTRY = struct.Struct("<IIH2x")
+
+
+def pool_bytes(store) -> (bytes, Dict[str, int]):
+    """把 store（ContentStore 或 MmapContentPool）的所有內容編成 pool 格式；回傳 (內容, 各 kind 的筆數)"""
+    difficulties: List[str] = []
+    blobs = bytearray()
+    rows: Dict[str, List[tuple]] = {}
+    for kind in KINDS:
+        rows[kind] = []
+        for record in store.records(kind):
+            raw = json.dumps(record["data"], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            code = 0
+            if record.get("difficulty"):
+                if record["difficulty"] not in difficulties:
+                    difficulties.append(record["difficulty"])
+                code = difficulties.index(record["difficulty"]) + 1
+            rows[kind].append((len(blobs), len(raw), code))
+            blobs += raw
+
+    tables = bytearray()
+    kinds_meta = {}
+    records_base = POOL_ENTRY.size * sum(len(r) for r in rows.values())
+    for kind, kind_rows in rows.items():
+        kinds_meta[kind] = {"count": len(kind_rows), "table": len(tables)}
+        for rel, length, code in kind_rows:
+            tables += POOL_ENTRY.pack(records_base + rel, length, code)
+    meta_raw = json.dumps({"kinds": kinds_meta, "difficulties": difficulties},
+                          ensure_ascii=False).encode("utf-8")
+    data = POOL_HEADER.pack(POOL_MAGIC, POOL_VERSION, len(meta_raw)) + meta_raw + bytes(tables) + bytes(blobs)
+    return data, {kind: len(kind_rows) for kind, kind_rows in rows.items()}
+
+
+def export_pool(store: ContentStore, path: pathlib.Path) -> Dict[str, int]:
+    """把 store 的所有內容匯出成 pool 檔；回傳各 kind 的筆數"""
+    path = pathlib.Path(path)
+    data, counts = pool_bytes(store)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+    tmp.replace(path)
+    return counts
+
+
+class MmapContentPool:
+    """
+    唯讀的 mmap 內容池，介面與 ContentStore 的 count / items / pick 相同，
+    可以直接拿來替換 game.CONTENT_STORE。
+    offset 不為 0 時，pool 是嵌在別的檔案裡的一段（例如 snapshot.py 的暖快取快照）。
+    """
+
+    def __init__(self, path: pathlib.Path, offset: int = 0):
+        self.path = pathlib.Path(path)
+        self._file = self.path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = POOL_HEADER.unpack_from(self._mm, offset)
+        if magic != POOL_MAGIC or version != POOL_VERSION:
+            raise ValueError(f"不是可用的內容池檔案：{self.path}")
+        meta_start = offset + POOL_HEADER.size
+        self._base = meta_start + meta_len
+        meta = json.loads(self._mm[meta_start:self._base].decode("utf-8"))
+        self._kinds: Dict[str, Dict[str, int]] = meta["kinds"]
+        self._difficulties: List[str] = meta["difficulties"]
+        self._by_difficulty: Dict[str, Dict[str, List[int]]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, kind: str, idx: int) -> tuple:
+        return POOL_ENTRY.unpack_from(
+            self._mm, self._base + self._kinds[kind]["table"] + idx * POOL_ENTRY.size
+        )
+
+    def _decode(self, kind: str, idx: int) -> Dict[str, Any]:
+        offset, length, _ = self._entry(kind, idx)
+        start = self._base + offset
+        return json.loads(self._mm[start:start + length].decode("utf-8"))
+
+    def _difficulty_index(self, kind: str) -> Dict[str, List[int]]:
+        index = self._by_difficulty.get(kind)
+        if index is None:
+            with self._lock:
+                index = {}
+                for idx in range(self.count(kind)):
+                    code = self._entry(kind, idx)[2]
+                    if code:
+                        index.setdefault(self._difficulties[code - 1], []).append(idx)
+                self._by_difficulty[kind] = index
+        return index
+
+    def count(self, kind: str) -> int:
+        return self._kinds.get(kind, {}).get("count", 0)
+
+    def items(self, kind: str) -> List[Dict[str, Any]]:
+        return [self._decode(kind, idx) for idx in range(self.count(kind))]
+
+    def records(self, kind: str) -> List[Dict[str, Any]]:
+        return [{"data": self._decode(kind, idx),
+                 "difficulty": self._difficulties[code - 1] if code else None}
+                for idx, code in ((i, self._entry(kind, i)[2]) for i in range(self.count(kind)))]
+
+    def pick(self, kind: str,
+             rng: Optional[random.Random] = None,
+             difficulty: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """隨機挑一筆（每次都是新解碼出來的物件，呼叫端可以放心修改）；沒有就回傳 None"""
+        rng = rng or random
+        if difficulty is not None:
+            idxs = self._difficulty_index(kind).get(difficulty, [])
+            if not idxs:
+                return None
+            return self._decode(kind, rng.choice(idxs))
+        n = self.count(kind)
+        if not n:
+            return None
+        return self._decode(kind, rng.randrange(n))
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
@@ -18,13 +18,28 @@
 - 撐過七關且 HP > 0 → 視為通關。
 """
 
+import hashlib
 import json
+import os
+import random
 import time
 import pathlib
-from typing import Dict, Any, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List
 import re
 
-import openai  # 請先 pip install openai
+import aggregates
+import content_store
+import llm_cache
+import major_matcher
+import metrics
+import note_library
+import profiling
+import response_cache
+import save_format
+import snapshot
+import tracing
 
 # ======== 基本設定 ========
 
@@ -48,6 +63,55 @@ STATE_DIR = OUTPUT_DIR / "state"
 STATE_PATH = STATE_DIR / "save_1.json"
 SUMMARY_PATH = OUTPUT_DIR / "summary_1.txt"
 
+# 存檔格式："json"（預設，好讀）或 "binary"（見 save_format.py，可只讀摘要）
+SAVE_FORMAT = "json"
+BINARY_STATE_PATH = STATE_DIR / "save_1.asav"
+AGGREGATES_PATH = OUTPUT_DIR / "aggregates.json"
+
+# 離線預先生成的內容（見 pregen.py）；各關先從這裡挑，沒有才現場呼叫 LLM
+USE_PREGENERATED_CONTENT = True
+CONTENT_DIR = OUTPUT_DIR / "content"
+CONTENT_STORE = content_store.ContentStore(CONTENT_DIR)
+
+# 固定 seed 的遊戲：seed 決定內容池挑哪筆、選項順序、LLM 生成用哪個變體，
+# LLM 結果依 (prompt, seed_key) 快取，同樣 seed + 同樣輸入就整輪從快取重播
+SEED_VARIANTS = 4
+LLM_CACHE = llm_cache.LLMCache(OUTPUT_DIR / "cache" / "llm_cache.jsonl")
+
+# 科系分類表（Aho-Corasick 比對）；查不到的科系交給 LLM 判一次，結果記在 MAJOR_MEMO
+MAJOR_TAXONOMY_PATH = pathlib.Path(__file__).resolve().parent / "major_taxonomy.json"
+MAJOR_LLM_FALLBACK = True
+MAJOR_MEMO = llm_cache.LLMCache(OUTPUT_DIR / "cache" / "major_memo.jsonl")
+
+# 跨場次共用的人生小筆記庫（MinHash/LSH 近似去重）
+NOTE_LIBRARY = note_library.NoteLibrary(OUTPUT_DIR / "notes" / "library.jsonl")
+
+# 判斷型 LLM 呼叫（例如過年回答風格）的回應快取：正規化輸入 + 近似比對 + LFU
+RESPONSE_CACHE = response_cache.ResponseCache(OUTPUT_DIR / "cache" / "response_cache.json")
+
+# 暖快取快照（見 snapshot.py）：啟動時有這個檔、而且 prompt 版本相符就先載入
+WARM_SNAPSHOT_PATH = OUTPUT_DIR / "warm_cache.snap"
+# 改了寫在函式裡的 prompt（最終回顧、回答風格…）時加一，讓舊的快照失效
+PROMPT_TEMPLATE_VERSION = 1
+
+# API Key 來源依序：環境變數 → 設定檔 → 互動輸入
+API_KEY_ENV = "OPENAI_API_KEY"
+CONFIG_PATH = pathlib.Path("game_config.json")
+
+# 邊玩邊在背景寫每關小回顧，最後只做便宜的拼接（關掉就回到一次性 generate_review）
+INCREMENTAL_REVIEW = True
+RECAP_PATH = STATE_DIR / "recaps_1.jsonl"
+
+# 推測式旁白：三選一的關卡一列出選項，就先在背景替選項生成結果
+SPECULATIVE_WIDTH = 3                  # 每關最多先算幾個選項（0 = 關閉）
+SPECULATIVE_PARALLEL = 2               # 每關同時在跑的推測數，比 WIDTH 小，排隊中的才取消得掉
+SPECULATIVE_EXTRA_CALLS_PER_HOUR = 300 # 每小時最多容許幾次「沒被選中」的額外 LLM 呼叫（漏桶式補充）
+
+# 短判斷呼叫的微批次：同一種判斷在時間窗內湊滿幾筆就合併成一次請求
+MICRO_BATCH_ENABLED = True
+MICRO_BATCH_WINDOW_MS = 20
+MICRO_BATCH_MAX_ITEMS = 8
+
 DIFFICULTY_SCORES = {
     "low":     {"correct": 1,  "wrong": -65},
     "medium":  {"correct": 3,  "wrong": -55},
@@ -55,43 +119,235 @@ DIFFICULTY_SCORES = {
     "extreme": {"correct": 7, "wrong": -35},
 }
 
+# ======== 即時指標（GAME_METRICS_PORT 有設才對外開 HTTP） ========
+
+SESSIONS_ACTIVE = metrics.gauge("game_sessions_active", "目前進行中的遊戲場次")
+SESSIONS_IN_STAGE = metrics.gauge("game_sessions_in_stage", "各關卡目前有幾個場次正在進行", ["stage"])
+LLM_IN_FLIGHT = metrics.gauge("game_llm_in_flight", "送出後還沒回來的 LLM 請求數")
+LLM_LATENCY = metrics.histogram("game_llm_latency_seconds", "LLM 請求延遲（依呼叫來源）", ["site"])
+LLM_REQUESTS = metrics.counter("game_llm_requests_total", "LLM 呼叫次數（ok / error / cached）",
+                               ["site", "result"])
+FALLBACK_CONTENT = metrics.counter("game_fallback_content_total",
+                                   "AI 生成失敗、改用寫死預設內容的次數", ["kind"])
+CONTENT_PICKS = metrics.counter("game_pregenerated_picks_total",
+                                "預先生成內容的取用（hit / miss）", ["kind", "result"])
+SAVE_LATENCY = metrics.histogram("game_save_state_seconds", "save_state 寫檔延遲", ["format"],
+                                 buckets=metrics.FAST_BUCKETS)
+metrics.callback(
+    "game_cache_requests_total", "各快取的查詢結果", ["cache", "result"],
+    lambda: {
+        ("llm", "hit"): LLM_CACHE.hits, ("llm", "miss"): LLM_CACHE.misses,
+        ("major_memo", "hit"): MAJOR_MEMO.hits, ("major_memo", "miss"): MAJOR_MEMO.misses,
+        ("response", "hit"): RESPONSE_CACHE.hits, ("response", "near_hit"): RESPONSE_CACHE.near_hits,
+        ("response", "miss"): RESPONSE_CACHE.misses,
+    },
+    kind="counter",
+)
+
+# 可替換的 LLM 後端：None = openai.ChatCompletion.create；
+# 基準測試 / 壓力測試可換成同樣簽名（model, messages, temperature）、回傳同樣格式的 callable
+LLM_BACKEND = None
+
+# 每條執行緒各自一個 requests.Session（cookie 等狀態不共用），底下共用一個連線池；
+# 同時呼叫 LLM 的執行緒（推測式旁白、分關回顧、多 session）超過這個數，多出來的連線用完就關
+LLM_HTTP_POOL_SIZE = 16
+
+# openai 很重，等到第一次真的要呼叫 LLM 才 import（請先 pip install openai）
+_openai = None
+_openai_lock = threading.Lock()
+_api_key = None
+
+
+def get_openai():
+    """延遲載入 openai 模組，並套用已設定好的 API Key"""
+    global _openai
+    if _openai is None:
+        with _openai_lock:
+            if _openai is None:
+                import openai
+                if _api_key:
+                    openai.api_key = _api_key
+                _openai = openai
+    return _openai
+
+
+def load_api_key() -> str:
+    """依序從環境變數、設定檔讀 API Key，都沒有就回傳空字串"""
+    api_key = os.environ.get(API_KEY_ENV, "").strip()
+    if api_key:
+        return api_key
+    if CONFIG_PATH.exists():
+        try:
+            with CONFIG_PATH.open("r", encoding="utf-8") as f:
+                return str(json.load(f).get("openai_api_key", "")).strip()
+        except (OSError, ValueError) as e:
+            print(f"[警告] 設定檔 {CONFIG_PATH} 讀取失敗：{e}")
+    return ""
+
+
 def setup_openai():
-    """啟動程式時詢問 API Key，直接設定給 openai。"""
-    print("請輸入你的 OpenAI API Key：")
-    api_key = input("> ").strip()
+    """設定 API Key：先找環境變數與設定檔，都沒有才詢問玩家。"""
+    global _api_key
+    api_key = load_api_key()
+    if not api_key:
+        print("請輸入你的 OpenAI API Key：")
+        api_key = input("> ").strip()
     if not api_key:
         raise RuntimeError("你沒有輸入 API Key，遊戲還沒開始就先 GG 了。")
-    openai.api_key = api_key
+    _api_key = api_key
+    if _openai is not None:
+        _openai.api_key = api_key
     print("\n✔ API Key 載入成功。來體驗一輪七關版《亞洲人生存大挑戰》吧。\n")
 
 
+def warm_up_llm_backend() -> threading.Thread:
+    """
+    在背景先 import openai，並預先開好一條到 API 的連線放進連線池，
+    讓 main 印開場白的同時把冷啟動成本吃掉。暖機失敗不影響遊戲。
+
+    requests.Session 不保證能跨執行緒共用，所以交給 openai 的是 session 工廠
+    （openai 會替每條執行緒各呼叫一次）：每條執行緒有自己的 Session，
+    但都掛同一個 HTTPAdapter，暖機開好的連線誰先用到都拿得到。
+    """
+    def _warm():
+        try:
+            client = get_openai()
+            import requests
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=LLM_HTTP_POOL_SIZE)
+
+            def new_session() -> requests.Session:
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                return session
+
+            new_session().head(client.api_base, timeout=5)
+            client.requestssession = new_session
+        except Exception:
+            pass
+
+    t = threading.Thread(target=_warm, name="llm-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def prompt_version() -> str:
+    """模型名稱 + 所有 *_PROMPT 常數 + PROMPT_TEMPLATE_VERSION 的雜湊，任何一個改了快照就失效"""
+    prompts = sorted((name, value) for name, value in globals().items()
+                     if name.endswith("_PROMPT") and isinstance(value, str))
+    raw = json.dumps([MODEL_NAME, PROMPT_TEMPLATE_VERSION, prompts], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def export_warm_snapshot(path: pathlib.Path = None) -> Dict[str, int]:
+    """把目前的快取、筆記庫與內容池匯出成暖快取快照；回傳各段筆數"""
+    return snapshot.export_snapshot(
+        path or WARM_SNAPSHOT_PATH, prompt_version(),
+        llm_cache=LLM_CACHE, major_memo=MAJOR_MEMO, response_cache=RESPONSE_CACHE,
+        content=CONTENT_STORE, notes=NOTE_LIBRARY,
+    )
+
+
+def load_warm_snapshot(path: pathlib.Path = None) -> bool:
+    """
+    啟動時載入暖快取快照：LLM 快取與科系記憶直接掛 mmap 當 fallback（不解析），
+    回應快取與筆記庫併進記憶體；本地沒有預先生成的內容時，改用快照裡的內容池。
+    """
+    global CONTENT_STORE
+    path = pathlib.Path(path or WARM_SNAPSHOT_PATH)
+    if not path.exists():
+        return False
+    try:
+        snap = snapshot.WarmSnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"[警告] 暖快取快照讀取失敗，從空的快取開始。錯誤：{e}")
+        return False
+    if snap.prompt_version != prompt_version():
+        print("[系統] 暖快取快照是舊版 prompt 產生的，略過。")
+        snap.close()
+        return False
+
+    LLM_CACHE.fallback = snap.kv("llm_cache")
+    MAJOR_MEMO.fallback = snap.kv("major_memo")
+    RESPONSE_CACHE.seed(snap.json_section("response_cache") or [])
+    NOTE_LIBRARY.seed(snap.notes())
+    if all(CONTENT_STORE.count(kind) == 0 for kind in content_store.KINDS):
+        pool = snap.content_pool()
+        if pool is not None:
+            CONTENT_STORE = pool
+    counts = ", ".join(f"{name} {info['count']}" for name, info in snap.sections.items())
+    print(f"[系統] 已載入暖快取快照（{counts}）。")
+    return True
+
+
 def call_llm(system_prompt: str,
              user_prompt: str,
-             temperature: float = 0.7) -> str:
-
-    resp = openai.ChatCompletion.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=temperature,
-    )
+             temperature: float = 0.7,
+             seed_key: str = None) -> str:
+    """
+    呼叫 LLM 取得純文字回應。
+    有 seed_key（固定 seed 的遊戲）時先查 LLM_CACHE，命中就完全不打 API。
+    """
+    # 往上翻堆疊找來源不便宜，只有追蹤或指標服務開著（有人會看）時才算
+    site = tracing.call_site(LLM_WRAPPER_FUNCS) if tracing.enabled() or metrics.serving() else "?"
+    with tracing.span("llm.call", model=MODEL_NAME, temperature=temperature, site=site) as sp:
+        if tracing.enabled():
+            sp.set(attempt=tracing.inherited("attempt", 1))
+        if seed_key is not None:
+            key = llm_cache.make_key(MODEL_NAME, system_prompt, user_prompt, temperature, seed_key)
+            cached = LLM_CACHE.get(key)
+            if cached is not None:
+                sp.set(cached=True)
+                LLM_REQUESTS.labels(site, "cached").inc()
+                return cached
+            content = _chat_completion(system_prompt, user_prompt, temperature, sp, site)
+            LLM_CACHE.put(key, content)
+            return content
+        return _chat_completion(system_prompt, user_prompt, temperature, sp, site)
+
+
+# 追蹤時往上找呼叫來源要跳過的包裝函式（MicroBatcher.call / _dispatch 也算）
+LLM_WRAPPER_FUNCS = ("call_llm", "call_llm_json", "call_llm_json_batched",
+                     "call", "_dispatch", "ask_ai_once")
+
+
+def _chat_completion(system_prompt: str, user_prompt: str, temperature: float,
+                     sp, site: str) -> str:
+    t0 = time.perf_counter()
+    try:
+        create = LLM_BACKEND if LLM_BACKEND is not None else get_openai().ChatCompletion.create
+        with LLM_IN_FLIGHT.track_inprogress():
+            resp = create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+            )
+    except Exception:
+        LLM_REQUESTS.labels(site, "error").inc()
+        raise
+    finally:
+        LLM_LATENCY.labels(site).observe(time.perf_counter() - t0)
+    LLM_REQUESTS.labels(site, "ok").inc()
+    if tracing.enabled():
+        usage = resp.get("usage") or {}
+        sp.set(prompt_tokens=usage.get("prompt_tokens"),
+               completion_tokens=usage.get("completion_tokens"))
     return resp["choices"][0]["message"]["content"].strip()
 
 
-def call_llm_json(system_prompt: str,
-                  user_prompt: str,
-                  temperature: float = 0.7) -> Dict[str, Any]:
+def parse_llm_json(content: str) -> Dict[str, Any]:
     """
-    呼叫 LLM，要求輸出為 JSON。
+    把 LLM 輸出解析成 JSON。
     若第一次 parse 失敗，嘗試從字串中抓出 JSON 區段再 parse。
     """
-    content = call_llm(system_prompt, user_prompt, temperature)
-
     # 先嘗試直接解析
     try:
-        return json.loads(content)
+        data = json.loads(content)
+        tracing.annotate(parse="clean")
+        return data
     except Exception:
         pass
 
@@ -101,45 +357,233 @@ def call_llm_json(system_prompt: str,
     if start != -1 and end != -1 and end > start:
         try:
             json_str = content[start:end + 1]
-            return json.loads(json_str)
+            data = json.loads(json_str)
+            tracing.annotate(parse="extracted")
+            return data
         except Exception:
             pass
 
+    tracing.annotate(parse="failed")
     raise ValueError(f"無法解析為合法 JSON，請檢查 LLM 輸出：\n{content}")
 
 
+def call_llm_json(system_prompt: str,
+                  user_prompt: str,
+                  temperature: float = 0.7,
+                  seed_key: str = None) -> Dict[str, Any]:
+    """呼叫 LLM，要求輸出為 JSON。"""
+    with tracing.span("llm.json"):
+        content = call_llm(system_prompt, user_prompt, temperature, seed_key=seed_key)
+        return parse_llm_json(content)
+
+
+BATCH_INSTRUCTION = (
+    "\n\n【批次模式】這次會一次給你多筆輸入，以【第 N 筆】分隔。"
+    "請逐筆獨立判斷，每一筆都照上面規定的 JSON 格式作答，"
+    "最後只輸出一個 JSON：{\"results\": [第 1 筆的 JSON, 第 2 筆的 JSON, ...]}，"
+    "數量與順序必須和輸入完全一致。"
+)
+
+
+class _BatchItem:
+    def __init__(self, user_prompt: str):
+        self.user_prompt = user_prompt
+        self.done = threading.Event()
+        self.result = None
+        self.fallback = False
+
 
-def init_game_state() -> Dict[str, Any]:
-    """初始化遊戲狀態"""
+class MicroBatcher:
+    """
+    把多個 session 同時送出的短判斷呼叫（同一個 template_id）合併：
+    - 第一個到的呼叫當 leader，最多等 window 秒或湊滿 max_items 筆
+    - leader 送出一次多筆請求，把 results 依序分回給每個等待中的呼叫
+    - 解析失敗或筆數對不上時，每個呼叫各自退回單筆 call_llm_json
+    - 進行中的 session 不到兩個時沒人可以合併，不等時間窗、直接單筆呼叫
+    """
+
+    def __init__(self, window_s: float, max_items: int,
+                 active_sessions: Callable[[], float] = lambda: 2):
+        self.window_s = window_s
+        self.max_items = max_items
+        self._active_sessions = active_sessions
+        self._cond = threading.Condition()
+        self._groups: Dict[str, Dict[str, Any]] = {}
+
+    def call(self, template_id: str, system_prompt: str, user_prompt: str,
+             temperature: float = 0.7) -> Dict[str, Any]:
+        if self._active_sessions() < 2:
+            return call_llm_json(system_prompt, user_prompt, temperature)
+        item = _BatchItem(user_prompt)
+        with self._cond:
+            group = self._groups.get(template_id)
+            leader = group is None
+            if leader:
+                group = {"system_prompt": system_prompt, "temperature": temperature,
+                         "items": [], "closed": False}
+                self._groups[template_id] = group
+            group["items"].append(item)
+            if len(group["items"]) >= self.max_items:
+                group["closed"] = True
+                del self._groups[template_id]
+                self._cond.notify_all()
+
+            if leader:
+                deadline = time.monotonic() + self.window_s
+                while not group["closed"]:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        group["closed"] = True
+                        del self._groups[template_id]
+                        break
+                    self._cond.wait(remaining)
+
+        if leader:
+            self._dispatch(group)
+        item.done.wait()
+        if item.fallback:
+            return call_llm_json(system_prompt, user_prompt, temperature)
+        return item.result
+
+    def _dispatch(self, group: Dict[str, Any]):
+        items = group["items"]
+        try:
+            if len(items) == 1:
+                items[0].fallback = True
+                return
+            user_prompt = "\n".join(
+                f"【第 {idx} 筆】\n{it.user_prompt.strip()}\n"
+                for idx, it in enumerate(items, start=1)
+            )
+            try:
+                data = call_llm_json(group["system_prompt"] + BATCH_INSTRUCTION,
+                                     user_prompt, group["temperature"])
+                results = data.get("results")
+            except Exception:
+                results = None
+            if (not isinstance(results, list) or len(results) != len(items)
+                    or not all(isinstance(r, dict) for r in results)):
+                for it in items:
+                    it.fallback = True
+                return
+            for it, result in zip(items, results):
+                it.result = result
+        finally:
+            for it in items:
+                it.done.set()
+
+
+MICRO_BATCHER = MicroBatcher(MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX_ITEMS,
+                             active_sessions=SESSIONS_ACTIVE.get)
+
+
+def call_llm_json_batched(template_id: str,
+                          system_prompt: str,
+                          user_prompt: str,
+                          temperature: float = 0.7,
+                          seed_key: str = None) -> Dict[str, Any]:
+    """短的結構化判斷呼叫走微批次；關掉或固定 seed（要走快取）時等同 call_llm_json"""
+    if not MICRO_BATCH_ENABLED or seed_key is not None:
+        return call_llm_json(system_prompt, user_prompt, temperature, seed_key=seed_key)
+    return MICRO_BATCHER.call(template_id, system_prompt, user_prompt, temperature)
+
+
+
+def init_game_state(seed: int = None) -> Dict[str, Any]:
+    """初始化遊戲狀態；有給 seed 就是可重播的固定 seed 遊戲"""
     return {
         "hp": INITIAL_HP,
         "turn": 1,
         "notes": [],           # 人生小筆記清單
         "logs": [],            # 每關詳細紀錄
-        "world_seed": int(time.time()),
+        "world_seed": int(time.time()) if seed is None else int(seed),
+        "seeded": seed is not None,
         "end_flag": None,      # "win" / "lose" / None
     }
 
 
+def stage_rng(state: Dict[str, Any], name: str) -> random.Random:
+    """固定 seed 遊戲裡某個決策點專用的亂數產生器；一般遊戲回傳 None"""
+    if not state.get("seeded"):
+        return None
+    return random.Random(f"{state['world_seed']}:{name}")
+
+
+def make_seed_key(state: Dict[str, Any], name: str) -> str:
+    """
+    固定 seed 遊戲裡某次 LLM 生成的快取變體：seed 只決定用 SEED_VARIANTS 個變體中的哪一個，
+    所以不同 seed 也能共用快取。一般遊戲回傳 None（不走快取）。
+    """
+    rng = stage_rng(state, name)
+    if rng is None:
+        return None
+    return f"{name}#{rng.randrange(SEED_VARIANTS)}"
+
+
+def session_path(path: pathlib.Path, session_id: str = None) -> pathlib.Path:
+    """
+    同一個行程同時跑多個 session 時，各自的存檔路徑：
+    save_1.json → save_<session_id>.json；沒有 session_id 就是原本的路徑
+    """
+    if session_id is None:
+        return path
+    slot = path.stem.rsplit("_", 1)[0]
+    return path.with_name(f"{slot}_{session_id}{path.suffix}")
+
+
 def ensure_output_dirs():
     """確保 lab2.2_output 與 state 子資料夾存在"""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     STATE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def pick_pregenerated(kind: str, rng: random.Random = None) -> Dict[str, Any]:
+    """從預先生成的內容裡挑一筆（給 rng 就是固定挑法），沒開或沒有就回傳 None"""
+    if not USE_PREGENERATED_CONTENT:
+        return None
+    picked = CONTENT_STORE.pick(kind, rng=rng)
+    CONTENT_PICKS.labels(kind, "hit" if picked else "miss").inc()
+    return picked
+
+
 def save_state(state: Dict[str, Any]):
-    """把整個遊戲狀態存成 JSON 檔"""
+    """把整個遊戲狀態存檔（依 SAVE_FORMAT 決定 JSON 或二進位快照）"""
     ensure_output_dirs()
-    with STATE_PATH.open("w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
-    print(f"\n[系統] 遊戲狀態已儲存到：{STATE_PATH}")
+    with tracing.span("save_state", fmt=SAVE_FORMAT) as sp, SAVE_LATENCY.labels(SAVE_FORMAT).time():
+        if SAVE_FORMAT == "binary":
+            path = session_path(BINARY_STATE_PATH, state.get("session_id"))
+            save_format.write_state(state, path)
+        else:
+            path = session_path(STATE_PATH, state.get("session_id"))
+            with path.open("w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+        if tracing.enabled():
+            sp.set(path=str(path), bytes=path.stat().st_size)
+    print(f"\n[系統] 遊戲狀態已儲存到：{path}")
+
 
+_aggregate_stats = None
+_aggregate_lock = threading.Lock()
 
-def save_summary(review: str):
+
+def record_aggregates(state: Dict[str, Any]) -> aggregates.AggregateStats:
+    """把這一場的結果併入累計統計（勝敗、死亡關卡、HP 分布、排行榜）"""
+    global _aggregate_stats
+    ensure_output_dirs()
+    with _aggregate_lock:
+        if _aggregate_stats is None:
+            _aggregate_stats = aggregates.load_stats(AGGREGATES_PATH)
+        _aggregate_stats.record_run(state)
+        aggregates.save_stats(_aggregate_stats, AGGREGATES_PATH)
+    return _aggregate_stats
+
+
+def save_summary(review: str, session_id: str = None):
     ensure_output_dirs()
-    with SUMMARY_PATH.open("w", encoding="utf-8") as f:
+    path = session_path(SUMMARY_PATH, session_id)
+    with path.open("w", encoding="utf-8") as f:
         f.write(review)
-    print(f"[系統] 人生回顧已儲存到：{SUMMARY_PATH}")
+    print(f"[系統] 人生回顧已儲存到：{path}")
 
 
 def show_notes(state: Dict[str, Any]):
@@ -176,17 +620,48 @@ def get_player_input(prompt: str,
         return ans
 
 
-def append_note(state: Dict[str, Any], note: str):
+def append_note(state: Dict[str, Any], note: str, tag: str = ""):
+    """
+    收進這一場的筆記清單（一字不差的重複不收），並回報給跨場次的筆記庫；
+    和這一場前面的筆記近似重複的照樣留著，只是不再算進筆記庫的 hits
+    """
     note = (note or "").strip()
-    if note and note not in state["notes"]:
+    if not note:
+        return
+    if not note_library.is_near_duplicate(note, state["notes"]):
+        NOTE_LIBRARY.add(note, tag)
+    if note not in state["notes"]:
         state["notes"].append(note)
 
 
+OUTCOME_SYSTEM_PROMPT = (
+    "你是一款文字冒險遊戲《亞洲人生存大挑戰》的旁白。\n"
+    "你的任務是根據提供的關卡名稱、背景情境、玩家選擇與 HP 變化，"
+    "寫出這一關的結果敘述，以及一句「人生小筆記」。\n\n"
+    "【結果敘述 result】\n"
+    "- 使用繁體中文。\n"
+    "- 100～200 字左右，有畫面感，語氣可以微靠北、微自嘲，但要溫柔。\n"
+    "- 不要出現技術細節（分數、程式、JSON 等）。\n\n"
+    "【人生小筆記 note】\n"
+    "- 使用繁體中文。\n"
+    "- 風格為 B+C：\n"
+    "  * B：有點幽默靠北、帶一點自嘲或吐槽；\n"
+    "  * C：短句金句，大約 8～20 字。\n"
+    "- 例子（不要重複使用，只當風格參考）：\n"
+    "  「不是我不行，是世界太難搞。」\n"
+    "  「你不是成績單附屬品。」\n"
+    "  「有些沉默是在保護自己。」\n"
+    "  「活成別人口中的好孩子，很累。」\n\n"
+    "請只輸出 JSON 格式：{\"result\": \"...\", \"note\": \"...\"}"
+)
+
+
 def generate_outcome_text(stage_name: str,
                           context: str,
                           player_choice: str,
                           hp_change: int,
-                          tag: str) -> Dict[str, str]:
+                          tag: str,
+                          seed_key: str = None) -> Dict[str, str]:
     """
     統一讓 LLM 幫忙寫：
     - result：這一關的故事結果敘述
@@ -198,27 +673,6 @@ def generate_outcome_text(stage_name: str,
       "note": "..."
     }
     """
-    system_prompt = (
-        "你是一款文字冒險遊戲《亞洲人生存大挑戰》的旁白。\n"
-        "你的任務是根據提供的關卡名稱、背景情境、玩家選擇與 HP 變化，"
-        "寫出這一關的結果敘述，以及一句「人生小筆記」。\n\n"
-        "【結果敘述 result】\n"
-        "- 使用繁體中文。\n"
-        "- 100～200 字左右，有畫面感，語氣可以微靠北、微自嘲，但要溫柔。\n"
-        "- 不要出現技術細節（分數、程式、JSON 等）。\n\n"
-        "【人生小筆記 note】\n"
-        "- 使用繁體中文。\n"
-        "- 風格為 B+C：\n"
-        "  * B：有點幽默靠北、帶一點自嘲或吐槽；\n"
-        "  * C：短句金句，大約 8～20 字。\n"
-        "- 例子（不要重複使用，只當風格參考）：\n"
-        "  「不是我不行，是世界太難搞。」\n"
-        "  「你不是成績單附屬品。」\n"
-        "  「有些沉默是在保護自己。」\n"
-        "  「活成別人口中的好孩子，很累。」\n\n"
-        "請只輸出 JSON 格式：{\"result\": \"...\", \"note\": \"...\"}"
-    )
-
     user_prompt = f"""
 【關卡名稱】
 {stage_name}
@@ -238,12 +692,16 @@ def generate_outcome_text(stage_name: str,
 請產生符合上述規則的 result 與 note。
 """
 
-    data = call_llm_json(system_prompt, user_prompt, temperature=0.8)
+    data = call_llm_json(OUTCOME_SYSTEM_PROMPT, user_prompt, temperature=0.8, seed_key=seed_key)
     # 保底處理
     result = str(data.get("result", "")).strip()
     note = str(data.get("note", "")).strip()
+    if not note and seed_key is None:
+        # 若 note 沒給好，先拿筆記庫裡同 tag 最常出現的那則
+        # （固定 seed 的遊戲不用：筆記庫會隨其他玩家變動，重播就對不上了，改走下面有快取的補句）
+        note = NOTE_LIBRARY.best_for_tag(tag) or ""
     if not note:
-        # 若 note 沒給好，再補一句
+        # 筆記庫也沒有，再補一句
         backup = call_llm(
             system_prompt=(
                 "你是一個人生小筆記產生器，風格為 B+C："
@@ -251,6 +709,7 @@ def generate_outcome_text(stage_name: str,
             ),
             user_prompt="請寫一句人生小筆記，使用繁體中文。",
             temperature=0.7,
+            seed_key=seed_key,
         )
         note = backup.strip().replace("\n", " ")
         if len(note) > 24:
@@ -258,6 +717,93 @@ def generate_outcome_text(stage_name: str,
     return {"result": result, "note": note}
 
 
+class OutcomeSpeculator:
+    """
+    推測式旁白：
+    - start：選項一顯示就替（最常被選的前幾個）選項排進這一輪自己的執行緒池，
+      池子只有 parallel 條執行緒（比 width 小），排名後面的先排隊
+    - take：玩家選完直接拿對應結果；被選中的如果還在排隊就取消、改為現場生成，不必等前面的推測；
+      其他還在排隊的取消，已經在跑的結果丟掉
+    - 每排進一個推測就先扣一次額度，取消成功的與被選中的再退回，
+      所以真正扣掉的只有「跑了卻沒被選中」的呼叫
+    - 額度是速率：上限 extra_calls_per_hour，依經過時間持續補回；額度不足一次就先不推測
+    """
+
+    def __init__(self, width: int, extra_calls_per_hour: float,
+                 parallel: int = SPECULATIVE_PARALLEL, clock: Callable[[], float] = time.monotonic):
+        self.width = width
+        self.parallel = max(1, parallel)
+        self.capacity = float(extra_calls_per_hour)
+        self.budget = self.capacity
+        self._clock = clock
+        self._refilled_at = clock()
+        self._lock = threading.Lock()
+        self._choice_counts: Dict[str, List[int]] = {}
+
+    def _refill(self):
+        now = self._clock()
+        self.budget = min(self.capacity, self.budget + (now - self._refilled_at) * self.capacity / 3600)
+        self._refilled_at = now
+
+    def _refund(self, n: int):
+        if n:
+            with self._lock:
+                self.budget = min(self.capacity, self.budget + n)
+
+    def _ranked(self, stage_name: str, n: int) -> List[int]:
+        counts = self._choice_counts.get(stage_name, [0] * n)
+        return sorted(range(n), key=lambda i: -counts[i] if i < len(counts) else 0)
+
+    def start(self, stage_name: str, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        handle = {"stage_name": stage_name, "candidates": candidates, "futures": {}}
+        with self._lock:
+            self._refill()
+            picks = self._ranked(stage_name, len(candidates))[:min(self.width, int(self.budget))]
+            self.budget -= len(picks)
+        if not picks:
+            return handle
+        executor = ThreadPoolExecutor(max_workers=min(self.parallel, len(picks)),
+                                      thread_name_prefix="speculate")
+        for idx in picks:
+            handle["futures"][idx] = executor.submit(
+                tracing.bind_context(generate_outcome_text), **candidates[idx]
+            )
+        # 送完就關：排隊中的照樣會輪到（除非被取消），跑完執行緒自己結束
+        executor.shutdown(wait=False)
+        return handle
+
+    def cancel(self, handle: Dict[str, Any]):
+        """放棄這一輪剩下的推測（例如玩家中途離開）：還在排隊的取消並退回預扣"""
+        self._refund(sum(1 for fut in handle["futures"].values() if fut.cancel()))
+        handle["futures"].clear()
+
+    def take(self, handle: Dict[str, Any], index: int) -> Dict[str, str]:
+        kwargs = handle["candidates"][index]
+        with self._lock:
+            counts = self._choice_counts.setdefault(
+                handle["stage_name"], [0] * len(handle["candidates"])
+            )
+            if index < len(counts):
+                counts[index] += 1
+
+        fut = handle["futures"].pop(index, None)
+        self.cancel(handle)
+        if fut is None:
+            return generate_outcome_text(**kwargs)
+        # 被選中的推測不算額外花費；還在排隊的直接取消、現場生成
+        self._refund(1)
+        if fut.cancel():
+            return generate_outcome_text(**kwargs)
+        try:
+            return fut.result()
+        except Exception as e:
+            print(f"[警告] 預先生成的結果失敗，改為現場生成。錯誤：{e}")
+        return generate_outcome_text(**kwargs)
+
+
+SPECULATOR = OutcomeSpeculator(SPECULATIVE_WIDTH, SPECULATIVE_EXTRA_CALLS_PER_HOUR)
+
+
 def play_stage_1_birth(state: Dict[str, Any]) -> Dict[str, Any]:
     stage_name = "第一關：出生決定性別"
     print("你還沒看到世界長什麼樣，產房外一群長輩已經在猜你的性別。")
@@ -291,7 +837,7 @@ def play_stage_1_birth(state: Dict[str, Any]) -> Dict[str, Any]:
     state["hp"] += hp_change
     if state["hp"] < 0:
         state["hp"] = 0
-    append_note(state, note)
+    append_note(state, note, tag)
 
     log_entry = {
         "turn": state["turn"],
@@ -313,37 +859,63 @@ def play_stage_1_birth(state: Dict[str, Any]) -> Dict[str, Any]:
     state["turn"] += 1
     return state
 
+_major_classifier = None
+
+
+def get_major_classifier() -> major_matcher.MajorClassifier:
+    global _major_classifier
+    if _major_classifier is None:
+        _major_classifier = major_matcher.MajorClassifier.from_file(MAJOR_TAXONOMY_PATH)
+    return _major_classifier
+
+
+MAJOR_FALLBACK_SYSTEM_PROMPT = (
+    "你是一個熟悉亞洲家長價值觀的大學科系分類器。\n"
+    "請判斷玩家填的科系，在傳統亞洲家長眼中屬於哪一類：\n"
+    "- high：醫學、電機、資工、工程等「長輩會到處炫耀」的科系。\n"
+    "- mid：商管、法律、會計、財經等「還算穩定、長輩可以接受」的科系。\n"
+    "- low：藝術、人文、社會、體育等「長輩會問以後要做什麼」的科系。\n"
+    "- other：看不出是什麼科系，或完全不像科系。\n"
+    "請只輸出 JSON：{\"tier\": \"high/mid/low/other\"}"
+)
+MAJOR_TIER_TAGS = {
+    "high": "major_high_status",
+    "mid": "major_mid",
+    "low": "major_low_status",
+}
+
+
+def classify_major_with_llm(major_text: str) -> str:
+    """分類表查不到的科系交給 LLM 判斷，回傳 tag；同一個科系只會問一次"""
+    key = major_matcher.normalize_major(major_text)
+    cached = MAJOR_MEMO.get(key)
+    if cached is not None:
+        return cached
+    data = call_llm_json(MAJOR_FALLBACK_SYSTEM_PROMPT, f"玩家填的科系：{major_text}",
+                         temperature=0.0)
+    tier = str(data.get("tier", "other")).strip().lower()
+    tag = MAJOR_TIER_TAGS.get(tier, "major_other")
+    MAJOR_MEMO.put(key, tag)
+    return tag
+
+
 def classify_major_and_score(major_text: str) -> (int, str):
     """
-    依科系關鍵字判定類型與 HP 變化
+    依科系分類表判定類型與 HP 變化
     回傳 (hp_change, tag)
     """
-    text = major_text
-
-    high_keywords = ["醫", "醫學", "牙醫", "藥學", "電機", "資工", "工程", "電資"]
-    mid_keywords = ["商", "企管", "管理", "會計", "財金", "金融",
-                    "法律", "法學", "經濟"]
-    low_keywords = ["美術", "藝術", "設計", "哲學", "社會", "歷史",
-                    "音樂", "戲劇", "舞蹈", "體育"]
-
-    tag = "major_other"
-    hp_change = -10  # default：長輩有點不滿，但還沒到爆炸
-
-    if any(k in text for k in high_keywords):
-        hp_change = 10
-        tag = "major_high_status"
-    elif any(k in text for k in mid_keywords):
-        hp_change = -20
-        tag = "major_mid"
-    elif any(k in text for k in low_keywords):
-        hp_change = -30
-        tag = "major_low_status"
-    else:
-        # 沒明確命中，就當冷門或非典型
-        hp_change = -20
-        tag = "major_other"
+    classifier = get_major_classifier()
+    hit = classifier.match(major_text)
+    if hit is not None:
+        return hit
 
-    return hp_change, tag
+    # 沒明確命中：先問 LLM（有記憶），問不到就當冷門或非典型
+    if MAJOR_LLM_FALLBACK:
+        try:
+            return classifier.score_of(classify_major_with_llm(major_text))
+        except Exception as e:
+            print(f"[警告] 科系分類失敗，當作非典型科系。錯誤：{e}")
+    return classifier.default
 
 def play_stage_2_major(state: Dict[str, Any]) -> Dict[str, Any]:
     stage_name = "第二關：大學志願"
@@ -368,9 +940,10 @@ def play_stage_2_major(state: Dict[str, Any]) -> Dict[str, Any]:
         player_choice=major_text,
         hp_change=hp_change,
         tag=tag,
+        seed_key=make_seed_key(state, "stage2_outcome"),
     )
 
-    append_note(state, outcome["note"])
+    append_note(state, outcome["note"], tag)
 
     log_entry = {
         "turn": state["turn"],
@@ -394,71 +967,122 @@ def play_stage_2_major(state: Dict[str, Any]) -> Dict[str, Any]:
     state["turn"] += 1
     return state
 
+JOB_SYSTEM_PROMPT = (
+    "你是一名人生模擬遊戲的關卡設計師，要設計「第一份工作」三個職缺選項。\n"
+    "請以繁體中文輸出【純 JSON】格式，不要加註解、不要加變數名稱、不要加文字描述。\n"
+    "輸出格式必須完全如下（不可缺任何 key）：\n\n"
+    "{\n"
+    "  \"jobs\": [\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": -15,\n"
+    "      \"tag\": \"job_xxx\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": 5,\n"
+    "      \"tag\": \"job_xxx\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": 10,\n"
+    "      \"tag\": \"job_xxx\"\n"
+    "    }\n"
+    "  ]\n"
+    "}\n\n"
+    "規則：\n"
+    "1. 三個工作請務必各自不同。\n"
+    "2. description 80～140 字，描述現實壓力、家庭期待與工作氛圍。\n"
+    "3. hidden_hp 範圍 -45～+20(由低到高分別為不符合到符合亞洲家族期待)。(可以盡可能極端）\n"
+    "4. tag = job_high_pay / job_low_status / job_stable / job_creative 等英文字標籤。\n"
+    "5. 請務必輸出【合法 JSON】（最外層為大括號）。\n"
+    "6. hidden_hp 要盡可能給極端一點"
+)
+JOB_USER_PROMPT = "請產生三個第一份工作的選項。"
+
+
+def validate_option_list(data: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+    """
+    檢查 jobs / partners 這類三選一清單，整理成固定欄位；
+    格式不對回傳 None（給離線預先生成的內容驗證用）。
+    """
+    options = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(options, list) or len(options) < 3:
+        return None
+    cleaned = []
+    for opt in options[:3]:
+        if not isinstance(opt, dict):
+            return None
+        title = str(opt.get("title", "")).strip()
+        description = str(opt.get("description", "")).strip()
+        tag = str(opt.get("tag", "")).strip()
+        try:
+            hidden_hp = int(opt.get("hidden_hp"))
+        except (TypeError, ValueError):
+            return None
+        if not title or not description or not tag:
+            return None
+        cleaned.append({"title": title, "description": description,
+                        "hidden_hp": hidden_hp, "tag": tag})
+    return cleaned
+
+
 def play_stage_3_job(state: Dict[str, Any]) -> Dict[str, Any]:
     stage_name = "第三關：第一份工作"
     print("你畢業了，站在第一份工作的十字路口。")
     print("世界給你三個工作，但它們背後的『社會眼光』都不太一樣……\n")
 
-    system_prompt = (
-        "你是一名人生模擬遊戲的關卡設計師，要設計「第一份工作」三個職缺選項。\n"
-        "請以繁體中文輸出【純 JSON】格式，不要加註解、不要加變數名稱、不要加文字描述。\n"
-        "輸出格式必須完全如下（不可缺任何 key）：\n\n"
-        "{\n"
-        "  \"jobs\": [\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": -15,\n"
-        "      \"tag\": \"job_xxx\"\n"
-        "    },\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": 5,\n"
-        "      \"tag\": \"job_xxx\"\n"
-        "    },\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": 10,\n"
-        "      \"tag\": \"job_xxx\"\n"
-        "    }\n"
-        "  ]\n"
-        "}\n\n"
-        "規則：\n"
-        "1. 三個工作請務必各自不同。\n"
-        "2. description 80～140 字，描述現實壓力、家庭期待與工作氛圍。\n"
-        "3. hidden_hp 範圍 -45～+20(由低到高分別為不符合到符合亞洲家族期待)。(可以盡可能極端）\n"
-        "4. tag = job_high_pay / job_low_status / job_stable / job_creative 等英文字標籤。\n"
-        "5. 請務必輸出【合法 JSON】（最外層為大括號）。\n"
-        "6. hidden_hp 要盡可能給極端一點"
+    data = pick_pregenerated("jobs", stage_rng(state, "stage3_pool")) or call_llm_json(
+        JOB_SYSTEM_PROMPT, JOB_USER_PROMPT, temperature=0.8,
+        seed_key=make_seed_key(state, "stage3_jobs"),
     )
 
-
-    user_prompt = "請產生三個第一份工作的選項。"
-    data = call_llm_json(system_prompt, user_prompt, temperature=0.8)
-
     jobs = data.get("jobs", [])
     if not isinstance(jobs, list) or len(jobs) < 3:
         print("AI 生成工作列表失敗，改用預設值避免遊戲壞掉。")
+        FALLBACK_CONTENT.labels("jobs").inc()
         jobs = [
             {"title": "連鎖餐飲店基層員工", "description": "快節奏、長工時、薪水普通，長輩覺得不夠體面。", "hidden_hp": -25, "tag": "job_low_status"},
             {"title": "科技業輪班工程師", "description": "薪水高但爆肝，家人滿意但你可能沒週末。", "hidden_hp": 10, "tag": "job_high_pay"},
             {"title": "基層公務員", "description": "穩定、規律、長輩最愛聽到，社會期待值很高。", "hidden_hp": 5, "tag": "job_stable"},
         ]
 
+    order_rng = stage_rng(state, "stage3_order")
+    if order_rng is not None:
+        order_rng.shuffle(jobs)
+
     print("以下是三份由命運排到你面前的工作：\n")
     for idx, job in enumerate(jobs, 1):
         print(f"{idx}. {job['title']}")
         print(f"   {job['description']}\n")
 
+    # 玩家還在考慮時，先替各選項生成結果
+    speculation = SPECULATOR.start(stage_name, [
+        {
+            "stage_name": stage_name,
+            "context": f"你選擇了「{job['title']}」，也等於選了某種人生版本。",
+            "player_choice": job["title"],
+            "hp_change": int(job.get("hidden_hp", 0)),
+            "tag": job.get("tag", "job_misc"),
+            "seed_key": make_seed_key(state, "stage3_outcome"),
+        }
+        for job in jobs[:3]
+    ])
+
     # === 玩家選擇 ===
-    while True:
-        choice = get_player_input("請輸入 1 / 2 / 3 選擇你的第一份工作：", state)
-        if choice in ["1", "2", "3"]:
-            selected = jobs[int(choice)-1]
-            break
-        print("看起來你選到不存在的工作，再試一次（輸入 1 / 2 / 3）。")
+    try:
+        while True:
+            choice = get_player_input("請輸入 1 / 2 / 3 選擇你的第一份工作：", state)
+            if choice in ["1", "2", "3"]:
+                selected = jobs[int(choice)-1]
+                break
+            print("看起來你選到不存在的工作，再試一次（輸入 1 / 2 / 3）。")
+    except BaseException:
+        SPECULATOR.cancel(speculation)
+        raise
 
     hp_change = int(selected.get("hidden_hp", 0))
     tag = selected.get("tag", "job_misc")
@@ -467,16 +1091,9 @@ def play_stage_3_job(state: Dict[str, Any]) -> Dict[str, Any]:
     if state["hp"] < 0:
         state["hp"] = 0
 
-    context = f"你選擇了「{selected['title']}」，也等於選了某種人生版本。"
-    outcome = generate_outcome_text(
-        stage_name=stage_name,
-        context=context,
-        player_choice=selected["title"],
-        hp_change=hp_change,
-        tag=tag,
-    )
+    outcome = SPECULATOR.take(speculation, int(choice) - 1)
 
-    append_note(state, outcome["note"])
+    append_note(state, outcome["note"], tag)
 
     # === log ===
     log_entry = {
@@ -503,59 +1120,62 @@ def play_stage_3_job(state: Dict[str, Any]) -> Dict[str, Any]:
     state["turn"] += 1
     return state
 
+PARTNER_SYSTEM_PROMPT = (
+    "你是一名人生模擬遊戲的關卡設計師，要設計『結婚對象』的三個選項。\n"
+    "請用繁體中文，並【只能輸出 JSON】。\n\n"
+    "輸出格式必須如下（不可多、不可信缺）：\n"
+    "{\n"
+    "  \"partners\": [\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": -15,\n"
+    "      \"tag\": \"partner_xxx\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": 5,\n"
+    "      \"tag\": \"partner_xxx\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"title\": \"...\",\n"
+    "      \"description\": \"...\",\n"
+    "      \"hidden_hp\": 10,\n"
+    "      \"tag\": \"partner_xxx\"\n"
+    "    }\n"
+    "  ]\n"
+    "}\n\n"
+    "規則：\n"
+    "1. 三位對象必須彼此明顯不同（符合亞洲期待的美德婦女、亞洲父母尚可接受的類型、亞洲父母不能接受的類型）\n"
+    "2. description 需 80～140 字，描述家庭期待、性格氛圍、可能的社會壓力。\n"
+    "3. hidden_hp = +10～-45。（由高到低分別為符合期待的、尚可的、不能接受的）\n"
+    "4. tag = partner_family_approved / partner_balanced / partner_disapproved 等英文字。\n"
+    "5. 請務必輸出標準 JSON（最外層需為物件）。"
+    "6. title必須要是他的類型、並且內容不要特別提及男女）。"
+    "7. 可以多腦補選擇對象後的劇情，可以戲劇化一點。"
+    "8. hidden_hp的選擇要基於後續劇情發展"
+)
+PARTNER_USER_PROMPT = "請產生三位結婚對象的選項，只輸出 JSON。"
+
 def play_stage_4_marriage(state: Dict[str, Any]) -> Dict[str, Any]:
     stage_name = "第四關：結婚對象"
 
     print("你的人生來到『長輩開始問婚事』的階段。")
     print("桌上出現三個對象，看起來不像選愛情，比較像選家族KPI。\n")
 
-    # === AI 生成三個伴侶選項 ===
-    system_prompt = (
-        "你是一名人生模擬遊戲的關卡設計師，要設計『結婚對象』的三個選項。\n"
-        "請用繁體中文，並【只能輸出 JSON】。\n\n"
-        "輸出格式必須如下（不可多、不可信缺）：\n"
-        "{\n"
-        "  \"partners\": [\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": -15,\n"
-        "      \"tag\": \"partner_xxx\"\n"
-        "    },\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": 5,\n"
-        "      \"tag\": \"partner_xxx\"\n"
-        "    },\n"
-        "    {\n"
-        "      \"title\": \"...\",\n"
-        "      \"description\": \"...\",\n"
-        "      \"hidden_hp\": 10,\n"
-        "      \"tag\": \"partner_xxx\"\n"
-        "    }\n"
-        "  ]\n"
-        "}\n\n"
-        "規則：\n"
-        "1. 三位對象必須彼此明顯不同（符合亞洲期待的美德婦女、亞洲父母尚可接受的類型、亞洲父母不能接受的類型）\n"
-        "2. description 需 80～140 字，描述家庭期待、性格氛圍、可能的社會壓力。\n"
-        "3. hidden_hp = +10～-45。（由高到低分別為符合期待的、尚可的、不能接受的）\n"
-        "4. tag = partner_family_approved / partner_balanced / partner_disapproved 等英文字。\n"
-        "5. 請務必輸出標準 JSON（最外層需為物件）。"
-        "6. title必須要是他的類型、並且內容不要特別提及男女）。"
-        "7. 可以多腦補選擇對象後的劇情，可以戲劇化一點。"
-        "8. hidden_hp的選擇要基於後續劇情發展"
-    )
-
-    user_prompt = "請產生三位結婚對象的選項，只輸出 JSON。"
-
+    # === AI 生成三個伴侶選項（有預先生成的就直接用） ===
     try:
-        data = call_llm_json(system_prompt, user_prompt, temperature=0.8)
+        data = pick_pregenerated("partners", stage_rng(state, "stage4_pool")) or call_llm_json(
+            PARTNER_SYSTEM_PROMPT, PARTNER_USER_PROMPT, temperature=0.8,
+            seed_key=make_seed_key(state, "stage4_partners"),
+        )
         partners = data.get("partners", [])
         if not isinstance(partners, list) or len(partners) < 3:
             raise ValueError("AI 輸出的 partners 格式不正確。")
     except Exception as e:
         print(f"[警告] AI 生成資料有問題，用預設值替代。錯誤：{e}")
+        FALLBACK_CONTENT.labels("partners").inc()
         partners = [
             {
                 "title": "家世很好但脾氣很差的人",
@@ -577,18 +1197,38 @@ def play_stage_4_marriage(state: Dict[str, Any]) -> Dict[str, Any]:
             }
         ]
 
+    order_rng = stage_rng(state, "stage4_order")
+    if order_rng is not None:
+        order_rng.shuffle(partners)
+
     print("以下是 AI 幫你安排的三位結婚候選人：\n")
     for idx, p in enumerate(partners, 1):
         print(f"{idx}. {p['title']}")
         print(f"   {p['description']}\n")
 
+    speculation = SPECULATOR.start(stage_name, [
+        {
+            "stage_name": stage_name,
+            "context": f"你選擇了「{p['title']}」。婚禮不是最累的，最累的是兩個家族的交鋒。",
+            "player_choice": p["title"],
+            "hp_change": int(p.get("hidden_hp", 0)),
+            "tag": p.get("tag", "partner_misc"),
+            "seed_key": make_seed_key(state, "stage4_outcome"),
+        }
+        for p in partners[:3]
+    ])
+
     # === 玩家選擇 ===
-    while True:
-        choice = get_player_input("請輸入 1 / 2 / 3 選擇你的結婚對象：", state)
-        if choice in ["1", "2", "3"]:
-            selected = partners[int(choice) - 1]
-            break
-        print("這位對象目前不在候選名單，再試一次（輸入 1 / 2 / 3）。")
+    try:
+        while True:
+            choice = get_player_input("請輸入 1 / 2 / 3 選擇你的結婚對象：", state)
+            if choice in ["1", "2", "3"]:
+                selected = partners[int(choice) - 1]
+                break
+            print("這位對象目前不在候選名單，再試一次（輸入 1 / 2 / 3）。")
+    except BaseException:
+        SPECULATOR.cancel(speculation)
+        raise
 
     # === 使用 hidden_hp 進行扣血 ---
     hp_change = int(selected.get("hidden_hp", 0))
@@ -599,16 +1239,9 @@ def play_stage_4_marriage(state: Dict[str, Any]) -> Dict[str, Any]:
         state["hp"] = 0
 
     # === 故事 & 小筆記 ===
-    context = f"你選擇了「{selected['title']}」。婚禮不是最累的，最累的是兩個家族的交鋒。"
-    outcome = generate_outcome_text(
-        stage_name=stage_name,
-        context=context,
-        player_choice=selected["title"],
-        hp_change=hp_change,
-        tag=tag,
-    )
+    outcome = SPECULATOR.take(speculation, int(choice) - 1)
 
-    append_note(state, outcome["note"])
+    append_note(state, outcome["note"], tag)
 
     # === log ===
     log_entry = {
@@ -666,12 +1299,29 @@ def play_stage_5_children(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"{o['id']}. {o['title']}")
     print()
 
-    while True:
-        choice = get_player_input("請輸入 1 / 2 / 3 選擇你的決定：", state)
-        selected = next((o for o in options if o["id"] == choice), None)
-        if selected:
-            break
-        print("目前劇本裡還沒有這種家庭規劃，再試一次（輸入 1 / 2 / 3）。")
+    context = "你在醫院產房門口、育兒社團、或房間裡的深夜，反覆確認這個選擇。"
+    speculation = SPECULATOR.start(stage_name, [
+        {
+            "stage_name": stage_name,
+            "context": context,
+            "player_choice": o["title"],
+            "hp_change": o["hp_change"],
+            "tag": o["tag"],
+            "seed_key": make_seed_key(state, "stage5_outcome"),
+        }
+        for o in options
+    ])
+
+    try:
+        while True:
+            choice = get_player_input("請輸入 1 / 2 / 3 選擇你的決定：", state)
+            selected = next((o for o in options if o["id"] == choice), None)
+            if selected:
+                break
+            print("目前劇本裡還沒有這種家庭規劃，再試一次（輸入 1 / 2 / 3）。")
+    except BaseException:
+        SPECULATOR.cancel(speculation)
+        raise
 
     hp_change = selected["hp_change"]
     tag = selected["tag"]
@@ -679,16 +1329,9 @@ def play_stage_5_children(state: Dict[str, Any]) -> Dict[str, Any]:
     if state["hp"] < 0:
         state["hp"] = 0
 
-    context = "你在醫院產房門口、育兒社團、或房間裡的深夜，反覆確認這個選擇。"
-    outcome = generate_outcome_text(
-        stage_name=stage_name,
-        context=context,
-        player_choice=selected["title"],
-        hp_change=hp_change,
-        tag=tag,
-    )
+    outcome = SPECULATOR.take(speculation, int(selected["id"]) - 1)
 
-    append_note(state, outcome["note"])
+    append_note(state, outcome["note"], tag)
 
     log_entry = {
         "turn": state["turn"],
@@ -713,23 +1356,21 @@ def play_stage_5_children(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
-def generate_newyear_question() -> Dict[str, Any]:
-    system_prompt = (
-        "你是一個專門負責設計「過年長輩拷問」題目的出題官。\n"
-        "請用繁體中文，設計一題典型的過年長輩會問的問題，"
-        "主題可以是：收入、房子、婚姻、小孩、升遷等。\n"
-        "同時請為這個問題標註難度等級（low/medium/high/extreme），"
-        "愈難的題目通常愈容易讓人崩潰，例如：\n"
-        "- low：單純關心工作或生活近況\n"
-        "- medium：問薪水、房租、考試成績\n"
-        "- high：問買房、結婚、生小孩、比較你跟別人\n"
-        "- extreme：同時牽涉多重壓力，例如「同齡誰誰誰都已經怎樣了，你呢？」\n"
-        "請只輸出 JSON 物件：{\"question\": \"...\", \"difficulty\": \"...\"}"
-    )
-
-    user_prompt = "請產生一個過年長輩會問的拷問問題，並標註難度。"
-    data = call_llm_json(system_prompt, user_prompt, temperature=0.9)
-
+NEWYEAR_SYSTEM_PROMPT = (
+    "你是一個專門負責設計「過年長輩拷問」題目的出題官。\n"
+    "請用繁體中文，設計一題典型的過年長輩會問的問題，"
+    "主題可以是：收入、房子、婚姻、小孩、升遷等。\n"
+    "同時請為這個問題標註難度等級（low/medium/high/extreme），"
+    "愈難的題目通常愈容易讓人崩潰，例如：\n"
+    "- low：單純關心工作或生活近況\n"
+    "- medium：問薪水、房租、考試成績\n"
+    "- high：問買房、結婚、生小孩、比較你跟別人\n"
+    "- extreme：同時牽涉多重壓力，例如「同齡誰誰誰都已經怎樣了，你呢？」\n"
+    "請只輸出 JSON 物件：{\"question\": \"...\", \"difficulty\": \"...\"}"
+)
+NEWYEAR_USER_PROMPT = "請產生一個過年長輩會問的拷問問題，並標註難度。"
+
+def normalize_newyear_question(data: Dict[str, Any]) -> Dict[str, Any]:
     question = str(data.get("question", "最近過得怎麼樣？")).strip()
     difficulty = str(data.get("difficulty", "medium")).strip().lower()
     if difficulty not in DIFFICULTY_SCORES:
@@ -737,7 +1378,23 @@ def generate_newyear_question() -> Dict[str, Any]:
 
     return {"question": question, "difficulty": difficulty}
 
-def classify_newyear_answer(question: str, answer: str) -> str:
+def generate_newyear_question(rng: random.Random = None,
+                              seed_key: str = None) -> Dict[str, Any]:
+    pregenerated = pick_pregenerated("newyear", rng)
+    if pregenerated:
+        return pregenerated
+
+    data = call_llm_json(NEWYEAR_SYSTEM_PROMPT, NEWYEAR_USER_PROMPT, temperature=0.9,
+                         seed_key=seed_key)
+    return normalize_newyear_question(data)
+
+def classify_newyear_answer(question: str, answer: str, seed_key: str = None) -> str:
+    # 固定 seed 的遊戲走 LLM_CACHE 重播，這裡只服務一般遊戲
+    if seed_key is None:
+        cached = RESPONSE_CACHE.get("newyear_answer_style", question, answer)
+        if cached is not None:
+            return cached
+
     system_prompt = (
         "你是一個語氣分析器，專門判斷在華人家庭過年場合中，"
         "晚輩回答長輩拷問時的風格。\n"
@@ -758,10 +1415,13 @@ def classify_newyear_answer(question: str, answer: str) -> str:
 【晚輩回答】
 {answer}
 """
-    data = call_llm_json(system_prompt, user_prompt, temperature=0.3)
+    data = call_llm_json_batched("newyear_answer_style", system_prompt, user_prompt,
+                                 temperature=0.3, seed_key=seed_key)
     style = str(data.get("answer_style", "other")).strip().lower()
     if style not in ["balanced", "bragging", "too_humble", "defensive", "refuse", "other"]:
         style = "other"
+    if seed_key is None:
+        RESPONSE_CACHE.put("newyear_answer_style", question, answer, style)
     return style
 
 def play_stage_6_newyear(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -770,7 +1430,8 @@ def play_stage_6_newyear(state: Dict[str, Any]) -> Dict[str, Any]:
     print("你拖著有點不足的睡眠與滿滿的伴手禮，回到睽違已久的老家。")
     print("客廳裡坐滿了已經預約好要問你近況的長輩們。\n")
 
-    q = generate_newyear_question()
+    q = generate_newyear_question(rng=stage_rng(state, "stage6_pool"),
+                                  seed_key=make_seed_key(state, "stage6_question"))
     question = q["question"]
     difficulty = q["difficulty"]
 
@@ -778,7 +1439,8 @@ def play_stage_6_newyear(state: Dict[str, Any]) -> Dict[str, Any]:
     print("請輸入你打算怎麼回答：")
     answer = get_player_input("你的回答是：", state)
 
-    style = classify_newyear_answer(question, answer)
+    style = classify_newyear_answer(question, answer,
+                                    seed_key=make_seed_key(state, "stage6_style"))
 
     score_table = DIFFICULTY_SCORES[difficulty]
     if style == "balanced":
@@ -799,9 +1461,10 @@ def play_stage_6_newyear(state: Dict[str, Any]) -> Dict[str, Any]:
         player_choice=answer,
         hp_change=hp_change,
         tag=tag,
+        seed_key=make_seed_key(state, "stage6_outcome"),
     )
 
-    append_note(state, outcome["note"])
+    append_note(state, outcome["note"], tag)
 
     log_entry = {
         "turn": state["turn"],
@@ -851,24 +1514,47 @@ def is_reasonable_kinship_answer(ans: str) -> bool:
 
     return True
 
-def generate_kinship_question() -> Dict[str, Any]:
-    system_prompt = (
-        "你是一位專門設計華人親戚稱謂魔王題的出題官。\n"
-        "題型格式固定為：「你的 Y 要怎麼稱呼？」\n"
-        "請產生一題難度 medium/high/extreme 的題目。\n"
-        "請確保 Y 是由 2～6 個親屬關係所組成，例如：\n"
-        "「你的表哥的老婆的爸爸」、「你的姨丈的姐姐的兒子」。\n"
-        "難度說明：\n"
-        "- medium：2～3 層親屬關係\n"
-        "- high：3～4 層親屬關係\n"
-        "- extreme：4～6 層親屬關係，且不得重複角色\n"
-        "輸出 JSON：question、difficulty、answers。\n"
-        "answers 請提供正確稱謂（至少 1 個），不得包含錯誤稱謂或不屬於華人稱謂系統的詞語。"
-    )
+KINSHIP_SYSTEM_PROMPT = (
+    "你是一位專門設計華人親戚稱謂魔王題的出題官。\n"
+    "題型格式固定為：「你的 Y 要怎麼稱呼？」\n"
+    "請產生一題難度 medium/high/extreme 的題目。\n"
+    "請確保 Y 是由 2～6 個親屬關係所組成，例如：\n"
+    "「你的表哥的老婆的爸爸」、「你的姨丈的姐姐的兒子」。\n"
+    "難度說明：\n"
+    "- medium：2～3 層親屬關係\n"
+    "- high：3～4 層親屬關係\n"
+    "- extreme：4～6 層親屬關係，且不得重複角色\n"
+    "輸出 JSON：question、difficulty、answers。\n"
+    "answers 請提供正確稱謂（至少 1 個），不得包含錯誤稱謂或不屬於華人稱謂系統的詞語。"
+)
+KINSHIP_USER_PROMPT = "請出一題親戚稱謂魔王題。"
+
+def validate_kinship_question(data: Dict[str, Any]) -> Dict[str, Any]:
+    """驗證離線生成的稱謂題：要有題目、合法難度與至少一個合理答案，否則回傳 None"""
+    if not isinstance(data, dict):
+        return None
+    question = str(data.get("question", "")).strip()
+    difficulty = str(data.get("difficulty", "")).strip().lower()
+    answers = data.get("answers", [])
+    if not isinstance(answers, list):
+        answers = [answers]
+    answers = [str(a).strip() for a in answers if a]
+    answers = [a for a in answers if is_reasonable_kinship_answer(a)]
+    if not question or difficulty not in DIFFICULTY_SCORES or not answers:
+        return None
+    return {"question": question, "difficulty": difficulty, "answers": answers}
+
+def generate_kinship_question(rng: random.Random = None,
+                              seed_key: str = None) -> Dict[str, Any]:
+    pregenerated = pick_pregenerated("kinship", rng)
+    if pregenerated:
+        return pregenerated
 
     # --- AI 出題函式 ---
-    def ask_ai_once():
-        data = call_llm_json(system_prompt, "請出一題親戚稱謂魔王題。", temperature=0.9)
+    def ask_ai_once(attempt: int):
+        with tracing.span("kinship.attempt", attempt=attempt):
+            data = call_llm_json(KINSHIP_SYSTEM_PROMPT, KINSHIP_USER_PROMPT, temperature=0.9,
+                                 seed_key=None if seed_key is None else f"{seed_key}/{attempt}")
 
         question = str(data.get("question", "")).strip()
         difficulty = str(data.get("difficulty", "high")).strip().lower()
@@ -883,7 +1569,7 @@ def generate_kinship_question() -> Dict[str, Any]:
         return question, difficulty, answers
 
     # first attempt
-    q1, d1, a1 = ask_ai_once()
+    q1, d1, a1 = ask_ai_once(1)
     valid_a1 = [a for a in a1 if is_reasonable_kinship_answer(a)]
 
     if valid_a1:
@@ -893,7 +1579,7 @@ def generate_kinship_question() -> Dict[str, Any]:
             "answers": valid_a1,
         }
     # second attempt
-    q2, d2, a2 = ask_ai_once()
+    q2, d2, a2 = ask_ai_once(2)
     valid_a2 = [a for a in a2 if is_reasonable_kinship_answer(a)]
 
     if valid_a2:
@@ -904,6 +1590,7 @@ def generate_kinship_question() -> Dict[str, Any]:
         }
 
     # --- Fallback ---
+    FALLBACK_CONTENT.labels("kinship").inc()
     return {
         "question": "姑婆的公公要怎麼稱呼？",
         "difficulty": "extreme",
@@ -933,7 +1620,8 @@ def play_stage_7_kinship(state: Dict[str, Any]) -> Dict[str, Any]:
     print("你來到最後一關，歡迎進入華人家族樹的深淵。")
     print("長輩突然想考你：到底懂不懂『正確稱呼親戚』的玄學禮儀。\n")
 
-    data = generate_kinship_question()
+    data = generate_kinship_question(rng=stage_rng(state, "stage7_pool"),
+                                     seed_key=make_seed_key(state, "stage7_question"))
     question = data["question"]
     difficulty = data["difficulty"]
     answers = data["answers"]
@@ -963,9 +1651,10 @@ def play_stage_7_kinship(state: Dict[str, Any]) -> Dict[str, Any]:
         player_choice=player_answer,
         hp_change=hp_change,
         tag=tag,
+        seed_key=make_seed_key(state, "stage7_outcome"),
     )
 
-    append_note(state, outcome["note"])  
+    append_note(state, outcome["note"], tag)
 
     # --- 紀錄 log ---
     log_entry = {
@@ -1029,11 +1718,118 @@ def generate_review(state: Dict[str, Any]) -> str:
 請依照上述規則，寫出一篇人生回顧，不要提及任何未出現在 logs 中的事件或關卡。
 """
 
-    review = call_llm(system_prompt, user_prompt, temperature=0.9)
+    review = call_llm(system_prompt, user_prompt, temperature=0.9,
+                      seed_key=make_seed_key(state, "review"))
     return review
 
-def main():
+RECAP_SYSTEM_PROMPT = (
+    "你是一款遊戲《亞洲人生存大挑戰》的結局旁白，"
+    "風格像一個很懂亞洲家庭文化的朋友，在宵夜攤邊陪玩家聊天。\n"
+    "現在只需要回顧「其中一關」，之後會和其他關的回顧串成完整的人生回顧。\n\n"
+    "【輸出要求】\n"
+    "- 使用繁體中文，60～110 字，一個段落。\n"
+    "- 開頭用「第X關，」點出是哪一關，說明發生什麼事、玩家做了什麼選擇、"
+    "當時可能的心情，並自然帶入當關的人生小筆記（note）。\n"
+    "- 只能根據提供的紀錄寫，不要腦補其他關卡。\n"
+    "- 可以微靠北、微自嘲，但要尊重玩家的努力，不要嘲笑玩家。\n"
+    "- 不要提到技術細節（例如：JSON、程式、分數、Log 等）。\n"
+    "- 只輸出段落本身，不要標題。"
+)
+
+
+def generate_stage_recap(log_entry: Dict[str, Any], seed_key: str = None) -> str:
+    """替單一關卡寫一段小回顧（在背景執行，玩家不用等）"""
+    user_prompt = f"""
+【這一關的紀錄】
+{json.dumps(log_entry, ensure_ascii=False)}
+
+請寫出這一關的回顧段落。
+"""
+    return call_llm(RECAP_SYSTEM_PROMPT, user_prompt, temperature=0.9, seed_key=seed_key)
+
+
+class ReviewPipeline:
+    """
+    增量人生回顧：
+    - 每關 log_entry 寫進 logs 後呼叫 submit，背景執行緒馬上寫該關小回顧
+    - 寫好的小回顧立刻 append 到 RECAP_PATH，中途當機也留得下素材
+    - 遊戲結束時 finish 只負責把各關回顧串起來，再補一段固定的收尾
+    """
+
+    def __init__(self, path: pathlib.Path = RECAP_PATH, seed_key: str = None):
+        self.path = path
+        self.seed_key = seed_key
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = []
+        self._lock = threading.Lock()
+        ensure_output_dirs()
+        self.path.write_text("", encoding="utf-8")
+
+    def submit(self, log_entry: Dict[str, Any]):
+        entry = dict(log_entry)
+        self._futures.append(self._executor.submit(tracing.bind_context(self._recap), entry))
+
+    def _recap(self, entry: Dict[str, Any]) -> str:
+        recap = generate_stage_recap(entry, seed_key=self.seed_key).strip()
+        record = {"turn": entry.get("turn"), "stage": entry.get("stage"), "recap": recap}
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return recap
+
+    def finish(self, state: Dict[str, Any]) -> str:
+        recaps = []
+        try:
+            for fut in self._futures:
+                recaps.append(fut.result())
+        except Exception as e:
+            # 有任何一關沒寫成功，就退回原本一次生成整篇的做法
+            print(f"[警告] 分關回顧生成失敗，改用完整回顧。錯誤：{e}")
+            return generate_review(state)
+        finally:
+            self._executor.shutdown(wait=False)
+
+        if not recaps or any(not r for r in recaps):
+            return generate_review(state)
+        return stitch_review(state, recaps)
+
+
+def stitch_review(state: Dict[str, Any], recaps: List[str]) -> str:
+    """把各關小回顧串成完整回顧，開頭結尾用固定模板，不再呼叫 LLM"""
+    parts = ["在這個亞洲人生存大挑戰的旅程中，你一關一關面對那些被期待、被比較、被追問的時刻。"]
+    parts.extend(recaps)
+    if state.get("end_flag") == "win":
+        parts.append(
+            f"最後你帶著 {state['hp']} 點 HP 撐完七關。就算沒有每一步都符合亞洲傳統的期待，"
+            "這些選擇也拼成了你自己版本的人生，值得好好收藏。"
+        )
+    else:
+        parts.append(
+            f"這一輪停在第 {len(state['logs'])} 關，但能走到這裡已經很不容易。"
+            "那些沒被長輩按讚的選擇，也都是你認真活過的證明。"
+        )
+    return "\n\n".join(parts)
+
+
+def main(seed: int = None):
     setup_openai()
+    # 暖機在背景跑，先啟動才能和載入快照重疊
+    warm_up_llm_backend()
+    load_warm_snapshot()
+    metrics.serve_from_env()
+    profiling.start_from_env()
+    run_session(seed)
+
+
+def run_session(seed: int = None, session_id: str = None) -> Dict[str, Any]:
+    """
+    跑完一整輪遊戲（不含 API 設定），回傳最終狀態。
+    有 session_id 時存檔、回顧檔都各自分開，同一個行程可以同時跑很多個 session（見 supervisor.py）。
+    """
+    with SESSIONS_ACTIVE.track_inprogress():
+        return _play_session(seed, session_id)
+
+
+def _play_session(seed: int, session_id: str) -> Dict[str, Any]:
     ensure_output_dirs()
 
     print("============================================")
@@ -1055,31 +1851,51 @@ def main():
     print("【小提示】")
     print("- 任何一關輸入時，只要打：note，就可以隨時翻開人生小筆記小抄。\n")
 
-    state = init_game_state()
+    state = init_game_state(seed)
+    if session_id is not None:
+        state["session_id"] = session_id
+    if state["seeded"]:
+        print(f"【固定 seed】這一輪使用 seed {state['world_seed']}，同樣的選擇會重播同樣的人生。\n")
+    review_pipeline = (
+        ReviewPipeline(session_path(RECAP_PATH, session_id), seed_key=make_seed_key(state, "recap"))
+        if INCREMENTAL_REVIEW else None
+    )
 
     # 關卡依序進行
     while state["turn"] <= MAX_TURNS and state.get("end_flag") is None and state["hp"] > 0:
+        logged = len(state["logs"])
         print("\n======================================")
         chapter = CHAPTERS[state["turn"] - 1]
         print(f" 第 {state['turn']} 關：{chapter['name']}")
         print("======================================\n")
 
-        if state["turn"] == 1:
-            state = play_stage_1_birth(state)
-        elif state["turn"] == 2:
-            state = play_stage_2_major(state)
-        elif state["turn"] == 3:
-            state = play_stage_3_job(state)
-        elif state["turn"] == 4:
-            state = play_stage_4_marriage(state)
-        elif state["turn"] == 5:
-            state = play_stage_5_children(state)
-        elif state["turn"] == 6:
-            state = play_stage_6_newyear(state)
-        elif state["turn"] == 7:
-            state = play_stage_7_kinship(state)
-        else:
-            break  # 理論上不會到這裡
+        with tracing.span("stage", turn=state["turn"], chapter=chapter["name"],
+                          session=session_id, world_seed=state["world_seed"]) as sp, \
+                SESSIONS_IN_STAGE.labels(state["turn"]).track_inprogress():
+            hp_before = state["hp"]
+            if state["turn"] == 1:
+                state = play_stage_1_birth(state)
+            elif state["turn"] == 2:
+                state = play_stage_2_major(state)
+            elif state["turn"] == 3:
+                state = play_stage_3_job(state)
+            elif state["turn"] == 4:
+                state = play_stage_4_marriage(state)
+            elif state["turn"] == 5:
+                state = play_stage_5_children(state)
+            elif state["turn"] == 6:
+                state = play_stage_6_newyear(state)
+            elif state["turn"] == 7:
+                state = play_stage_7_kinship(state)
+            else:
+                break  # 理論上不會到這裡
+            sp.set(hp_change=state["hp"] - hp_before)
+
+        if review_pipeline is not None:
+            for log_entry in state["logs"][logged:]:
+                review_pipeline.submit(log_entry)
+        # 每關寫一次筆記庫，中途當掉最多只丟掉當關的紀錄
+        NOTE_LIBRARY.flush()
 
         if state["hp"] <= 0:
             state["end_flag"] = "lose"
@@ -1105,8 +1921,15 @@ def main():
         print("你停在一個很曖昧的地方：沒有輸得很徹底，也還沒贏。")
         print("某種程度上，這好像才是最多人真實的人生狀態。")
 
+    stats = record_aggregates(state)
+    print(f"\n[系統] 目前累計 {stats.total_runs} 場，通關率 {stats.win_rate():.1%}。")
+
     # 生成人生回顧
-    review = generate_review(state)
+    with tracing.span("review", session=session_id, incremental=review_pipeline is not None):
+        if review_pipeline is not None:
+            review = review_pipeline.finish(state)
+        else:
+            review = generate_review(state)
 
     review_with_notes = review + "\n\n===== 本輪人生小筆記 =====\n"
     if state["notes"]:
@@ -1116,12 +1939,26 @@ def main():
         review_with_notes += "本輪尚無人生小筆記。\n"
 
     save_state(state)
-    save_summary(review_with_notes)
+    save_summary(review_with_notes, session_id)
+    RESPONSE_CACHE.save()
+    NOTE_LIBRARY.flush()
 
     print("\n===== 本次《亞洲人生存大挑戰》人生回顧 =====\n")
     print(review_with_notes)
 
     print("\n謝謝你讓自己認真活過這一輪。如果哪天想重開一輪，我們再來。")
+    return state
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    import datetime
+
+    parser = argparse.ArgumentParser(description="亞洲人生存大挑戰")
+    parser.add_argument("--seed", type=int, help="固定 seed，可重播同一輪人生")
+    parser.add_argument("--daily", action="store_true", help="今日挑戰：以今天日期當 seed")
+    args = parser.parse_args()
+
+    seed = args.seed
+    if args.daily:
+        seed = int(datetime.date.today().strftime("%Y%m%d"))
+    main(seed=seed)
\ No newline at end of file
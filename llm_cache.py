@@ -0,0 +1,89 @@
+"""
+LLM 回應的持久化快取
+
+key 由 (模型, system prompt, user prompt, temperature, seed_key) 雜湊而成，
+value 是 LLM 原始輸出字串。存成 append-only 的 JSONL，啟動後第一次查詢才載入。
+另外可以掛一個唯讀的 fallback（snapshot.py 的暖快取快照），本地查不到時再查它。
+固定 seed 的遊戲（見 game.make_seed_key）靠它做到「同樣輸入就重播同樣結果」。
+"""
+
+import hashlib
+import json
+import pathlib
+import threading
+from typing import Dict, Optional
+
+
+def make_key(model: str, system_prompt: str, user_prompt: str,
+             temperature: float, seed_key: str) -> str:
+    raw = json.dumps([model, system_prompt, user_prompt, temperature, seed_key],
+                     ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._data: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+        self.fallback = None      # 需要有 get(key) 與 items()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, str]:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    data = {}
+                    if self.path.exists():
+                        with self.path.open("r", encoding="utf-8") as f:
+                            for line in f:
+                                try:
+                                    record = json.loads(line)
+                                except ValueError:
+                                    continue  # 寫到一半的最後一行
+                                data[record["key"]] = record["content"]
+                    self._data = data
+        return self._data
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._load().get(key)
+        if content is None and self.fallback is not None:
+            content = self.fallback.get(key)
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: str):
+        data = self._load()
+        with self._lock:
+            if key in data:
+                return
+            data[key] = content
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n")
+
+    def update(self, items: Dict[str, str]):
+        """一次併進多筆（例如 supervisor 合併各 worker 的檔案）；本地已有的 key 不覆蓋"""
+        data = self._load()
+        with self._lock:
+            new = {k: v for k, v in items.items() if k not in data}
+            if not new:
+                return
+            data.update(new)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write("".join(json.dumps({"key": k, "content": v}, ensure_ascii=False) + "\n"
+                                for k, v in new.items()))
+
+    def items(self) -> Dict[str, str]:
+        """本地 + fallback 的所有內容（本地優先）"""
+        merged = dict(self.fallback.items()) if self.fallback is not None else {}
+        merged.update(self._load())
+        return merged
+
+    def __len__(self) -> int:
+        return len(self._load())
@@ -0,0 +1,145 @@
+"""
+大學科系分類：Aho-Corasick 多字串比對
+
+科系名稱與別名放在外部分類表（major_taxonomy.json），每一層（tier）有自己的
+tag、HP 變化與優先順序。所有關鍵字編成一個 Aho-Corasick 自動機，
+不管分類表有幾千個名稱，掃一次輸入字串就能找出所有命中。
+
+多個關鍵字同時命中時：最長的關鍵字優先，一樣長再比 tier 的 priority。
+"""
+
+import json
+import pathlib
+import unicodedata
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+# 找不到分類表檔案時用的最小內建版本（就是原本寫死在 game.py 的三組關鍵字）
+BUILTIN_TAXONOMY = {
+    "version": 1,
+    "default": {"tag": "major_other", "hp_change": -20},
+    "tiers": [
+        {"tag": "major_high_status", "hp_change": 10, "priority": 3,
+         "keywords": ["醫", "醫學", "牙醫", "藥學", "電機", "資工", "工程", "電資"]},
+        {"tag": "major_mid", "hp_change": -20, "priority": 2,
+         "keywords": ["商", "企管", "管理", "會計", "財金", "金融", "法律", "法學", "經濟"]},
+        {"tag": "major_low_status", "hp_change": -30, "priority": 1,
+         "keywords": ["美術", "藝術", "設計", "哲學", "社會", "歷史",
+                      "音樂", "戲劇", "舞蹈", "體育"]},
+    ],
+}
+
+
+def normalize_major(text: str) -> str:
+    """全形轉半形、英文轉小寫、去掉空白，讓「資 工」「ＣＳ」也對得上"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if not ch.isspace())
+
+
+class AhoCorasick:
+    """
+    標準 Aho-Corasick 自動機。
+    每個節點只保留「以此結尾的最佳 pattern」（已合併 fail 鏈上的結果），
+    所以比對時每個字元只要看一次目前節點。
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[Tuple[int, int, Any]]] = [None]   # (長度, priority, 值)
+        self._built = False
+
+    @staticmethod
+    def _better(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return a if a[:2] >= b[:2] else b
+
+    def add(self, pattern: str, priority: int, value: Any):
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        self._best[node] = self._better(self._best[node], (len(pattern), priority, value))
+        self._built = False
+
+    def build(self):
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fail = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fail if fail != nxt else 0
+                self._best[nxt] = self._better(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+        self._built = True
+
+    def best_match(self, text: str) -> Optional[Any]:
+        """回傳 text 中最長（同長比 priority）的命中 pattern 對應的值"""
+        if not self._built:
+            self.build()
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best_at[node] is not None:
+                best = self._better(best, best_at[node])
+        return None if best is None else best[2]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class MajorClassifier:
+    def __init__(self, taxonomy: Dict[str, Any]):
+        default = taxonomy.get("default", BUILTIN_TAXONOMY["default"])
+        self.default = (int(default["hp_change"]), str(default["tag"]))
+        self.scores: Dict[str, int] = {self.default[1]: self.default[0]}
+        self.keyword_count = 0
+        self._automaton = AhoCorasick()
+        for tier in taxonomy.get("tiers", []):
+            tag = str(tier["tag"])
+            hp_change = int(tier["hp_change"])
+            self.scores[tag] = hp_change
+            for keyword in tier.get("keywords", []):
+                self._automaton.add(normalize_major(keyword), int(tier.get("priority", 0)),
+                                    (hp_change, tag))
+                self.keyword_count += 1
+        self._automaton.build()
+
+    @classmethod
+    def from_file(cls, path: pathlib.Path) -> "MajorClassifier":
+        path = pathlib.Path(path)
+        if not path.exists():
+            return cls(BUILTIN_TAXONOMY)
+        with path.open("r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def match(self, major_text: str) -> Optional[Tuple[int, str]]:
+        """命中分類表回傳 (hp_change, tag)，沒命中回傳 None"""
+        return self._automaton.best_match(normalize_major(major_text))
+
+    def score_of(self, tag: str) -> Tuple[int, str]:
+        """把 tag（例如 LLM 判出來的）換回 (hp_change, tag)，不認得的當 default"""
+        if tag in self.scores:
+            return self.scores[tag], tag
+        return self.default
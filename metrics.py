@@ -0,0 +1,333 @@
+"""
+遊戲主機的即時指標（Prometheus 文字格式）
+
+輕量版的 counter / gauge / 固定 bucket histogram：
+- 熱路徑上每次更新只是一把鎖加一次數字運算，不配置新物件（label 組合第一次出現時除外）
+- 快取命中率這類本來就有計數器的東西，用 callback 在抓取時才讀，平常零成本
+- 設了環境變數 GAME_METRICS_PORT 才會開 HTTP 服務，GET /metrics 取得文字格式；
+  http.server 到這時才 import（要 30~40ms），沒開服務的遊戲不用付這個啟動成本
+
+用法：
+  REQUESTS = metrics.counter("game_requests_total", "說明", ["site"])
+  REQUESTS.labels("stage3").inc()
+  with LATENCY.labels("stage3").time(): ...
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_PORT_ENV = "GAME_METRICS_PORT"
+
+# LLM 延遲（秒）與存檔延遲（秒）共用的預設 bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    # Prometheus 文字格式的特殊值寫法是 NaN / +Inf / -Inf（Python 的 repr 是 nan / inf）
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _InProgress:
+    __slots__ = ("_child",)
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._child.inc()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.dec()
+        return False
+
+
+class _Timer:
+    __slots__ = ("_child", "_t0")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class _ValueChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def track_inprogress(self) -> _InProgress:
+        return _InProgress(self)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最後一格是 +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要 label：{self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in list(self._children.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def track_inprogress(self) -> _InProgress:
+        return _InProgress(self._default)
+
+    def get(self) -> float:
+        return self._default.value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return _Timer(self._default)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """抓取時才呼叫 fn 取值（fn 回傳 {label 值 tuple: 數值}）"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[Tuple[str, ...], float]], kind: str = "gauge"):
+        self.kind = kind
+        self._fn = fn
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def _samples(self) -> List[str]:
+        try:
+            values = self._fn()
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def callback(name: str, help_text: str, labelnames: Sequence[str],
+             fn: Callable[[], Dict[Tuple[str, ...], float]], kind: str = "gauge") -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, help_text, labelnames, fn, kind))
+
+
+# ======== HTTP 服務 ========
+
+def _make_handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # 不要把每次抓取都印到遊戲畫面上
+
+    return _Handler
+
+
+_server = None    # http.server.ThreadingHTTPServer
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """在背景執行緒開 HTTP 服務，回傳 ThreadingHTTPServer"""
+    global _server
+    if _server is None:
+        from http.server import ThreadingHTTPServer
+        _server = ThreadingHTTPServer((host, port), _make_handler())
+        thread = threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+    return _server
+
+
+def serving() -> bool:
+    """HTTP 服務開了沒（沒開就沒人會抓指標，呼叫端可以省掉昂貴的 label 計算）"""
+    return _server is not None
+
+
+def serve_from_env(offset: int = 0) -> Optional[int]:
+    """有設 GAME_METRICS_PORT 就開 HTTP 服務（多行程時每個 worker 用 port + offset）"""
+    raw = os.environ.get(METRICS_PORT_ENV, "").strip()
+    if not raw:
+        return None
+    port = int(raw) + offset
+    try:
+        start_http_server(port)
+    except OSError as e:
+        print(f"[警告] 指標服務無法在 port {port} 啟動：{e}")
+        return None
+    print(f"[系統] 指標服務：http://127.0.0.1:{port}/metrics")
+    return port
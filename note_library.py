@@ -0,0 +1,286 @@
+"""
+跨場次共用的人生小筆記庫（MinHash / LSH 近似去重）
+
+LLM 很容易寫出換句話說的同一句話（「不是我不行，是世界太難搞」的各種變體）。
+這裡把每則筆記切成字元 shingle、算 MinHash 簽章，再用 LSH 分桶：
+- 新筆記只跟同桶的候選比對，近似重複的直接擋下（並替原本那則加一次 hits）
+- 依 tag 記住 hits 最多的筆記，LLM 沒給 note 時可以直接拿來用，不必再補呼叫
+
+資料存成 append-only JSONL，簽章以 base64 存下，重新啟動不需要重算。
+新增 / 命中的紀錄先放在記憶體裡，每關結束與場次結束時由 flush() 一次寫進檔案；
+紀錄行數超過筆記數的 COMPACT_RATIO 倍時，改成把每則筆記（含累計 hits）重寫成一個新檔。
+每則筆記有一個由內容算出的穩定 id（note_id），hit 紀錄以 id 指向筆記，
+不依賴在清單裡的位置（暖快取快照併進來、沒寫進檔案的筆記不會讓位置錯開）。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import pathlib
+import random
+import threading
+import unicodedata
+import zlib
+from array import array
+from typing import Dict, Any, List, Optional, Set
+
+SHINGLE_SIZE = 2
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+DUPLICATE_THRESHOLD = 0.6
+COMPACT_RATIO = 4           # 檔案行數 > 筆記數 × 這個倍數就壓實
+COMPACT_MIN_LINES = 256
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240101)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize_note(text: str) -> str:
+    """全形轉半形、去掉空白與標點符號，只留下字本身"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(
+        ch for ch in text
+        if not ch.isspace() and not unicodedata.category(ch).startswith(("P", "S"))
+    )
+
+
+def char_shingles(text: str, k: int = SHINGLE_SIZE) -> Set[str]:
+    text = normalize_note(text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(shingles: Set[str]) -> array:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles] or [0]
+    return array("I", (min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS))
+
+
+def estimate_similarity(sig_a: array, sig_b: array) -> float:
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / NUM_PERM
+
+
+def note_id(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _band_keys(sig: array) -> List[int]:
+    # int tuple 的 hash 不受 PYTHONHASHSEED 影響，但這裡只存在記憶體，不落地
+    return [hash((band,) + tuple(sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
+            for band in range(LSH_BANDS)]
+
+
+class NoteLibrary:
+    def __init__(self, path: pathlib.Path, threshold: float = DUPLICATE_THRESHOLD):
+        self.path = pathlib.Path(path)
+        self.threshold = threshold
+        self._notes: List[Dict[str, Any]] = []       # {"id", "text", "tag", "hits", "sig", "persisted"}
+        self._by_id: Dict[str, int] = {}
+        self._buckets: Dict[int, List[int]] = {}
+        self._best_by_tag: Dict[str, int] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._log_lines = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # ---- 載入 / 儲存 ----
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path.exists():
+                with self.path.open("r", encoding="utf-8") as f:
+                    for line in f:
+                        self._log_lines += 1
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # 寫到一半的最後一行
+                        if record.get("op") == "hit":
+                            idx = record.get("id")
+                            # 舊格式的 hit 記的是清單位置（載入期間位置與檔案順序一致）
+                            if not isinstance(idx, int):
+                                idx = self._by_id.get(idx)
+                            if idx is not None and 0 <= idx < len(self._notes):
+                                self._bump(idx)
+                        else:
+                            sig = array("I")
+                            sig.frombytes(base64.b64decode(record["sig"]))
+                            self._insert(record["text"], record.get("tag", ""), sig,
+                                         hits=int(record.get("hits", 1)))
+            self._loaded = True
+
+    @staticmethod
+    def _add_record(note: Dict[str, Any]) -> Dict[str, Any]:
+        return {"op": "add", "id": note["id"], "text": note["text"], "tag": note["tag"],
+                "hits": note["hits"], "sig": base64.b64encode(note["sig"].tobytes()).decode("ascii")}
+
+    def _append(self, record: Dict[str, Any]):
+        self._pending.append(record)
+
+    def flush(self):
+        """把累積的紀錄寫進檔案；紀錄比筆記多太多時順便壓實"""
+        with self._lock:
+            if not self._pending:
+                return
+            persisted = sum(1 for note in self._notes if note["persisted"])
+            lines = self._log_lines + len(self._pending)
+            if lines > COMPACT_MIN_LINES and lines > persisted * COMPACT_RATIO:
+                self.compact()
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._pending))
+            self._log_lines = lines
+            self._pending.clear()
+
+    def compact(self):
+        """把寫進過檔案的筆記（含累計 hits）重寫成每則一行的新檔"""
+        self._ensure_loaded()
+        with self._lock:
+            records = [self._add_record(note) for note in self._notes if note["persisted"]]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            os.replace(tmp, self.path)
+            self._log_lines = len(records)
+            self._pending.clear()
+
+    # ---- 索引 ----
+
+    def _insert(self, text: str, tag: str, sig: array, hits: int = 1, persisted: bool = True) -> int:
+        idx = len(self._notes)
+        nid = note_id(text)
+        self._notes.append({"id": nid, "text": text, "tag": tag, "hits": max(1, hits) - 1,
+                            "sig": sig, "persisted": persisted})
+        self._by_id[nid] = idx
+        for key in _band_keys(sig):
+            self._buckets.setdefault(key, []).append(idx)
+        # hits 先少算一，_bump 補回來並順便更新該 tag 的代表筆記
+        self._bump(idx)
+        return idx
+
+    def _bump(self, idx: int):
+        note = self._notes[idx]
+        note["hits"] += 1
+        tag = note["tag"]
+        if tag:
+            best = self._best_by_tag.get(tag)
+            if best is None or note["hits"] > self._notes[best]["hits"]:
+                self._best_by_tag[tag] = idx
+
+    def _find(self, sig: array) -> Optional[int]:
+        seen = set()
+        best_idx, best_sim = None, 0.0
+        for key in _band_keys(sig):
+            for idx in self._buckets.get(key, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                sim = estimate_similarity(sig, self._notes[idx]["sig"])
+                if sim >= self.threshold and sim > best_sim:
+                    best_idx, best_sim = idx, sim
+        return best_idx
+
+    # ---- 對外 API ----
+
+    def find_near_duplicate(self, text: str) -> Optional[str]:
+        self._ensure_loaded()
+        sig = minhash(char_shingles(text))
+        with self._lock:
+            idx = self._find(sig)
+            return None if idx is None else self._notes[idx]["text"]
+
+    def add(self, text: str, tag: str = "") -> bool:
+        """
+        收進筆記庫；回傳 True 表示是新筆記。
+        近似重複的不會新增，而是替既有那則加一次 hits（愈常被寫出來的愈有代表性）。
+        """
+        text = (text or "").strip()
+        if not normalize_note(text):
+            return False
+        self._ensure_loaded()
+        sig = minhash(char_shingles(text))
+        with self._lock:
+            idx = self._find(sig)
+            if idx is not None:
+                self._bump(idx)
+                note = self._notes[idx]
+                if note["persisted"]:
+                    self._append({"op": "hit", "id": note["id"]})
+                else:
+                    # 快照併進來的筆記第一次被用到時才寫進檔案（連同累計的 hits）
+                    note["persisted"] = True
+                    self._append(self._add_record(note))
+                return False
+            idx = self._insert(text, tag, sig)
+            self._append(self._add_record(self._notes[idx]))
+            return True
+
+    def best_for_tag(self, tag: str) -> Optional[str]:
+        """同一個 tag 裡 hits 最多的筆記"""
+        self._ensure_loaded()
+        with self._lock:
+            idx = self._best_by_tag.get(tag)
+            return None if idx is None else self._notes[idx]["text"]
+
+    def records(self) -> List[Dict[str, Any]]:
+        """所有筆記（id / text / tag / hits / sig），給暖快取快照用"""
+        self._ensure_loaded()
+        with self._lock:
+            return [dict(note) for note in self._notes]
+
+    def seed(self, records: List[Dict[str, Any]]):
+        """
+        把別處（例如暖快取快照）的筆記併進記憶體裡的索引；先不寫進本地的 library 檔，
+        之後被 add 命中時才連同 hits 寫進去。和本地已有的筆記近似重複的就跳過。
+        """
+        self._ensure_loaded()
+        with self._lock:
+            for record in records:
+                if self._find(record["sig"]) is not None:
+                    continue
+                self._insert(record["text"], record.get("tag", ""), record["sig"],
+                             hits=int(record.get("hits", 1)), persisted=False)
+
+    def merge(self, sources: List[List[Dict[str, Any]]]):
+        """
+        併進幾份從這個筆記庫分出去的紀錄（例如 supervisor 合併各 worker 的筆記庫）。
+        每份的 hits 都包含分出去時的基準，只把各自多出來的部分加回來；合併完呼叫 compact() 寫回檔案。
+        """
+        self._ensure_loaded()
+        with self._lock:
+            base = {note["id"]: note["hits"] for note in self._notes}
+            for records in sources:
+                for record in records:
+                    idx = self._by_id.get(record["id"])
+                    if idx is None:
+                        idx = self._find(record["sig"])
+                    if idx is None:
+                        self._insert(record["text"], record.get("tag", ""), record["sig"],
+                                     hits=int(record.get("hits", 1)))
+                        continue
+                    note = self._notes[idx]
+                    gained = int(record.get("hits", 1)) - base.get(note["id"], 0)
+                    if gained > 0:
+                        note["hits"] += gained - 1
+                        self._bump(idx)
+                        note["persisted"] = True
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._notes)
+
+
+def is_near_duplicate(text: str, others: List[str], threshold: float = DUPLICATE_THRESHOLD) -> bool:
+    """小清單用的直接比對（例如同一場遊戲裡的筆記）"""
+    sig = minhash(char_shingles(text))
+    return any(estimate_similarity(sig, minhash(char_shingles(o))) >= threshold for o in others)
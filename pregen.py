@@ -0,0 +1,199 @@
+"""
+離線批次預先生成內容
+
+把各關的出題 / 選項生成搬出互動流程：
+1. write：為每種生成器寫出 JSONL 批次請求檔（OpenAI Batch API 格式）
+2. 交給任何批次執行器跑；沒有的話可用 run-local 在本機逐筆呼叫當替身
+3. ingest：讀回結果 JSONL，驗證後存進 ContentStore，遊戲執行時各關直接取用
+
+用法：
+  python pregen.py write [--kinds jobs,partners,newyear,kinship] [--count 50] [--out 目錄]
+  python pregen.py run-local <requests.jsonl> <results.jsonl>
+  python pregen.py ingest <results.jsonl...> [--store 目錄]
+  python pregen.py stats [--store 目錄]
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+from typing import Dict, Any, Optional
+
+import content_store
+import game
+
+DEFAULT_BATCH_DIR = game.OUTPUT_DIR / "batch"
+
+
+def _validate_newyear(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not isinstance(data, dict):
+        return None
+    question = str(data.get("question", "")).strip()
+    difficulty = str(data.get("difficulty", "")).strip().lower()
+    if not question or difficulty not in game.DIFFICULTY_SCORES:
+        return None
+    return game.normalize_newyear_question(data)
+
+
+def _validate_options(key: str):
+    def _validate(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        options = game.validate_option_list(data, key)
+        return {key: options} if options else None
+    return _validate
+
+
+# kind → (system prompt, user prompt, temperature, 驗證函式)
+GENERATORS = {
+    "jobs": (game.JOB_SYSTEM_PROMPT, game.JOB_USER_PROMPT, 0.8, _validate_options("jobs")),
+    "partners": (game.PARTNER_SYSTEM_PROMPT, game.PARTNER_USER_PROMPT, 0.8,
+                 _validate_options("partners")),
+    "newyear": (game.NEWYEAR_SYSTEM_PROMPT, game.NEWYEAR_USER_PROMPT, 0.9, _validate_newyear),
+    "kinship": (game.KINSHIP_SYSTEM_PROMPT, game.KINSHIP_USER_PROMPT, 0.9,
+                game.validate_kinship_question),
+}
+
+
+def build_request(kind: str, index: int) -> Dict[str, Any]:
+    system_prompt, user_prompt, temperature, _ = GENERATORS[kind]
+    return {
+        "custom_id": f"{kind}-{index:06d}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": game.MODEL_NAME,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": temperature,
+        },
+    }
+
+
+def write_batches(kinds, count: int, out_dir: pathlib.Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for kind in kinds:
+        path = out_dir / f"{kind}.requests.jsonl"
+        with path.open("w", encoding="utf-8") as f:
+            for i in range(count):
+                f.write(json.dumps(build_request(kind, i), ensure_ascii=False) + "\n")
+        print(f"[系統] 已寫出 {count} 筆 {kind} 批次請求：{path}")
+
+
+def run_local(requests_path: pathlib.Path, results_path: pathlib.Path):
+    """本機替身執行器：逐筆呼叫 LLM，輸出與 Batch API 相同格式的結果檔"""
+    game.setup_openai()
+    done = 0
+    with requests_path.open("r", encoding="utf-8") as src, \
+            results_path.open("w", encoding="utf-8") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            messages = req["body"]["messages"]
+            record = {"custom_id": req["custom_id"], "response": None, "error": None}
+            try:
+                content = game.call_llm(messages[0]["content"], messages[1]["content"],
+                                        temperature=req["body"].get("temperature", 0.7))
+                record["response"] = {
+                    "status_code": 200,
+                    "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                }
+            except Exception as e:
+                record["error"] = {"message": str(e)}
+            dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+            done += 1
+    print(f"[系統] 本機執行完成 {done} 筆：{results_path}")
+
+
+def extract_content(record: Dict[str, Any]) -> Optional[str]:
+    """支援 Batch API 輸出格式，也接受簡化的 {"custom_id", "content"}"""
+    if "content" in record:
+        return str(record["content"])
+    response = record.get("response") or {}
+    if response.get("status_code", 200) != 200:
+        return None
+    try:
+        return response["body"]["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def ingest(results_paths, store: content_store.ContentStore):
+    stats = {"added": 0, "duplicate": 0, "invalid": 0}
+    for path in results_paths:
+        with pathlib.Path(path).open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 下載中斷、被截斷的那一行算不合格，其餘照樣匯入
+                    stats["invalid"] += 1
+                    continue
+                if not isinstance(record, dict):
+                    stats["invalid"] += 1
+                    continue
+                kind = str(record.get("custom_id", "")).rsplit("-", 1)[0]
+                content = extract_content(record)
+                if kind not in GENERATORS or content is None:
+                    stats["invalid"] += 1
+                    continue
+                try:
+                    data = game.parse_llm_json(content)
+                except ValueError:
+                    stats["invalid"] += 1
+                    continue
+                validated = GENERATORS[kind][3](data)
+                if validated is None:
+                    stats["invalid"] += 1
+                elif store.add(kind, validated):
+                    stats["added"] += 1
+                else:
+                    stats["duplicate"] += 1
+    print(f"[系統] 匯入完成：新增 {stats['added']}、重複 {stats['duplicate']}、"
+          f"不合格 {stats['invalid']}")
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="離線批次預先生成內容")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_write = sub.add_parser("write", help="寫出 JSONL 批次請求")
+    p_write.add_argument("--kinds", default=",".join(GENERATORS))
+    p_write.add_argument("--count", type=int, default=50)
+    p_write.add_argument("--out", default=str(DEFAULT_BATCH_DIR))
+
+    p_local = sub.add_parser("run-local", help="本機逐筆執行批次請求")
+    p_local.add_argument("requests")
+    p_local.add_argument("results")
+
+    p_ingest = sub.add_parser("ingest", help="驗證結果並匯入內容庫")
+    p_ingest.add_argument("results", nargs="+")
+    p_ingest.add_argument("--store", default=str(game.CONTENT_DIR))
+
+    p_stats = sub.add_parser("stats", help="顯示內容庫數量")
+    p_stats.add_argument("--store", default=str(game.CONTENT_DIR))
+
+    args = parser.parse_args(argv)
+    if args.cmd == "write":
+        kinds = [k for k in args.kinds.split(",") if k]
+        unknown = [k for k in kinds if k not in GENERATORS]
+        if unknown:
+            parser.error(f"不認得的生成器：{', '.join(unknown)}")
+        write_batches(kinds, args.count, pathlib.Path(args.out))
+    elif args.cmd == "run-local":
+        run_local(pathlib.Path(args.requests), pathlib.Path(args.results))
+    elif args.cmd == "ingest":
+        ingest(args.results, content_store.ContentStore(args.store))
+    elif args.cmd == "stats":
+        store = content_store.ContentStore(args.store)
+        for kind in content_store.KINDS:
+            print(f"{kind}: {store.count(kind)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
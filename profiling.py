@@ -0,0 +1,398 @@
+"""
+長時間執行的遊戲主機用的配置 / CPU 剖析模式（預設關閉）
+
+開啟後在一個時間窗內同時做兩件事：
+- tracemalloc：開始與結束各拍一張快照，比較兩者差異，看這段時間多留下了哪些配置
+- 取樣式 CPU 剖析：背景執行緒每 PROFILE_INTERVAL_MS 看一次所有執行緒的呼叫堆疊
+  （sys._current_frames），依該執行緒這段時間實際用掉的 CPU 時間加權；
+  卡在等待（鎖、socket、玩家輸入）的執行緒不會被算進去
+
+兩者都歸到「關卡 × 呼叫位置」：
+- 關卡：堆疊上最外層的 play_stage_*；不在關卡裡的算「關卡外」，背景執行緒標上執行緒名稱
+- 呼叫位置：堆疊上最內層、屬於 game.py 的函式與行號（例如 generate_outcome_text:612）
+
+報表同時寫成 JSON 與排序固定的文字檔，兩次剖析可以直接 diff：
+  python profiling.py diff <舊.json> <新.json>
+
+開關（環境變數）：
+  GAME_PROFILE=<輸出資料夾>     開啟，main() 一開始就啟動
+  GAME_PROFILE_SECONDS=60      只剖析前 60 秒（不設就剖析到程式結束）
+"""
+
+import argparse
+import ast
+import atexit
+import json
+import linecache
+import os
+import pathlib
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+PROFILE_ENV = "GAME_PROFILE"
+PROFILE_SECONDS_ENV = "GAME_PROFILE_SECONDS"
+PROFILE_INTERVAL_MS = 5
+TRACEMALLOC_FRAMES = 32
+REPORT_TOP = 40
+
+GAME_FILE = "game.py"
+OUTSIDE_STAGE = "關卡外"
+
+# 這些函式在堆疊最內層時，代表執行緒只是在等（不佔 CPU）
+# （只在沒辦法量每條執行緒 CPU 時間的平台上用得到）
+IDLE_LEAVES = {
+    "wait", "_wait_for_tstate_lock", "select", "poll", "accept", "readinto", "recv_into",
+    "readline", "get", "_recv", "recv", "read", "sleep", "get_player_input", "serve_forever",
+    "_worker",
+}
+
+
+# ======== 行號 → 函式名稱（tracemalloc 的 traceback 只有檔名與行號） ========
+
+_func_index: Dict[str, List[Tuple[int, int, str]]] = {}
+
+
+def _function_at(filename: str, lineno: int) -> Optional[str]:
+    index = _func_index.get(filename)
+    if index is None:
+        index = []
+        try:
+            source = "".join(linecache.getlines(filename))
+            for node in ast.walk(ast.parse(source)):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    index.append((node.lineno, node.end_lineno or node.lineno, node.name))
+        except (SyntaxError, ValueError):
+            pass
+        # 內層函式的範圍比較小，排前面先比對
+        index.sort(key=lambda item: item[1] - item[0])
+        _func_index[filename] = index
+    for start, end, name in index:
+        if start <= lineno <= end:
+            return name
+    return None
+
+
+def _is_game_file(filename: str) -> bool:
+    return os.path.basename(filename) == GAME_FILE
+
+
+def _thread_group(name: str) -> str:
+    """ThreadPoolExecutor-3_0、speculate_1 → ThreadPoolExecutor、speculate，兩次剖析的鍵才對得起來"""
+    return re.sub(r"[-_]\d+", "", name.split(" (")[0])
+
+
+def _attribute(frames: List[Tuple[str, int, Optional[str]]], thread_name: str) -> Tuple[str, str]:
+    """frames 由內往外：(檔名, 行號, 函式名)；回傳 (關卡, 呼叫位置)"""
+    site = None
+    stage = None
+    for filename, lineno, func in frames:
+        if _is_game_file(filename):
+            func = func or _function_at(filename, lineno) or "?"
+            if site is None:
+                site = f"{func}:{lineno}"
+            if func.startswith("play_stage_"):
+                stage = func
+    if stage is None:
+        stage = OUTSIDE_STAGE if thread_name == "MainThread" else f"{OUTSIDE_STAGE}（{_thread_group(thread_name)}）"
+    if site is None:
+        filename, lineno, func = frames[0] if frames else ("?", 0, "?")
+        site = f"{os.path.basename(filename)}:{func or _function_at(filename, lineno) or '?'}"
+    return stage, site
+
+
+# ======== 取樣式 CPU 剖析 ========
+
+class SamplingProfiler:
+    """
+    每次取樣時，樣本的權重是該執行緒從上次取樣到現在實際用掉的 CPU 時間
+    （time.pthread_getcpuclockid）；卡在 C 呼叫裡等 socket / 鎖的執行緒權重是 0。
+    平台不支援時退回「一個樣本算一個間隔」，並用 IDLE_LEAVES 略過明顯在等待的樣本。
+    """
+
+    def __init__(self, interval_s: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval_s = interval_s
+        self.samples = 0
+        self.idle = 0
+        self.cpu_s = 0.0
+        self.by_site: Counter = Counter()
+        self.by_leaf: Counter = Counter()
+        self.per_thread_cpu = hasattr(time, "pthread_getcpuclockid")
+        self._clocks: Dict[int, Tuple[int, float]] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                weight = self._cpu_since_last(tid)
+                if weight is None:
+                    continue
+                self._sample(frame, names.get(tid, "?"), weight)
+            # 已結束的執行緒不再追蹤
+            for tid in [t for t in self._clocks if t not in names]:
+                del self._clocks[tid]
+
+    def _cpu_since_last(self, tid: int) -> Optional[float]:
+        if not self.per_thread_cpu:
+            return self.interval_s
+        try:
+            if tid not in self._clocks:
+                clock = time.pthread_getcpuclockid(tid)
+                self._clocks[tid] = (clock, time.clock_gettime(clock))
+                return None
+            clock, last = self._clocks[tid]
+            now = time.clock_gettime(clock)
+        except (OSError, OverflowError):
+            self.per_thread_cpu = False
+            return self.interval_s
+        self._clocks[tid] = (clock, now)
+        return now - last
+
+    def _sample(self, frame, thread_name: str, weight: float):
+        leaf = frame.f_code
+        if weight <= 0 or (not self.per_thread_cpu and leaf.co_name in IDLE_LEAVES):
+            self.idle += 1
+            return
+        frames = []
+        f = frame
+        while f is not None:
+            frames.append((f.f_code.co_filename, f.f_lineno, f.f_code.co_name))
+            f = f.f_back
+        self.samples += 1
+        self.cpu_s += weight
+        self.by_site[_attribute(frames, thread_name)] += weight
+        self.by_leaf[f"{os.path.basename(leaf.co_filename)}:{leaf.co_name}"] += weight
+
+
+# ======== 配置剖析 ========
+
+def _alloc_by_site(start: tracemalloc.Snapshot, end: tracemalloc.Snapshot) -> Dict[Tuple[str, str], List[int]]:
+    """結束快照比開始快照多出來的配置，依 (關卡, 呼叫位置) 加總：[bytes, 個數]"""
+    result: Dict[Tuple[str, str], List[int]] = {}
+    for stat in end.compare_to(start, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        # traceback 由舊到新排，反過來才是由內往外
+        frames = [(fr.filename, fr.lineno, None) for fr in reversed(stat.traceback)]
+        key = _attribute(frames, "MainThread")
+        acc = result.setdefault(key, [0, 0])
+        acc[0] += stat.size_diff
+        acc[1] += max(0, stat.count_diff)
+    return result
+
+
+def _alloc_by_line(start: tracemalloc.Snapshot, end: tracemalloc.Snapshot) -> List[Tuple[str, int, int]]:
+    lines = []
+    for stat in end.compare_to(start, "lineno")[:REPORT_TOP]:
+        if stat.size_diff <= 0:
+            continue
+        fr = stat.traceback[0]
+        lines.append((f"{os.path.basename(fr.filename)}:{fr.lineno}", stat.size_diff, stat.count_diff))
+    return lines
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    """剖析器自己的配置不算進去"""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+
+
+# ======== 開始 / 結束 ========
+
+class ProfileSession:
+    """
+    一個剖析時間窗（start 到 stop）。報表只涵蓋這個時間窗：
+    - CPU：時間窗內取到的樣本
+    - 配置：結束快照減開始快照，也就是時間窗內配置、到結束時還留著的；
+      時間窗之前就在的、或時間窗內配置又釋放掉的都不會出現
+    - 峰值：從 start 起算（start 時會重設 tracemalloc 的峰值）
+    """
+
+    def __init__(self, out_dir: pathlib.Path, interval_s: float = PROFILE_INTERVAL_MS / 1000):
+        self.out_dir = pathlib.Path(out_dir)
+        self.cpu = SamplingProfiler(interval_s)
+        self._start_snapshot = None
+        self._started_tracemalloc = False
+        self._t0 = 0.0
+        self._lock = threading.Lock()
+        self._done = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._start_snapshot = _take_snapshot()
+        self._t0 = time.perf_counter()
+        self.cpu.start()
+
+    def stop(self) -> Optional[pathlib.Path]:
+        with self._lock:
+            if self._done:
+                return None
+            self._done = True
+        if self._start_snapshot is None:
+            return None
+        # 先停取樣執行緒再拍結束快照、停 tracemalloc：取樣途中的配置不會混進結束快照，
+        # 時間窗也在這裡收尾（之後的 CPU 與配置都不算）
+        self.cpu.stop()
+        end_snapshot = _take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        elapsed = time.perf_counter() - self._t0
+
+        report = build_report(self.cpu, self._start_snapshot, end_snapshot, elapsed, peak)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.out_dir / f"profile_{os.getpid()}_{int(time.time())}"
+        with open(f"{stem}.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        with open(f"{stem}.txt", "w", encoding="utf-8") as f:
+            f.write(format_report(report))
+        self._start_snapshot.dump(f"{stem}.start.tmsnap")
+        end_snapshot.dump(f"{stem}.end.tmsnap")
+        print(f"[系統] 剖析報表已寫到：{stem}.txt")
+        return pathlib.Path(f"{stem}.json")
+
+
+def build_report(cpu: SamplingProfiler, start: tracemalloc.Snapshot, end: tracemalloc.Snapshot,
+                 elapsed: float, peak: int) -> Dict[str, Any]:
+    total = cpu.cpu_s or 1
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "interval_ms": round(cpu.interval_s * 1000, 2),
+        "cpu_samples": cpu.samples,
+        "idle_samples": cpu.idle,
+        "cpu_ms": round(cpu.cpu_s * 1000, 1),
+        "per_thread_cpu": cpu.per_thread_cpu,
+        "tracemalloc_peak_kib": round(peak / 1024, 1),
+        "cpu": sorted(
+            ({"stage": stage, "site": site, "ms": round(w * 1000, 1), "pct": round(100 * w / total, 2)}
+             for (stage, site), w in cpu.by_site.items()),
+            key=lambda r: (-r["ms"], r["stage"], r["site"]),
+        ),
+        "cpu_leaf": [{"func": func, "ms": round(w * 1000, 1), "pct": round(100 * w / total, 2)}
+                     for func, w in sorted(cpu.by_leaf.items(), key=lambda kv: (-kv[1], kv[0]))[:REPORT_TOP]],
+        "alloc": sorted(
+            ({"stage": stage, "site": site, "kib": round(size / 1024, 1), "blocks": count}
+             for (stage, site), (size, count) in _alloc_by_site(start, end).items()),
+            key=lambda r: (-r["kib"], r["stage"], r["site"]),
+        ),
+        "alloc_lines": [{"line": line, "kib": round(size / 1024, 1), "blocks": count}
+                        for line, size, count in _alloc_by_line(start, end)],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    out = [
+        f"剖析時間 {report['elapsed_s']}s，取樣間隔 {report['interval_ms']}ms，"
+        f"CPU {report['cpu_ms']}ms（樣本 {report['cpu_samples']}，等待中略過 {report['idle_samples']}），"
+        f"tracemalloc 峰值 {report['tracemalloc_peak_kib']} KiB",
+        "",
+        "== CPU（關卡 / 呼叫位置） ==",
+    ]
+    out += [f"{r['pct']:6.2f}%  {r['ms']:9.1f}ms  {r['stage']} | {r['site']}" for r in report["cpu"][:REPORT_TOP]]
+    out += ["", "== CPU（最內層函式） =="]
+    out += [f"{r['pct']:6.2f}%  {r['ms']:9.1f}ms  {r['func']}" for r in report["cpu_leaf"]]
+    out += ["", "== 配置增加（關卡 / 呼叫位置） =="]
+    out += [f"{r['kib']:10.1f} KiB  {r['blocks']:7d}  {r['stage']} | {r['site']}" for r in report["alloc"][:REPORT_TOP]]
+    out += ["", "== 配置增加（原始碼行） =="]
+    out += [f"{r['kib']:10.1f} KiB  {r['blocks']:7d}  {r['line']}" for r in report["alloc_lines"]]
+    return "\n".join(out) + "\n"
+
+
+_session: Optional[ProfileSession] = None
+
+
+def start(out_dir: pathlib.Path, seconds: float = None) -> ProfileSession:
+    """開始剖析；給 seconds 就在時間到時自動結束並寫報表，否則等 stop() 或程式結束"""
+    global _session
+    if _session is not None:
+        return _session
+    _session = ProfileSession(out_dir)
+    _session.start()
+    atexit.register(_session.stop)
+    if seconds:
+        timer = threading.Timer(seconds, _session.stop)
+        timer.daemon = True
+        timer.start()
+    return _session
+
+
+def stop() -> Optional[pathlib.Path]:
+    return _session.stop() if _session is not None else None
+
+
+def start_from_env() -> Optional[ProfileSession]:
+    out_dir = os.environ.get(PROFILE_ENV, "").strip()
+    if not out_dir:
+        return None
+    seconds = os.environ.get(PROFILE_SECONDS_ENV, "").strip()
+    print(f"[系統] 剖析模式開啟，報表會寫到 {out_dir}")
+    return start(pathlib.Path(out_dir), float(seconds) if seconds else None)
+
+
+# ======== 比較兩份報表 ========
+
+def diff_reports(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    lines = ["== CPU 佔比變化（百分點） =="]
+    old_cpu = {(r["stage"], r["site"]): r["pct"] for r in old["cpu"]}
+    new_cpu = {(r["stage"], r["site"]): r["pct"] for r in new["cpu"]}
+    deltas = [(new_cpu.get(k, 0.0) - old_cpu.get(k, 0.0), k) for k in set(old_cpu) | set(new_cpu)]
+    for delta, (stage, site) in sorted(deltas, key=lambda d: (-abs(d[0]), d[1]))[:REPORT_TOP]:
+        if abs(delta) >= 0.01:
+            lines.append(f"{delta:+7.2f}  {stage} | {site}")
+
+    lines += ["", "== 配置增加變化（KiB） =="]
+    old_alloc = {(r["stage"], r["site"]): r["kib"] for r in old["alloc"]}
+    new_alloc = {(r["stage"], r["site"]): r["kib"] for r in new["alloc"]}
+    deltas = [(new_alloc.get(k, 0.0) - old_alloc.get(k, 0.0), k) for k in set(old_alloc) | set(new_alloc)]
+    for delta, (stage, site) in sorted(deltas, key=lambda d: (-abs(d[0]), d[1]))[:REPORT_TOP]:
+        if abs(delta) >= 0.1:
+            lines.append(f"{delta:+10.1f}  {stage} | {site}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="剖析報表工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_show = sub.add_parser("show", help="把 JSON 報表印成文字")
+    p_show.add_argument("report")
+    p_diff = sub.add_parser("diff", help="比較兩份 JSON 報表")
+    p_diff.add_argument("old")
+    p_diff.add_argument("new")
+    args = parser.parse_args()
+
+    if args.cmd == "show":
+        with open(args.report, "r", encoding="utf-8") as f:
+            print(format_report(json.load(f)), end="")
+    else:
+        with open(args.old, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        print("\n".join(diff_reports(old, new)))
+
+
+if __name__ == "__main__":
+    main()
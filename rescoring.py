@@ -0,0 +1,276 @@
+"""
+假設性重新計分：用另一套計分表重算歷史存檔
+
+讀 analytics.py 的欄式 store（tag、difficulty、is_correct、answer_style、hp_change…），
+把候選計分表一次套到所有場次（NumPy 向量化，不呼叫 LLM）：
+- 重新算每一關的 hp_change → 每場分段累加出新的 hp_after
+- 找出新的死亡關卡與 end_flag
+- 和存檔原本的結果比較：通關率、死亡關卡分布、結局轉移
+
+候選計分表是 JSON，每一段都可省略（省略 = 沿用存檔裡原本的數值）：
+  {
+    "initial_hp": 100,
+    "difficulty_scores": {"low": {"correct": 1, "wrong": -65}, ...},   第六、七關
+    "tag_hp": {"male_default": -10, "major_mid": -20, "child_none": -25, ...},
+    "hidden_hp": {"scale": 1.0, "offset": 0, "min": -45, "max": 20}     第三、四關
+  }
+tag_hp 對任何一關都有效，而且優先於 hidden_hp 的換算。
+
+注意：存檔的 logs 在玩家死掉的那一關就停了。原本死掉、換了計分表後在最後一筆紀錄
+還活著的場次，後面幾關怎麼走無從得知，會另外算成「無法判定」，
+通關率同時列出把它們全當輸 / 全當贏的上下界。
+
+用法：
+  python rescoring.py dump-current [--out 計分表.json]    # 匯出目前遊戲用的計分表當起點
+  python rescoring.py run <store 目錄> <計分表.json> [--json 結果.json]
+需要 numpy（pip install numpy）。
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+import time
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+import analytics
+
+# 第三、四關的 hidden_hp 由 LLM 生成，只能用整體換算規則調整
+HIDDEN_HP_STAGES = (3, 4)
+
+# 與 game.py 第一、五關寫死的數值一致，dump-current 用
+FIXED_STAGE_TAGS = {
+    "male_default": -10,
+    "female_hard_mode": -10000,
+    "non_binary": -99,
+    "child_one": 0,
+    "child_two": 10,
+    "child_none": -25,
+}
+
+# 重算後的結局代碼：沿用 save_format.END_FLAG_CODES 的 0 / 1 / 2，另外加一個無法判定
+UNKNOWN_FLAG = 3
+FLAG_NAMES = {0: "未結束", 1: "win", 2: "lose", UNKNOWN_FLAG: "無法判定"}
+
+
+def load_table(path: pathlib.Path) -> Dict[str, Any]:
+    with pathlib.Path(path).open("r", encoding="utf-8") as f:
+        table = json.load(f)
+    unknown = set(table) - {"initial_hp", "difficulty_scores", "tag_hp", "hidden_hp"}
+    if unknown:
+        raise ValueError(f"計分表有不認得的欄位：{sorted(unknown)}")
+    for difficulty in table.get("difficulty_scores", {}):
+        if difficulty not in analytics.DIFFICULTIES:
+            raise ValueError(f"不認得的難度：{difficulty}")
+    return table
+
+
+def current_table() -> Dict[str, Any]:
+    """目前遊戲實際使用的計分表（第一、二、五關的 tag 分數 + 難度表）"""
+    import game
+
+    classifier = game.get_major_classifier()
+    return {
+        "initial_hp": game.INITIAL_HP,
+        "difficulty_scores": game.DIFFICULTY_SCORES,
+        "tag_hp": {**FIXED_STAGE_TAGS, **classifier.scores},
+        "hidden_hp": {"scale": 1.0, "offset": 0, "min": -45, "max": 20},
+    }
+
+
+# ======== 向量化重算 ========
+
+def rescore_deltas(store: analytics.ColumnStore, table: Dict[str, Any]) -> np.ndarray:
+    """依候選計分表重算每一列的 hp_change（int64）"""
+    delta = np.asarray(store.column("hp_change"), dtype=np.int64).copy()
+    stage = store.column("stage_id")
+    tag_id = store.column("tag_id")
+
+    hidden = table.get("hidden_hp")
+    if hidden:
+        mask = np.isin(stage, HIDDEN_HP_STAGES)
+        scaled = np.rint(delta[mask] * float(hidden.get("scale", 1.0)) + float(hidden.get("offset", 0)))
+        lo, hi = hidden.get("min"), hidden.get("max")
+        if lo is not None or hi is not None:
+            scaled = np.clip(scaled, lo if lo is not None else -np.inf, hi if hi is not None else np.inf)
+        delta[mask] = scaled.astype(np.int64)
+
+    tag_hp = table.get("tag_hp")
+    if tag_hp:
+        # tag 名稱 → 分數的查表陣列；沒列到的 tag 維持原值
+        lut = np.zeros(len(store.tags), dtype=np.int64)
+        has = np.zeros(len(store.tags), dtype=bool)
+        for i, tag in enumerate(store.tags):
+            if tag in tag_hp:
+                lut[i], has[i] = int(tag_hp[tag]), True
+        hit = has[tag_id]
+        delta[hit] = lut[tag_id[hit]]
+
+    scores = table.get("difficulty_scores")
+    if scores:
+        difficulty = store.column("difficulty")
+        # 第七關看 is_correct，第六關看回答風格是不是 balanced
+        correct = (store.column("is_correct") == 1) | \
+                  (store.column("answer_style") == analytics.ANSWER_STYLES.index("balanced"))
+        for code, name in enumerate(analytics.DIFFICULTIES):
+            if name not in scores:
+                continue
+            rows = difficulty == code
+            delta[rows & correct] = int(scores[name]["correct"])
+            delta[rows & ~correct] = int(scores[name]["wrong"])
+    return delta
+
+
+def segmented_hp(run_id: np.ndarray, delta: np.ndarray, initial_hp: int, n_runs: int) -> np.ndarray:
+    """每場從 initial_hp 開始累加 delta（列依 run_id 連續排列），回傳未截斷的 hp_after"""
+    total = np.cumsum(delta)
+    counts = np.bincount(run_id, minlength=n_runs)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # 每場開頭之前的累計值，攤回該場的每一列後扣掉
+    before = np.zeros(n_runs, dtype=np.int64)
+    has_rows = counts > 0
+    before[has_rows] = (total - delta)[starts[has_rows]]
+    return initial_hp + total - np.repeat(before, counts)
+
+
+def outcomes(store: analytics.ColumnStore, hp_after: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    由每列的 hp_after 推出每場的死亡關卡與 end_flag。
+    遊戲在 hp <= 0 的那一關結束，所以每場只看第一個 hp <= 0 的列。
+    """
+    n_runs = store.meta["n_runs"]
+    run_id = np.asarray(store.column("run_id"), dtype=np.int64)
+    stage = store.column("stage_id")
+
+    death_stage = np.zeros(n_runs, dtype=np.int8)
+    dead_rows = np.flatnonzero(hp_after <= 0)
+    dead_runs, first = np.unique(run_id[dead_rows], return_index=True)
+    death_stage[dead_runs] = stage[dead_rows[first]]
+
+    # 每場最後一筆紀錄（列依 run_id 連續，最後一列就是最後一關）
+    counts = np.bincount(run_id, minlength=n_runs)
+    last_row = np.cumsum(counts) - 1
+    last_stage = np.where(counts > 0, stage[np.maximum(last_row, 0)], 0)
+
+    original = store.column("run_end_flag")
+    flag = np.zeros(n_runs, dtype=np.int8)
+    flag[death_stage > 0] = 2
+    alive = death_stage == 0
+    flag[alive & (last_stage >= analytics.MAX_STAGE)] = 1
+    # 原本就死在最後一筆紀錄，現在卻還活著：後面的關卡沒玩過
+    flag[alive & (last_stage < analytics.MAX_STAGE) & (original == 2)] = UNKNOWN_FLAG
+    return {"death_stage": death_stage, "end_flag": flag}
+
+
+def rescore(store: analytics.ColumnStore, table: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """回傳新的 hp_change / hp_after（每列，只算到死亡那關為止）與每場的 death_stage / end_flag"""
+    n_runs = store.meta["n_runs"]
+    run_id = np.asarray(store.column("run_id"), dtype=np.int64)
+    delta = rescore_deltas(store, table)
+    raw = segmented_hp(run_id, delta, int(table.get("initial_hp", 100)), n_runs)
+    result = outcomes(store, raw)
+    hp_after = np.maximum(raw, 0)
+    # 死掉之後的列在新計分下不會發生，標成 -1
+    played = (result["death_stage"][run_id] == 0) | (store.column("stage_id") <= result["death_stage"][run_id])
+    result["hp_change"] = np.where(played, delta, 0)
+    result["hp_after"] = np.where(played, hp_after, -1)
+    return result
+
+
+# ======== 報表 ========
+
+def _summary(end_flag: np.ndarray, death_stage: np.ndarray) -> Dict[str, Any]:
+    counts = np.bincount(end_flag, minlength=len(FLAG_NAMES))
+    wins, losses, unknown = int(counts[1]), int(counts[2]), int(counts[UNKNOWN_FLAG])
+    decided = wins + losses
+    finished = decided + unknown
+    return {
+        "flags": {FLAG_NAMES[i]: int(counts[i]) for i in FLAG_NAMES},
+        "win_rate": wins / decided if decided else 0.0,
+        "win_rate_low": wins / finished if finished else 0.0,
+        "win_rate_high": (wins + unknown) / finished if finished else 0.0,
+        "deaths_by_stage": analytics.group_count(death_stage[death_stage > 0],
+                                                 minlength=analytics.MAX_STAGE + 1)[1:].tolist(),
+    }
+
+
+def compare(store: analytics.ColumnStore, table: Dict[str, Any]) -> Dict[str, Any]:
+    original = {
+        "end_flag": np.asarray(store.column("run_end_flag"), dtype=np.int64),
+        "death_stage": outcomes(store, np.asarray(store.column("hp_after"), dtype=np.int64))["death_stage"],
+    }
+    new = rescore(store, table)
+    transitions = np.zeros((len(FLAG_NAMES), len(FLAG_NAMES)), dtype=np.int64)
+    np.add.at(transitions, (original["end_flag"], new["end_flag"].astype(np.int64)), 1)
+    return {
+        "runs": store.meta["n_runs"],
+        "rows": store.meta["n_rows"],
+        "before": _summary(original["end_flag"], original["death_stage"]),
+        "after": _summary(new["end_flag"].astype(np.int64), new["death_stage"]),
+        "transitions": {
+            f"{FLAG_NAMES[i]}→{FLAG_NAMES[j]}": int(transitions[i, j])
+            for i in FLAG_NAMES for j in FLAG_NAMES if transitions[i, j] and i != j
+        },
+    }
+
+
+def print_comparison(result: Dict[str, Any], elapsed: Optional[float] = None):
+    before, after = result["before"], result["after"]
+    timing = f"，重算花 {elapsed:.2f}s" if elapsed is not None else ""
+    print(f"共 {result['runs']} 場、{result['rows']} 筆關卡紀錄{timing}\n")
+    print(f"通關率：{before['win_rate']:.1%} → {after['win_rate']:.1%}"
+          f"（{after['win_rate'] - before['win_rate']:+.1%}）")
+    if after["flags"]["無法判定"]:
+        print(f"  其中 {after['flags']['無法判定']} 場在新計分下撐過原本的死亡關卡、結局無法判定；"
+              f"通關率介於 {after['win_rate_low']:.1%} ～ {after['win_rate_high']:.1%}")
+
+    print("\n===== 死亡關卡分布（原本 → 新） =====")
+    for stage in range(analytics.MAX_STAGE):
+        b, a = before["deaths_by_stage"][stage], after["deaths_by_stage"][stage]
+        print(f"第{analytics.STAGE_NUMERALS[stage]}關：{b} → {a}（{a - b:+d}）")
+
+    if result["transitions"]:
+        print("\n===== 結局轉移 =====")
+        for key, count in sorted(result["transitions"].items(), key=lambda kv: -kv[1]):
+            print(f"{key}：{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用候選計分表重算歷史存檔")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_dump = sub.add_parser("dump-current", help="匯出目前遊戲用的計分表")
+    p_dump.add_argument("--out", help="寫到檔案（預設印出來）")
+    p_run = sub.add_parser("run", help="套用候選計分表並和原本的結果比較")
+    p_run.add_argument("store")
+    p_run.add_argument("table")
+    p_run.add_argument("--json", help="把比較結果寫成 JSON")
+    args = parser.parse_args()
+
+    if args.cmd == "dump-current":
+        text = json.dumps(current_table(), ensure_ascii=False, indent=2)
+        if args.out:
+            pathlib.Path(args.out).write_text(text + "\n", encoding="utf-8")
+            print(f"[系統] 目前的計分表已寫到：{args.out}")
+        else:
+            print(text)
+        return 0
+
+    store = analytics.ColumnStore(args.store)
+    if not store.meta["n_runs"]:
+        print(f"[警告] {args.store} 裡沒有任何場次，先用 analytics.py ingest 匯入存檔。")
+        return 1
+    table = load_table(args.table)
+    start = time.perf_counter()
+    result = compare(store, table)
+    print_comparison(result, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n[系統] 結果已寫到：{args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
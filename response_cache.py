@@ -0,0 +1,187 @@
+"""
+LLM 判斷型呼叫的回應快取
+
+玩家在過年拷問的回答重複性很高（「還好啦」「不知道」……），每次都重新問 LLM 很浪費。
+這裡用 (prompt 模板 id, 正規化問題, 正規化回答) 當 key：
+- 正規化：全形轉半形、去空白與標點、英文轉小寫（與 note_library 相同規則）
+- 可選的近似比對：同一題底下，回答的字元 shingle Jaccard 相似度夠高也算命中
+- 容量有上限，滿了用 LFU（最少被用到的先丟，同頻率丟最舊的）淘汰，O(1)
+- 可存檔 / 載入，重開後照樣命中
+"""
+
+import json
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from note_library import normalize_note, char_shingles
+
+DEFAULT_CAPACITY = 10000
+NEAR_MATCH_THRESHOLD = 0.8
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    def __init__(self, path: pathlib.Path = None,
+                 capacity: int = DEFAULT_CAPACITY,
+                 near_threshold: float = NEAR_MATCH_THRESHOLD):
+        self.path = pathlib.Path(path) if path else None
+        self.capacity = capacity
+        self.near_threshold = near_threshold
+        self._values: Dict[Tuple[str, str, str], Any] = {}
+        self._freq: Dict[Tuple[str, str, str], int] = {}
+        self._buckets: Dict[int, OrderedDict] = {}
+        self._min_freq = 0
+        # (模板, 問題) → {回答: shingles}，給近似比對用
+        self._groups: Dict[Tuple[str, str], Dict[str, set]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(template_id: str, question: str, answer: str) -> Tuple[str, str, str]:
+        return template_id, normalize_note(question), normalize_note(answer)
+
+    # ---- LFU 內部 ----
+
+    def _touch(self, key):
+        freq = self._freq[key]
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        self._freq[key] = freq + 1
+        self._buckets.setdefault(freq + 1, OrderedDict())[key] = None
+
+    def _evict(self):
+        bucket = self._buckets[self._min_freq]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[self._min_freq]
+        del self._values[key]
+        del self._freq[key]
+        group = self._groups.get(key[:2])
+        if group is not None:
+            group.pop(key[2], None)
+            if not group:
+                del self._groups[key[:2]]
+
+    def _insert(self, key, value, freq: int = 1):
+        if key in self._values:
+            self._values[key] = value
+            return
+        if len(self._values) >= self.capacity:
+            self._evict()
+        self._values[key] = value
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+        if not self._buckets.get(self._min_freq) or freq < self._min_freq:
+            self._min_freq = freq
+        self._groups.setdefault(key[:2], {})[key[2]] = char_shingles(key[2])
+
+    # ---- 對外 API ----
+
+    def get(self, template_id: str, question: str, answer: str,
+            near: bool = True) -> Optional[Any]:
+        self._ensure_loaded()
+        key = self.make_key(template_id, question, answer)
+        with self._lock:
+            if key in self._values:
+                self._touch(key)
+                self.hits += 1
+                return self._values[key]
+            if near and self.near_threshold < 1.0:
+                shingles = char_shingles(key[2])
+                best, best_sim = None, self.near_threshold
+                for other, other_shingles in self._groups.get(key[:2], {}).items():
+                    sim = jaccard(shingles, other_shingles)
+                    if sim >= best_sim:
+                        best, best_sim = other, sim
+                if best is not None:
+                    near_key = key[:2] + (best,)
+                    self._touch(near_key)
+                    self.near_hits += 1
+                    return self._values[near_key]
+            self.misses += 1
+            return None
+
+    def put(self, template_id: str, question: str, answer: str, value: Any):
+        self._ensure_loaded()
+        key = self.make_key(template_id, question, answer)
+        with self._lock:
+            self._insert(key, value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    # ---- 持久化 ----
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self.path is None or not self.path.exists():
+                return
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    entries = json.load(f).get("entries", [])
+            except (OSError, ValueError) as e:
+                print(f"[警告] 回應快取讀取失敗，改用空的快取。錯誤：{e}")
+                return
+            for template_id, question, answer, value, freq in entries:
+                self._insert((template_id, question, answer), value, int(freq))
+
+    def entries(self) -> List[list]:
+        """[模板, 問題, 回答, 值, 次數] 的清單，save 與暖快取快照共用"""
+        self._ensure_loaded()
+        with self._lock:
+            return [list(key) + [value, self._freq[key]]
+                    for key, value in self._values.items()]
+
+    def seed(self, entries: List[list]):
+        """把別處（例如暖快取快照）的 entries 併進來；本地已有的 key 不覆蓋"""
+        self._ensure_loaded()
+        with self._lock:
+            for template_id, question, answer, value, freq in entries:
+                key = (template_id, question, answer)
+                if key not in self._values:
+                    self._insert(key, value, int(freq))
+
+    def merge(self, entries: List[list]):
+        """
+        併進另一份快取的 entries（例如 supervisor 合併各 worker 的檔案）：
+        新的 key 直接加，已有的 key 次數取兩邊較大的那個
+        """
+        self._ensure_loaded()
+        with self._lock:
+            for template_id, question, answer, value, freq in entries:
+                key = (template_id, question, answer)
+                if key not in self._values:
+                    self._insert(key, value, int(freq))
+                    continue
+                for _ in range(int(freq) - self._freq[key]):
+                    self._touch(key)
+
+    def save(self):
+        if self.path is None or not self._loaded:
+            return
+        entries = self.entries()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
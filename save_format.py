@@ -0,0 +1,367 @@
+"""
+《亞洲人生存大挑戰》二進位存檔格式
+
+JSON 存檔（ensure_ascii=False, indent=2）好讀，但大量寫入/解析很慢，
+而且想看一眼 HP 或 end_flag 也得整份 parse。這裡提供一個可選的二進位快照：
+
+單一快照（.asav）：
+    [固定長度 header]  magic / 版本 / hp / turn / world_seed / end_flag /
+                       筆記數 / log 數 / 各區段 offset
+    [notes 區段]       每則筆記：u32 長度 + UTF-8
+    [logs 區段]        先放 n 個 u32 offset（相對快照開頭），再放每筆 log：
+                       u32 長度 + 緊湊 JSON
+    [extra 區段]       u32 長度 + 緊湊 JSON（其他未列入 header 的 state 欄位）
+
+存檔彙整（.asar）：
+    [archive header]   magic / 版本
+    重複：u32 長度 + 一份完整快照
+
+讀取端可以只讀 header 拿摘要，或用 mmap 打開整個彙整檔逐筆略過，
+不需要解碼任何 log。既有 JSON 存檔仍可匯入與匯出。
+"""
+
+import json
+import mmap
+import pathlib
+import struct
+import sys
+from typing import Dict, Any, List, Iterator, Optional
+
+SNAPSHOT_MAGIC = b"ASAV"
+ARCHIVE_MAGIC = b"ASAR"
+FORMAT_VERSION = 1
+
+# magic, version, end_flag, reserved, hp, turn, world_seed,
+# n_notes, n_logs, notes_offset, logs_offset, extra_offset
+HEADER = struct.Struct("<4sBBHiiqIIIII")
+ARCHIVE_HEADER = struct.Struct("<4sBxxx")
+U32 = struct.Struct("<I")
+
+END_FLAG_CODES = {None: 0, "win": 1, "lose": 2}
+END_FLAG_NAMES = {v: k for k, v in END_FLAG_CODES.items()}
+
+# 這些欄位放在 header / 專屬區段，其餘欄位一律進 extra
+_CORE_KEYS = ("hp", "turn", "world_seed", "end_flag", "notes", "logs")
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """把遊戲狀態編碼成一份二進位快照"""
+    notes = [str(n).encode("utf-8") for n in state.get("notes", [])]
+    logs = [_dumps(entry) for entry in state.get("logs", [])]
+    extra = {k: v for k, v in state.items() if k not in _CORE_KEYS}
+
+    body = bytearray()
+    notes_offset = HEADER.size
+    for raw in notes:
+        body += U32.pack(len(raw))
+        body += raw
+
+    logs_offset = HEADER.size + len(body)
+    record_base = logs_offset + U32.size * len(logs)
+    table = bytearray()
+    records = bytearray()
+    for raw in logs:
+        table += U32.pack(record_base + len(records))
+        records += U32.pack(len(raw))
+        records += raw
+    body += table
+    body += records
+
+    extra_offset = HEADER.size + len(body)
+    raw_extra = _dumps(extra)
+    body += U32.pack(len(raw_extra))
+    body += raw_extra
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC,
+        FORMAT_VERSION,
+        END_FLAG_CODES.get(state.get("end_flag"), 0),
+        0,
+        int(state.get("hp", 0)),
+        int(state.get("turn", 0)),
+        int(state.get("world_seed", 0)),
+        len(notes),
+        len(logs),
+        notes_offset,
+        logs_offset,
+        extra_offset,
+    )
+    return header + bytes(body)
+
+
+class StateView:
+    """
+    快照的唯讀檢視：只在真的需要時才解碼 notes / logs。
+    buf 可以是 bytes、bytearray 或 mmap，base 為快照在 buf 中的起點。
+    """
+
+    def __init__(self, buf, base: int = 0):
+        self._buf = buf
+        self._base = base
+        if len(buf) - base < HEADER.size:
+            raise ValueError("不是合法的存檔快照（比 header 還短）。")
+        (magic, version, end_code, _reserved, self.hp, self.turn,
+         self.world_seed, self.n_notes, self.n_logs, self._notes_offset,
+         self._logs_offset, self._extra_offset) = HEADER.unpack_from(buf, base)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("不是合法的存檔快照（magic 不符）。")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支援的存檔版本：{version}")
+        self.end_flag = END_FLAG_NAMES.get(end_code)
+
+    def complete(self) -> bool:
+        """各區段是否都在 buf 範圍內（檔案沒被截斷）"""
+        pos = self._base + self._extra_offset
+        if pos + U32.size > len(self._buf):
+            return False
+        (length,) = U32.unpack_from(self._buf, pos)
+        return pos + U32.size + length <= len(self._buf)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "hp": self.hp,
+            "turn": self.turn,
+            "world_seed": self.world_seed,
+            "end_flag": self.end_flag,
+            "n_notes": self.n_notes,
+            "n_logs": self.n_logs,
+        }
+
+    def _record(self, pos: int) -> bytes:
+        (length,) = U32.unpack_from(self._buf, pos)
+        start = pos + U32.size
+        return bytes(self._buf[start:start + length])
+
+    def notes(self) -> List[str]:
+        out = []
+        pos = self._base + self._notes_offset
+        for _ in range(self.n_notes):
+            raw = self._record(pos)
+            out.append(raw.decode("utf-8"))
+            pos += U32.size + len(raw)
+        return out
+
+    def log(self, index: int) -> Dict[str, Any]:
+        """只解碼第 index 筆 log"""
+        if not 0 <= index < self.n_logs:
+            raise IndexError(index)
+        (offset,) = U32.unpack_from(
+            self._buf, self._base + self._logs_offset + U32.size * index
+        )
+        return json.loads(self._record(self._base + offset))
+
+    def iter_logs(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.n_logs):
+            yield self.log(i)
+
+    def extra(self) -> Dict[str, Any]:
+        return json.loads(self._record(self._base + self._extra_offset))
+
+    def to_state(self) -> Dict[str, Any]:
+        """完整還原成跟 init_game_state 相同形狀的 dict"""
+        state = {
+            "hp": self.hp,
+            "turn": self.turn,
+            "notes": self.notes(),
+            "logs": list(self.iter_logs()),
+            "world_seed": self.world_seed,
+            "end_flag": self.end_flag,
+        }
+        state.update(self.extra())
+        return state
+
+
+def decode_state(buf) -> Dict[str, Any]:
+    view = StateView(buf)
+    if not view.complete():
+        raise ValueError("存檔快照不完整（檔案被截斷）。")
+    return view.to_state()
+
+
+def write_state(state: Dict[str, Any], path: pathlib.Path):
+    path = pathlib.Path(path)
+    with path.open("wb") as f:
+        f.write(encode_state(state))
+
+
+def read_state(path: pathlib.Path) -> Dict[str, Any]:
+    return decode_state(pathlib.Path(path).read_bytes())
+
+
+def summarize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """和 StateView.summary 相同欄位，給已經解碼的 state（例如 JSON 存檔）用"""
+    return {
+        "hp": state.get("hp", 0),
+        "turn": state.get("turn", 0),
+        "world_seed": state.get("world_seed", 0),
+        "end_flag": state.get("end_flag"),
+        "n_notes": len(state.get("notes", [])),
+        "n_logs": len(state.get("logs", [])),
+    }
+
+
+def read_summary(path: pathlib.Path) -> Dict[str, Any]:
+    """
+    二進位快照只讀 header，不碰 notes / logs；舊的 JSON 存檔則整份解析後算出同樣的摘要。
+    其他檔案（比 header 短、magic 不符）一律丟 ValueError。
+    """
+    path = pathlib.Path(path)
+    with path.open("rb") as f:
+        head = f.read(HEADER.size)
+    if head.lstrip()[:1] == b"{":
+        return summarize_state(import_json(path))
+    return StateView(head).summary()
+
+
+# ======== JSON 匯入 / 匯出 ========
+
+def import_json(path: pathlib.Path) -> Dict[str, Any]:
+    with pathlib.Path(path).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_json(state: Dict[str, Any], path: pathlib.Path):
+    """輸出格式與 game.save_state 的 JSON 存檔一致"""
+    with pathlib.Path(path).open("w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def load_any(path: pathlib.Path) -> Dict[str, Any]:
+    """依副檔名自動判斷 JSON 或二進位快照"""
+    path = pathlib.Path(path)
+    if path.suffix == ".json":
+        return import_json(path)
+    return read_state(path)
+
+
+# ======== 存檔彙整（多份快照串在一起） ========
+
+class SaveArchive:
+    """
+    大量存檔的彙整檔，只會 append。
+
+    讀取時以 mmap 開檔，靠每份快照前面的長度欄位直接跳到下一份，
+    所以列出所有摘要不需要解碼任何 log。
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._file = None
+        self._mm = None
+        self._offsets: Optional[List[int]] = None
+
+    def append(self, state: Dict[str, Any]):
+        self.append_many([state])
+
+    def append_many(self, states):
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        with self.path.open("ab") as f:
+            if new_file:
+                f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, FORMAT_VERSION))
+            for state in states:
+                raw = encode_state(state)
+                f.write(U32.pack(len(raw)))
+                f.write(raw)
+        self._offsets = None
+
+    def open(self) -> "SaveArchive":
+        self.close()
+        self._file = self.path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < ARCHIVE_HEADER.size:
+            self.close()
+            raise ValueError("不是合法的存檔彙整檔（比 header 還短）。")
+        magic, version = ARCHIVE_HEADER.unpack_from(self._mm, 0)
+        if magic != ARCHIVE_MAGIC:
+            self.close()
+            raise ValueError("不是合法的存檔彙整檔（magic 不符）。")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"不支援的彙整檔版本：{version}")
+        self._offsets = None
+        return self
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _scan(self) -> List[int]:
+        if self._offsets is None:
+            offsets = []
+            pos = ARCHIVE_HEADER.size
+            size = len(self._mm)
+            while pos + U32.size <= size:
+                (length,) = U32.unpack_from(self._mm, pos)
+                if pos + U32.size + length > size:
+                    break  # 最後一筆寫到一半（例如當機），直接略過
+                offsets.append(pos + U32.size)
+                pos += U32.size + length
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self) -> int:
+        return len(self._scan())
+
+    def __getitem__(self, index: int) -> StateView:
+        return StateView(self._mm, self._scan()[index])
+
+    def __iter__(self) -> Iterator[StateView]:
+        for offset in self._scan():
+            yield StateView(self._mm, offset)
+
+    def summaries(self) -> Iterator[Dict[str, Any]]:
+        for view in self:
+            yield view.summary()
+
+
+# ======== 指令列工具 ========
+
+USAGE = """用法：
+  python save_format.py summary <存檔...>            只讀 header 印出摘要
+  python save_format.py to-json <快照> <輸出.json>   二進位 → JSON
+  python save_format.py from-json <存檔.json> <輸出.asav>
+  python save_format.py archive <彙整.asar> <存檔...> 把多份存檔附加進彙整檔
+  python save_format.py list <彙整.asar>             列出彙整檔內每份摘要
+"""
+
+
+def _cli(argv: List[str]) -> int:
+    if not argv:
+        print(USAGE)
+        return 1
+    cmd, args = argv[0], argv[1:]
+    if cmd == "summary" and args:
+        for p in args:
+            print(p, json.dumps(read_summary(p), ensure_ascii=False))
+    elif cmd == "to-json" and len(args) == 2:
+        export_json(read_state(args[0]), args[1])
+    elif cmd == "from-json" and len(args) == 2:
+        write_state(import_json(args[0]), args[1])
+    elif cmd == "archive" and len(args) >= 2:
+        SaveArchive(args[0]).append_many(load_any(p) for p in args[1:])
+    elif cmd == "list" and len(args) == 1:
+        with SaveArchive(args[0]) as archive:
+            for idx, s in enumerate(archive.summaries()):
+                print(idx, json.dumps(s, ensure_ascii=False))
+    else:
+        print(USAGE)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_cli(sys.argv[1:]))
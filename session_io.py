@@ -0,0 +1,89 @@
+"""
+每條執行緒各自的 stdin / stdout
+
+game.py 的遊戲流程直接用 input() / print()。要在同一個行程裡同時跑很多個
+session，就把 sys.stdin / sys.stdout 換成代理物件：綁定過的執行緒讀寫自己的
+輸入來源與輸出緩衝，沒綁定的（主執行緒、背景工作）照常走真正的終端機。
+"""
+
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+class _ThreadLocalStdin:
+    def __init__(self, real):
+        self._real = real
+
+    def readline(self, *args):
+        source = getattr(_local, "stdin", None)
+        if source is None:
+            return self._real.readline(*args)
+        return source.readline(*args)
+
+    def __getattr__(self, name):
+        source = getattr(_local, "stdin", None)
+        return getattr(source if source is not None else self._real, name)
+
+
+class _ThreadLocalStdout:
+    def __init__(self, real):
+        self._real = real
+
+    def write(self, text):
+        target = getattr(_local, "stdout", None)
+        if target is None:
+            return self._real.write(text)
+        return target.write(text)
+
+    def flush(self):
+        target = getattr(_local, "stdout", None)
+        (target if target is not None else self._real).flush()
+
+    def __getattr__(self, name):
+        target = getattr(_local, "stdout", None)
+        return getattr(target if target is not None else self._real, name)
+
+
+class ScriptedInput:
+    """把一串預先寫好的輸入當成 stdin；用完就回傳空字串（input() 會丟 EOFError）"""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+
+    def readline(self, *args):
+        try:
+            line = next(self._lines)
+        except StopIteration:
+            return ""
+        return line if line.endswith("\n") else line + "\n"
+
+
+def install():
+    """換上代理物件（重複呼叫沒關係）"""
+    with _install_lock:
+        if not isinstance(sys.stdin, _ThreadLocalStdin):
+            sys.stdin = _ThreadLocalStdin(sys.stdin)
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+
+
+@contextmanager
+def bind(stdin, stdout=None):
+    """
+    讓目前執行緒的 input() / print() 改用 stdin / stdout。
+    stdout 不給就用一個新的 StringIO，yield 出來給呼叫端取輸出。
+    """
+    install()
+    stdout = stdout if stdout is not None else io.StringIO()
+    prev = getattr(_local, "stdin", None), getattr(_local, "stdout", None)
+    _local.stdin, _local.stdout = stdin, stdout
+    try:
+        yield stdout
+    finally:
+        _local.stdin, _local.stdout = prev
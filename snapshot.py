@@ -0,0 +1,259 @@
+"""
+暖快取快照：把記憶體裡的快取與內容池一次匯出成一個檔案，新的主機啟動時直接載入
+
+新開的遊戲主機快取全是空的，最先進來的玩家每一關都要等完整的 LLM 延遲。
+這裡把以下內容打包成一個有版本的二進位檔：
+- llm_cache / major_memo：key → LLM 輸出，依 key 的 sha1 排序的定長索引表，
+  載入時只 mmap，不解析；查詢時在 mmap 上二分搜尋，命中才解碼那一筆
+- content：預先生成的內容池（content_store 的 pool 格式），用 MmapContentPool 直接開
+- response_cache / notes：本來就有容量上限、而且需要完整索引（LFU、LSH），
+  載入時解析成 JSON 併進去
+
+快照記錄 prompt 版本（game.prompt_version()：模型名稱 + 所有 *_PROMPT 常數 +
+PROMPT_TEMPLATE_VERSION 的雜湊），版本不符就整個略過，不會拿舊 prompt 的結果出來用。
+
+檔案格式：
+  header  <4sBxxxI>：magic "AWCS"、版本、meta 長度
+  meta    JSON：{"prompt_version", "created", "sections": {名稱: {"type", "offset", "length", "count"}}}
+  各段內容，offset 從 meta 結尾起算
+  kv 段：N 筆 <20sIII>（key 的 sha1、內容 offset、key 長度、value 長度），接著是 key + value 的 UTF-8
+
+用法：
+  python snapshot.py export [--out 檔案]     # 用目前 lab2.2_output 裡的快取與內容池匯出
+  python snapshot.py info [檔案]
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import time
+from array import array
+from typing import Dict, Any, List, Optional
+
+import content_store
+
+SNAPSHOT_MAGIC = b"AWCS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sBxxxI")
+KV_ENTRY = struct.Struct("<20sIII")
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha1(key.encode("utf-8")).digest()
+
+
+# ======== 匯出 ========
+
+def _kv_bytes(items: Dict[str, str]) -> bytes:
+    entries = sorted((_digest(k), k.encode("utf-8"), v.encode("utf-8")) for k, v in items.items())
+    table = bytearray()
+    blobs = bytearray()
+    for digest, key, value in entries:
+        table += KV_ENTRY.pack(digest, len(blobs), len(key), len(value))
+        blobs += key + value
+    return bytes(table) + bytes(blobs)
+
+
+def _notes_bytes(records: List[Dict[str, Any]]) -> bytes:
+    return json.dumps([
+        {"text": r["text"], "tag": r["tag"], "hits": r["hits"],
+         "sig": base64.b64encode(r["sig"].tobytes()).decode("ascii")}
+        for r in records
+    ], ensure_ascii=False).encode("utf-8")
+
+
+def export_snapshot(path: pathlib.Path, prompt_version: str,
+                    llm_cache=None, major_memo=None, response_cache=None,
+                    content=None, notes=None) -> Dict[str, int]:
+    """把傳進來的快取與內容池寫成快照；回傳各段的筆數"""
+    sections: Dict[str, Dict[str, Any]] = {}
+    parts: List[bytes] = []
+    offset = 0
+
+    def add(name: str, kind: str, data: bytes, count: int):
+        nonlocal offset
+        sections[name] = {"type": kind, "offset": offset, "length": len(data), "count": count}
+        parts.append(data)
+        offset += len(data)
+
+    for name, cache in (("llm_cache", llm_cache), ("major_memo", major_memo)):
+        if cache is not None:
+            items = cache.items()
+            add(name, "kv", _kv_bytes(items), len(items))
+    if response_cache is not None:
+        entries = response_cache.entries()
+        add("response_cache", "json", json.dumps(entries, ensure_ascii=False).encode("utf-8"), len(entries))
+    if notes is not None:
+        records = notes.records()
+        add("notes", "json", _notes_bytes(records), len(records))
+    if content is not None:
+        data, counts = content_store.pool_bytes(content)
+        add("content", "pool", data, sum(counts.values()))
+
+    meta = json.dumps({"prompt_version": prompt_version, "created": int(time.time()),
+                       "sections": sections}, ensure_ascii=False).encode("utf-8")
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta)))
+        f.write(meta)
+        for data in parts:
+            f.write(data)
+    # 已經有行程 mmap 著舊檔也沒關係，它們繼續看舊的 inode
+    os.replace(tmp, path)
+    return {name: info["count"] for name, info in sections.items()}
+
+
+# ======== 載入 ========
+
+class KVSection:
+    """mmap 上的唯讀 key → value 表，介面對齊 LLMCache.fallback 需要的 get / items"""
+
+    def __init__(self, mm: mmap.mmap, start: int, count: int):
+        self._mm = mm
+        self._start = start
+        self._count = count
+        self._blobs = start + count * KV_ENTRY.size
+
+    def _entry(self, idx: int) -> tuple:
+        return KV_ENTRY.unpack_from(self._mm, self._start + idx * KV_ENTRY.size)
+
+    def _digest_at(self, idx: int) -> bytes:
+        pos = self._start + idx * KV_ENTRY.size
+        return self._mm[pos:pos + 20]
+
+    def _decode(self, idx: int) -> (str, str):
+        _, offset, key_len, value_len = self._entry(idx)
+        pos = self._blobs + offset
+        raw = self._mm[pos:pos + key_len + value_len]
+        return raw[:key_len].decode("utf-8"), raw[key_len:].decode("utf-8")
+
+    def get(self, key: str) -> Optional[str]:
+        digest = _digest(key)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._digest_at(mid) < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        # sha1 相同但 key 不同的機率可以忽略，但還是比對一下原本的 key
+        while lo < self._count and self._digest_at(lo) == digest:
+            found_key, value = self._decode(lo)
+            if found_key == key:
+                return value
+            lo += 1
+        return None
+
+    def items(self) -> Dict[str, str]:
+        return dict(self._decode(idx) for idx in range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class WarmSnapshot:
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"不是可用的暖快取快照（空檔案）：{self.path}")
+        try:
+            self._read_meta()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_meta(self):
+        size = len(self._mm)
+        if size < SNAPSHOT_HEADER.size:
+            raise ValueError(f"不是可用的暖快取快照（比 header 還短）：{self.path}")
+        magic, version, meta_len = SNAPSHOT_HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"不是可用的暖快取快照：{self.path}")
+        self._base = SNAPSHOT_HEADER.size + meta_len
+        if self._base > size:
+            raise ValueError(f"暖快取快照不完整（檔案被截斷）：{self.path}")
+        meta = json.loads(self._mm[SNAPSHOT_HEADER.size:self._base].decode("utf-8"))
+        self.prompt_version: str = meta["prompt_version"]
+        self.created: int = meta["created"]
+        self.sections: Dict[str, Dict[str, Any]] = meta["sections"]
+        for info in self.sections.values():
+            if self._base + info["offset"] + info["length"] > size:
+                raise ValueError(f"暖快取快照不完整（檔案被截斷）：{self.path}")
+
+    def _start(self, name: str) -> int:
+        return self._base + self.sections[name]["offset"]
+
+    def kv(self, name: str) -> Optional[KVSection]:
+        if name not in self.sections:
+            return None
+        return KVSection(self._mm, self._start(name), self.sections[name]["count"])
+
+    def json_section(self, name: str) -> Optional[Any]:
+        if name not in self.sections:
+            return None
+        start = self._start(name)
+        return json.loads(self._mm[start:start + self.sections[name]["length"]].decode("utf-8"))
+
+    def notes(self) -> List[Dict[str, Any]]:
+        records = self.json_section("notes") or []
+        for record in records:
+            sig = array("I")
+            sig.frombytes(base64.b64decode(record["sig"]))
+            record["sig"] = sig
+        return records
+
+    def content_pool(self) -> Optional[content_store.MmapContentPool]:
+        if "content" not in self.sections:
+            return None
+        return content_store.MmapContentPool(self.path, offset=self._start("content"))
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def print_info(snap: WarmSnapshot):
+    created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap.created))
+    print(f"快照：{snap.path}（{snap.path.stat().st_size / 1024:.1f} KiB，建立於 {created}）")
+    print(f"prompt 版本：{snap.prompt_version}")
+    for name, info in snap.sections.items():
+        print(f"  {name:<15} {info['type']:<5} {info['count']:>7} 筆  {info['length'] / 1024:>9.1f} KiB")
+
+
+def main():
+    import game
+
+    parser = argparse.ArgumentParser(description="暖快取快照")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_export = sub.add_parser("export", help="把目前的快取與內容池匯出成快照")
+    p_export.add_argument("--out", default=str(game.WARM_SNAPSHOT_PATH))
+    p_info = sub.add_parser("info", help="顯示快照內容")
+    p_info.add_argument("path", nargs="?", default=str(game.WARM_SNAPSHOT_PATH))
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        counts = game.export_warm_snapshot(args.out)
+        print(f"[系統] 暖快取快照已寫到 {args.out}：{counts}")
+        return
+    snap = WarmSnapshot(args.path)
+    try:
+        print_info(snap)
+        if snap.prompt_version != game.prompt_version():
+            print(f"[警告] 和目前的 prompt 版本（{game.prompt_version()}）不符，載入時會被略過。")
+    finally:
+        snap.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+多行程部署：supervisor + N 個 worker 行程
+
+單一行程同時跑很多 session 時，JSON 解析、prompt 組裝、輸出排版都卡在同一把 GIL 上。
+這裡改成：
+- supervisor 用一致性雜湊（每個 worker 在環上放 VIRTUAL_NODES 個虛擬節點）
+  決定每個 session 交給哪個 worker，同一個 session_id 永遠落在同一個 worker
+- 每個 worker 是獨立的 Python 行程，裡面用執行緒同時跑多個 session
+  （game.run_session + session_io 各自的 stdin / stdout）
+- 預先生成的內容先匯出成 mmap 內容池（content_store.export_pool），
+  worker 以唯讀 mmap 開啟，內容只在 page cache 裡存一份，不會每個行程各複製一份
+- 每個 worker 的累計統計寫到自己的 aggregates_w<i>.json，結束時由 supervisor 併回 aggregates.json
+- LLM 快取、科系記憶、回應快取、筆記庫也一樣：worker 讀共用的檔案當基準，
+  新寫的東西只寫進自己的 *_w<i> 檔，結束時由 supervisor 併回共用的檔案
+- 併回時會掃所有 *_w<數字> 檔，上一次中斷、或 worker 數不同留下來的也一起併掉、刪掉
+- worker 不管怎麼結束都會回報 done；行程直接掛掉的，supervisor 發現它不在了也不再等它
+- 有設 GAME_METRICS_PORT 時，第 i 個 worker 的指標開在 port + i + 1
+- 有暖快取快照（snapshot.py）時每個 worker 啟動就載入，內容池檔優先於快照裡的內容
+- 有設 GAME_PROFILE 時，第 i 個 worker 的剖析報表寫到 <GAME_PROFILE>/w<i>/
+
+用法：
+  python supervisor.py export-pool [--store 目錄] [--out 檔案]
+  python supervisor.py run <sessions.jsonl> [--workers N] [--threads M] [--pool 檔案] [--out results.jsonl]
+
+sessions.jsonl 每行一個 session（inputs 是依序要餵給遊戲的輸入）：
+  {"session_id": "p001", "seed": 20240101, "inputs": ["male", "醫學系", "1", ...]}
+"""
+
+import argparse
+import bisect
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pathlib
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import aggregates
+import content_store
+import game
+import llm_cache
+import metrics
+import note_library
+import profiling
+import response_cache
+import session_io
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+SESSIONS_PER_WORKER = 8        # 每個 worker 同時跑幾個 session（大多時間在等 LLM）
+VIRTUAL_NODES = 64
+WORKER_POLL_SECONDS = 1.0      # supervisor 多久檢查一次 worker 行程還在不在
+DEFAULT_POOL_PATH = game.OUTPUT_DIR / "content_pool.bin"
+
+
+class HashRing:
+    """一致性雜湊環：增減 worker 時只有少部分 session 需要換位置"""
+
+    def __init__(self, nodes: List[int], vnodes: int = VIRTUAL_NODES):
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> int:
+        idx = bisect.bisect(self._keys, self._hash(key)) % len(self._ring)
+        return self._ring[idx][1]
+
+
+def safe_session_id(raw: Any) -> str:
+    """session_id 會出現在存檔檔名裡，只留英數、底線、連字號"""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(raw))[:64] or "anon"
+
+
+def worker_path(path: pathlib.Path, worker_id: int) -> pathlib.Path:
+    """共用檔案在第 worker_id 個 worker 的版本，例如 llm_cache.jsonl → llm_cache_w0.jsonl"""
+    path = pathlib.Path(path)
+    return path.with_name(f"{path.stem}_w{worker_id}{path.suffix}")
+
+
+def worker_files(path: pathlib.Path) -> List[pathlib.Path]:
+    """目前留在磁碟上的所有 worker 版本（不管是哪一次、幾個 worker 的執行留下的）"""
+    path = pathlib.Path(path)
+    pattern = re.compile(rf"{re.escape(path.stem)}_w\d+{re.escape(path.suffix)}")
+    if not path.parent.exists():
+        return []
+    return sorted(p for p in path.parent.iterdir() if pattern.fullmatch(p.name))
+
+
+# ======== worker 端 ========
+
+def _run_job(worker_id: int, job: Dict[str, Any], outbox, keep_output: bool):
+    out = io.StringIO()
+    result = {"session_id": job["session_id"], "worker": worker_id, "ok": False}
+    start = time.perf_counter()
+    try:
+        with session_io.bind(session_io.ScriptedInput(job.get("inputs", [])), out):
+            state = game.run_session(job.get("seed"), session_id=job["session_id"])
+        result.update(ok=True, hp=state["hp"], end_flag=state.get("end_flag"),
+                      stages=len(state["logs"]))
+    except Exception as e:
+        # 輸入用完（EOFError）或 LLM 一直失敗都算這個 session 失敗，不影響同一個 worker 的其他 session
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    if keep_output:
+        result["output"] = out.getvalue()
+    outbox.put(result)
+
+
+def _use_worker_caches(worker_id: int):
+    """
+    換成這個 worker 自己的快取與筆記庫：共用的那份（已併進暖快取快照）只拿來讀，
+    新寫的東西只進 *_w<i> 檔，不會和其他 worker 互相覆蓋
+    """
+    for name in ("LLM_CACHE", "MAJOR_MEMO"):
+        shared = getattr(game, name)
+        own = llm_cache.LLMCache(worker_path(shared.path, worker_id))
+        own.fallback = shared
+        setattr(game, name, own)
+
+    shared = game.RESPONSE_CACHE
+    own = response_cache.ResponseCache(worker_path(shared.path, worker_id), shared.capacity, shared.near_threshold)
+    own.seed(shared.entries())
+    game.RESPONSE_CACHE = own
+
+    shared = game.NOTE_LIBRARY
+    own = note_library.NoteLibrary(worker_path(shared.path, worker_id), shared.threshold)
+    own.seed(shared.records())
+    game.NOTE_LIBRARY = own
+
+
+def worker_main(worker_id: int, api_key: str, pool_path: str, threads: int,
+                keep_output: bool, inbox, outbox):
+    try:
+        _worker_loop(worker_id, api_key, pool_path, threads, keep_output, inbox, outbox)
+    finally:
+        # 設定階段就失敗也要回報，不然 supervisor 會一直等下去
+        outbox.put({"worker": worker_id, "done": True})
+
+
+def _worker_loop(worker_id: int, api_key: str, pool_path: str, threads: int,
+                 keep_output: bool, inbox, outbox):
+    os.environ[game.API_KEY_ENV] = api_key
+    game.setup_openai()
+    game.warm_up_llm_backend()
+    metrics.serve_from_env(offset=worker_id + 1)   # supervisor 自己不跑遊戲，port 留給 worker 從 +1 開始
+    if os.environ.get(profiling.PROFILE_ENV):
+        # 每個 worker 的剖析報表放在各自的子資料夾
+        os.environ[profiling.PROFILE_ENV] = os.path.join(os.environ[profiling.PROFILE_ENV], f"w{worker_id}")
+        profiling.start_from_env()
+    game.AGGREGATES_PATH = worker_path(game.AGGREGATES_PATH, worker_id)
+    if pool_path and pathlib.Path(pool_path).exists():
+        game.CONTENT_STORE = content_store.MmapContentPool(pool_path)
+    game.load_warm_snapshot()
+    _use_worker_caches(worker_id)
+    session_io.install()
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"w{worker_id}") as executor:
+        while True:
+            job = inbox.get()
+            if job is None:
+                break
+            executor.submit(_run_job, worker_id, job, outbox, keep_output)
+
+
+# ======== supervisor 端 ========
+
+class Supervisor:
+    def __init__(self, workers: int = DEFAULT_WORKERS,
+                 threads: int = SESSIONS_PER_WORKER,
+                 pool_path: pathlib.Path = DEFAULT_POOL_PATH,
+                 keep_output: bool = False):
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.pool_path = pathlib.Path(pool_path) if pool_path else None
+        self.keep_output = keep_output
+        self.ring = HashRing(list(range(self.workers)))
+
+    def _prepare_pool(self):
+        if self.pool_path is None or self.pool_path.exists():
+            return
+        counts = content_store.export_pool(game.CONTENT_STORE, self.pool_path)
+        if any(counts.values()):
+            print(f"[系統] 已匯出內容池到 {self.pool_path}：{counts}")
+
+    def run(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        api_key = game.load_api_key()
+        if not api_key:
+            raise RuntimeError(f"多行程模式需要先設定環境變數 {game.API_KEY_ENV} 或 {game.CONFIG_PATH}。")
+        game.ensure_output_dirs()
+        self._prepare_pool()
+
+        # spawn：worker 從乾淨的直譯器開始，不繼承 supervisor 的執行緒與鎖
+        ctx = multiprocessing.get_context("spawn")
+        outbox = ctx.Queue()
+        inboxes = [ctx.Queue() for _ in range(self.workers)]
+        procs = [
+            ctx.Process(
+                target=worker_main,
+                args=(i, api_key, str(self.pool_path or ""), self.threads,
+                      self.keep_output, inboxes[i], outbox),
+                name=f"game-worker-{i}",
+            )
+            for i in range(self.workers)
+        ]
+        for proc in procs:
+            proc.start()
+
+        for job in jobs:
+            job = dict(job, session_id=safe_session_id(job.get("session_id")))
+            inboxes[self.ring.node_for(job["session_id"])].put(job)
+        for inbox in inboxes:
+            inbox.put(None)
+
+        results = self._collect(procs, outbox)
+        for proc in procs:
+            proc.join()
+        self.merge_worker_caches()
+        self.merge_worker_stats()
+        return results
+
+    def _collect(self, procs: List[Any], outbox) -> List[Dict[str, Any]]:
+        """收 worker 回報的結果，直到每個 worker 都回報 done、或被發現行程已經不在"""
+        results, done = [], set()
+        while len(done) < len(procs):
+            try:
+                msg = outbox.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                for i, proc in enumerate(procs):
+                    if i not in done and not proc.is_alive():
+                        print(f"[警告] worker {i} 意外結束（exitcode {proc.exitcode}），"
+                              f"分給它的 session 沒有結果。")
+                        done.add(i)
+                continue
+            if msg.get("done"):
+                done.add(msg["worker"])
+            else:
+                results.append(msg)
+        return results
+
+    def merge_worker_stats(self):
+        """把各 worker 的 aggregates_w<i>.json 併進 aggregates.json，併完就刪掉"""
+        paths = worker_files(game.AGGREGATES_PATH)
+        if not paths:
+            return
+        stats = aggregates.load_stats(game.AGGREGATES_PATH)
+        for path in paths:
+            stats.merge(aggregates.load_stats(path))
+        aggregates.save_stats(stats, game.AGGREGATES_PATH)
+        for path in paths:
+            path.unlink()
+
+    def merge_worker_caches(self):
+        """把各 worker 的 *_w<i> 快取與筆記庫併回共用的檔案，併完就刪掉"""
+        # 共用的那份要和 worker 啟動時看到的一樣（含暖快取快照），筆記庫才算得出各 worker 多出來的 hits
+        game.load_warm_snapshot()
+        merged: List[pathlib.Path] = []
+        for cache in (game.LLM_CACHE, game.MAJOR_MEMO):
+            for path in worker_files(cache.path):
+                cache.update(llm_cache.LLMCache(path).items())
+                merged.append(path)
+
+        for path in worker_files(game.RESPONSE_CACHE.path):
+            game.RESPONSE_CACHE.merge(response_cache.ResponseCache(path).entries())
+            merged.append(path)
+        game.RESPONSE_CACHE.save()
+
+        sources = []
+        for path in worker_files(game.NOTE_LIBRARY.path):
+            sources.append(note_library.NoteLibrary(path).records())
+            merged.append(path)
+        if sources:
+            game.NOTE_LIBRARY.merge(sources)
+            game.NOTE_LIBRARY.compact()
+
+        for path in merged:
+            path.unlink()
+
+    def merged_stats(self) -> aggregates.AggregateStats:
+        """併回之後的累計統計（含這次之前的所有場次）"""
+        return aggregates.load_stats(game.AGGREGATES_PATH)
+
+
+def load_jobs(path: pathlib.Path) -> List[Dict[str, Any]]:
+    jobs = []
+    with pathlib.Path(path).open("r", encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            job.setdefault("session_id", f"s{n}")
+            jobs.append(job)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="亞洲人生存大挑戰：多行程部署")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_export = sub.add_parser("export-pool", help="把預先生成的內容匯出成 mmap 內容池")
+    p_export.add_argument("--store", default=str(game.CONTENT_DIR))
+    p_export.add_argument("--out", default=str(DEFAULT_POOL_PATH))
+
+    p_run = sub.add_parser("run", help="把一批 session 分給多個 worker 行程執行")
+    p_run.add_argument("sessions")
+    p_run.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p_run.add_argument("--threads", type=int, default=SESSIONS_PER_WORKER,
+                       help="每個 worker 同時跑幾個 session")
+    p_run.add_argument("--pool", default=str(DEFAULT_POOL_PATH))
+    p_run.add_argument("--out", help="每個 session 的結果寫成 JSONL（含完整遊戲輸出）")
+
+    args = parser.parse_args()
+
+    if args.cmd == "export-pool":
+        counts = content_store.export_pool(content_store.ContentStore(args.store), args.out)
+        print(f"[系統] 已匯出內容池到 {args.out}：{counts}")
+        return
+
+    jobs = load_jobs(args.sessions)
+    supervisor = Supervisor(args.workers, args.threads, args.pool, keep_output=bool(args.out))
+    start = time.perf_counter()
+    results = supervisor.run(jobs)
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["session_id"])
+    for r in results:
+        if r["ok"]:
+            print(f"{r['session_id']}（worker {r['worker']}）：{r['end_flag']}，HP {r['hp']}，{r['elapsed']}s")
+        else:
+            print(f"{r['session_id']}（worker {r['worker']}）：失敗，{r['error']}")
+    ok = sum(1 for r in results if r["ok"])
+    print(f"\n[系統] {len(results)} 個 session（成功 {ok}），{args.workers} 個 worker，"
+          f"共 {elapsed:.1f}s，{len(results) / elapsed:.2f} session/s")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        print(f"[系統] 結果已寫到：{args.out}")
+
+    print()
+    aggregates.print_stats(supervisor.merged_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    """遊戲的輸出路徑都是相對路徑（lab2.2_output/...），每個測試各用一個暫存資料夾"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
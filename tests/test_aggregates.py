@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import aggregates
+from aggregates import AggregateStats
+
+
+def _run(hp, end_flag="win", stages=7, seed=0):
+    return {"hp": hp, "end_flag": end_flag, "world_seed": seed,
+            "logs": [{"turn": t} for t in range(1, stages + 1)]}
+
+
+def test_counts_and_deadliest_stage():
+    stats = AggregateStats()
+    stats.record_run(_run(80))
+    stats.record_run(_run(0, "lose", stages=3))
+    stats.record_run(_run(0, "lose", stages=3))
+    stats.record_run(_run(0, "lose", stages=5))
+    assert (stats.total_runs, stats.wins, stats.losses) == (4, 1, 3)
+    assert stats.win_rate() == pytest.approx(0.25)
+    assert stats.deadliest_stage() == 3
+    assert AggregateStats().deadliest_stage() is None
+
+
+def test_leaderboard_keeps_top_k_and_prefers_later_runs_on_ties():
+    stats = AggregateStats(top_k=3)
+    for seed, hp in enumerate([50, 120, 90, 120, 10, 90]):
+        stats.record_run(_run(hp, seed=seed))
+    board = stats.leaderboard()
+    assert [e["hp"] for e in board] == [120, 120, 90]
+    # 同分時較晚的那一場排前面，也是它把較早的 90 分擠掉
+    assert [e["world_seed"] for e in board] == [3, 1, 5]
+
+
+def test_hp_quantile_uses_bucket_lower_bounds():
+    stats = AggregateStats()
+    assert stats.hp_quantile(0.5) is None
+    for hp in (0, 12, 47, 101, 999):
+        stats.record_run(_run(hp))
+    assert stats.hp_quantile(0.0) == 0
+    assert stats.hp_quantile(0.5) == 45
+    assert stats.hp_quantile(1.0) == aggregates.HP_HIST_MAX
+
+
+def test_merge_offsets_sequence_numbers():
+    a, b = AggregateStats(top_k=2), AggregateStats(top_k=2)
+    a.record_run(_run(100, seed=1))
+    a.record_run(_run(0, "lose", stages=2, seed=2))
+    b.record_run(_run(100, seed=3))
+    a.merge(b)
+    assert (a.total_runs, a.wins, a.losses) == (3, 2, 1)
+    assert a.stage_deaths[2] == 1
+    # b 的第 1 場平移成第 3 場，和 a 的第 1 場同分時排在前面
+    assert [e["world_seed"] for e in a.leaderboard()] == [3, 1]
+    assert sorted(seq for _, seq, _ in a.to_dict()["leaderboard"]) == [1, 3]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "aggregates.json"
+    stats = AggregateStats(top_k=2)
+    for hp in (30, 70, 0):
+        stats.record_run(_run(hp, "lose" if hp == 0 else "win", stages=4))
+    aggregates.save_stats(stats, path)
+    loaded = aggregates.load_stats(path)
+    assert loaded.to_dict() == json.loads(json.dumps(stats.to_dict()))
+    loaded.record_run(_run(200))
+    assert [e["hp"] for e in loaded.leaderboard()] == [200, 70]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_load_corrupt_file_starts_over(tmp_path):
+    path = tmp_path / "aggregates.json"
+    path.write_text("{半個", encoding="utf-8")
+    assert aggregates.load_stats(path).total_runs == 0
+    assert aggregates.load_stats(tmp_path / "missing.json").total_runs == 0
+
+
+def test_supervisor_folds_worker_stats(tmp_path, monkeypatch):
+    import game
+    import supervisor
+
+    monkeypatch.setattr(game, "AGGREGATES_PATH", tmp_path / "aggregates.json")
+    base = AggregateStats()
+    base.record_run(_run(10))
+    aggregates.save_stats(base, game.AGGREGATES_PATH)
+    # w0、w1 是這次的，w5 是上一次不同 worker 數留下來的
+    for i, hp in ((0, 20), (1, 30), (5, 40)):
+        stats = AggregateStats()
+        stats.record_run(_run(hp))
+        aggregates.save_stats(stats, supervisor.worker_path(game.AGGREGATES_PATH, i))
+    (tmp_path / "aggregates_wx.json").write_text("{}", encoding="utf-8")
+
+    sup = supervisor.Supervisor(workers=2, pool_path=None)
+    sup.merge_worker_stats()
+    merged = sup.merged_stats()
+    assert merged.total_runs == 4
+    assert [e["hp"] for e in merged.leaderboard()] == [40, 30, 20, 10]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["aggregates.json", "aggregates_wx.json"]
@@ -0,0 +1,79 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import analytics  # noqa: E402
+import save_format  # noqa: E402
+
+
+def _state(hp, end_flag="win"):
+    logs = [{"turn": 1, "stage": "第一關：出生", "hp_change": -5, "hp_after": 95, "tag": "male_default"},
+            {"turn": 2, "stage": "第二關：選科系", "hp_change": hp - 95, "hp_after": hp, "tag": "major_mid"}]
+    return {"hp": hp, "turn": 2, "notes": [], "logs": logs, "world_seed": 1, "end_flag": end_flag}
+
+
+def test_reingest_skips_unchanged_files(tmp_path):
+    saves = tmp_path / "saves"
+    saves.mkdir()
+    save_format.export_json(_state(80), saves / "save_p1.json")
+    save_format.write_state(_state(0, "lose"), saves / "p2.asav")
+    archive = save_format.SaveArchive(saves / "all.asar")
+    archive.append_many([_state(50), _state(60)])
+    (saves / "broken.asav").write_bytes(b"ASAV")
+
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([saves]) == (4, 1)
+    assert analytics.ColumnStore(tmp_path / "store").ingest([saves]) == (0, 4)
+
+    # 彙整檔只補匯入新 append 的快照；單一存檔內容變了就當成新的一場
+    archive.append(_state(70))
+    save_format.export_json(_state(90), saves / "save_p1.json")
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([saves]) == (2, 2)
+    assert store.meta["n_runs"] == 6
+    assert sorted(store.column("run_hp").tolist()) == [0, 50, 60, 70, 80, 90]
+
+
+def test_report_queries(tmp_path):
+    store = analytics.ColumnStore(tmp_path / "store")
+    store.append_states([_state(80), _state(0, "lose"), _state(40)])
+    deaths = analytics.death_counts_by_stage(store)
+    assert deaths[2] == 1 and deaths.sum() == 1
+    assert analytics.win_rate(store) == pytest.approx(2 / 3)
+    traj = analytics.hp_trajectory(store, qs=(0.5,))
+    assert traj["count"][2] == 3
+    assert traj["quantiles"][2][0] == 40
+
+
+def test_reingest_archive_with_small_batches(tmp_path):
+    archive = save_format.SaveArchive(tmp_path / "all.asar")
+    archive.append_many([_state(10), _state(20), _state(30)])
+
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([archive.path], batch_size=1) == (3, 0)
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([archive.path], batch_size=1) == (0, 1)
+    assert store.meta["n_runs"] == 3
+
+
+def test_archive_failing_midway_resumes_after_last_flushed_run(tmp_path, monkeypatch):
+    archive = save_format.SaveArchive(tmp_path / "all.asar")
+    archive.append_many([_state(10), _state(20), _state(30)])
+
+    to_state = save_format.StateView.to_state
+    calls = []
+
+    def flaky(view):
+        calls.append(view)
+        if len(calls) == 3:
+            raise ValueError("讀到一半壞掉")
+        return to_state(view)
+
+    monkeypatch.setattr(save_format.StateView, "to_state", flaky)
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([archive.path], batch_size=1) == (2, 1)
+
+    monkeypatch.setattr(save_format.StateView, "to_state", to_state)
+    store = analytics.ColumnStore(tmp_path / "store")
+    assert store.ingest([archive.path], batch_size=1) == (1, 0)
+    assert store.column("run_hp").tolist() == [10, 20, 30]
@@ -0,0 +1,59 @@
+import pytest
+
+from major_matcher import AhoCorasick, BUILTIN_TAXONOMY, MajorClassifier
+
+
+def _automaton(*patterns):
+    ac = AhoCorasick()
+    for pattern, priority, value in patterns:
+        ac.add(pattern, priority, value)
+    return ac
+
+
+def test_longest_match_beats_priority():
+    ac = _automaton(("工程", 9, "short"), ("資訊工程", 1, "long"))
+    assert ac.best_match("國立資訊工程學系") == "long"
+
+
+def test_same_length_higher_priority_wins():
+    ac = _automaton(("社會", 1, "low"), ("醫學", 3, "high"))
+    assert ac.best_match("社會醫學系") == "high"
+    assert ac.best_match("醫學社會系") == "high"
+
+
+def test_full_tie_keeps_first_occurrence_in_text():
+    ac = _automaton(("法律", 2, "law"), ("財金", 2, "finance"))
+    assert ac.best_match("法律財金雙主修") == "law"
+    assert ac.best_match("財金法律雙主修") == "finance"
+
+
+def test_full_tie_on_same_pattern_keeps_first_added():
+    ac = _automaton(("設計", 1, "first"), ("設計", 1, "second"))
+    assert ac.best_match("工業設計") == "first"
+
+
+def test_match_found_through_fail_links():
+    # 「電資」沒有接著走下去，要靠 fail 鏈找到後面的「資工」
+    ac = _automaton(("電資學院", 1, "college"), ("資工", 1, "csie"))
+    assert ac.best_match("電資工") == "csie"
+    assert ac.best_match("電資學院") == "college"
+    assert ac.best_match("歷史") is None
+
+
+@pytest.mark.parametrize("major, tag", [
+    ("國立台灣大學醫學系", "major_high_status"),
+    ("資 工 系", "major_high_status"),
+    ("企業管理學系", "major_mid"),
+    ("哲學系", "major_low_status"),
+    ("海洋生物與太空考古學程", None),
+])
+def test_builtin_taxonomy(major, tag):
+    classifier = MajorClassifier(BUILTIN_TAXONOMY)
+    result = classifier.match(major)
+    assert (result[1] if result else None) == tag
+
+
+def test_score_of_unknown_tag_falls_back_to_default():
+    classifier = MajorClassifier(BUILTIN_TAXONOMY)
+    assert classifier.score_of("major_mid") == (-20, "major_mid")
+    assert classifier.score_of("major_unknown") == (-20, "major_other")
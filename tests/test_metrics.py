@@ -0,0 +1,90 @@
+import pytest
+
+import metrics
+
+
+@pytest.mark.parametrize("value, text", [
+    (3, "3"),
+    (2.0, "2"),
+    (0.25, "0.25"),
+    (float("nan"), "NaN"),
+    (float("inf"), "+Inf"),
+    (float("-inf"), "-Inf"),
+])
+def test_format_value(value, text):
+    assert metrics._format_value(value) == text
+
+
+def test_counter_and_gauge_render_with_escaped_labels():
+    c = metrics.Counter("game_requests_total", "呼叫次數", ["site", "outcome"])
+    c.labels("stage_3", "ok").inc()
+    c.labels("stage_3", "ok").inc(2)
+    c.labels('say "hi"\\\n', "error").inc()
+    assert c.render() == [
+        "# HELP game_requests_total 呼叫次數",
+        "# TYPE game_requests_total counter",
+        'game_requests_total{site="stage_3",outcome="ok"} 3',
+        'game_requests_total{site="say \\"hi\\"\\\\\\n",outcome="error"} 1',
+    ]
+    g = metrics.Gauge("game_active", "進行中")
+    with g.track_inprogress():
+        assert g.get() == 1
+    g.set(float("nan"))
+    assert g.render()[-1] == "game_active NaN"
+
+
+def test_label_count_must_match():
+    c = metrics.Counter("game_x_total", "x", ["site"])
+    with pytest.raises(ValueError):
+        c.labels("a", "b")
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("game_latency_seconds", "延遲", ["site"], buckets=(0.5, 0.1, 1.0))
+    child = h.labels("s")
+    for v in (0.05, 0.1, 0.3, 0.7, 5.0):
+        child.observe(v)
+    assert h.render()[2:] == [
+        'game_latency_seconds_bucket{site="s",le="0.1"} 2',
+        'game_latency_seconds_bucket{site="s",le="0.5"} 3',
+        'game_latency_seconds_bucket{site="s",le="1"} 4',
+        'game_latency_seconds_bucket{site="s",le="+Inf"} 5',
+        'game_latency_seconds_sum{site="s"} 6.15',
+        'game_latency_seconds_count{site="s"} 5',
+    ]
+
+
+def test_unlabelled_histogram_has_only_le():
+    h = metrics.Histogram("game_save_seconds", "存檔", buckets=(1.0,))
+    h.observe(2.0)
+    assert h.render()[2:] == [
+        'game_save_seconds_bucket{le="1"} 0',
+        'game_save_seconds_bucket{le="+Inf"} 1',
+        "game_save_seconds_sum 2",
+        "game_save_seconds_count 1",
+    ]
+
+
+def test_callback_metric_reads_at_scrape_time():
+    values = {("llm",): 0.5}
+    cb = metrics.CallbackMetric("game_cache_hit_ratio", "命中率", ["cache"], lambda: values)
+    assert cb.render() == [
+        "# HELP game_cache_hit_ratio 命中率",
+        "# TYPE game_cache_hit_ratio gauge",
+        'game_cache_hit_ratio{cache="llm"} 0.5',
+    ]
+    values[("llm",)] = float("nan")
+    assert cb.render()[-1] == 'game_cache_hit_ratio{cache="llm"} NaN'
+
+
+def test_failing_callback_renders_no_samples():
+    cb = metrics.CallbackMetric("game_broken", "壞掉", [], lambda: 1 / 0, kind="counter")
+    assert cb.render() == ["# HELP game_broken 壞掉", "# TYPE game_broken counter"]
+
+
+def test_registry_deduplicates_by_name():
+    registry = metrics.Registry()
+    first = registry.register(metrics.Counter("game_a_total", "a"))
+    assert registry.register(metrics.Counter("game_a_total", "a")) is first
+    first.inc()
+    assert registry.render() == "# HELP game_a_total a\n# TYPE game_a_total counter\ngame_a_total 1\n"
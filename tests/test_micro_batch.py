@@ -0,0 +1,110 @@
+import json
+import re
+import threading
+import time
+
+import pytest
+
+import game
+
+
+class StubLLM:
+    """假的 call_llm：批次請求照【第 N 筆】回 results，單筆請求直接回答；mode 可改成壞掉的輸出"""
+
+    def __init__(self, mode="ok"):
+        self.mode = mode
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, system_prompt, user_prompt, temperature=0.7, seed_key=None):
+        batched = "【批次模式】" in system_prompt
+        with self._lock:
+            self.calls.append("batch" if batched else user_prompt)
+        if not batched:
+            return json.dumps({"answer": f"單筆:{user_prompt}"}, ensure_ascii=False)
+        if self.mode == "garbage":
+            return "抱歉，我不會批次作答"
+        items = re.findall(r"【第 \d+ 筆】\n(.*)\n", user_prompt)
+        results = [{"answer": f"批次:{text}"} for text in items]
+        if self.mode == "short":
+            results = results[:-1]
+        return json.dumps({"results": results}, ensure_ascii=False)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    stub = StubLLM()
+    monkeypatch.setattr(game, "call_llm", stub)
+    return stub
+
+
+def _submit_all(batcher, prompts, template_id="style"):
+    results = {}
+
+    def worker(prompt):
+        results[prompt] = batcher.call(template_id, "系統", prompt)
+
+    threads = [threading.Thread(target=worker, args=(p,)) for p in prompts]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_single_session_skips_window(llm):
+    batcher = game.MicroBatcher(5.0, 8, active_sessions=lambda: 1)
+    t0 = time.monotonic()
+    assert batcher.call("style", "系統", "問題")["answer"] == "單筆:問題"
+    assert time.monotonic() - t0 < 1.0
+    assert llm.calls == ["問題"]
+
+
+def test_concurrent_calls_share_one_request(llm):
+    batcher = game.MicroBatcher(5.0, 3)
+    results = _submit_all(batcher, ["甲", "乙", "丙"])
+    # 湊滿 max_items 就送出，不必等完時間窗；每個呼叫拿回自己那一筆
+    assert llm.calls == ["batch"]
+    assert results == {p: {"answer": f"批次:{p}"} for p in ["甲", "乙", "丙"]}
+
+
+def test_full_group_hands_off_to_new_leader(llm):
+    batcher = game.MicroBatcher(5.0, 2)
+    t0 = time.monotonic()
+    results = _submit_all(batcher, ["甲", "乙", "丙", "丁"])
+    assert time.monotonic() - t0 < 5.0
+    assert llm.calls == ["batch", "batch"]
+    assert results["丁"] == {"answer": "批次:丁"}
+
+
+def test_templates_are_batched_separately(llm):
+    batcher = game.MicroBatcher(0.2, 8)
+    results = {}
+    threads = [threading.Thread(target=lambda t=t, p=p: results.update({p: batcher.call(t, "系統", p)}))
+               for t, p in [("a", "甲"), ("b", "乙")]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    # 各自一組、各只有一筆：等完時間窗退回單筆呼叫
+    assert sorted(llm.calls) == ["乙", "甲"]
+    assert results["甲"] == {"answer": "單筆:甲"}
+
+
+def test_lone_leader_times_out_and_falls_back(llm):
+    batcher = game.MicroBatcher(0.05, 8)
+    t0 = time.monotonic()
+    assert batcher.call("style", "系統", "甲") == {"answer": "單筆:甲"}
+    assert time.monotonic() - t0 >= 0.05
+    assert llm.calls == ["甲"]
+
+
+@pytest.mark.parametrize("mode", ["garbage", "short"])
+def test_bad_batch_reply_falls_back_per_item(llm, mode):
+    llm.mode = mode
+    batcher = game.MicroBatcher(5.0, 2)
+    results = _submit_all(batcher, ["甲", "乙"])
+    assert results == {"甲": {"answer": "單筆:甲"}, "乙": {"answer": "單筆:乙"}}
+    assert llm.calls[0] == "batch"
+    assert sorted(llm.calls[1:]) == ["乙", "甲"]
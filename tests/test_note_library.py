@@ -0,0 +1,132 @@
+import json
+
+import note_library
+from note_library import NoteLibrary, char_shingles, minhash
+
+NOTE_A = "一出生就被預約責任，連選單都沒看見。"
+NOTE_A_VARIANT = "一出生就被預約責任，連選單都沒看見！！"
+NOTE_B = "世界很愛要你勾男女，你可以先勾自己。"
+NOTE_C = "你不是成績單附屬品，你是你自己的人生主角。"
+
+
+def _snapshot_record(text, tag, hits):
+    return {"text": text, "tag": tag, "hits": hits, "sig": minhash(char_shingles(text))}
+
+
+def test_nothing_written_until_flush(tmp_path):
+    path = tmp_path / "library.jsonl"
+    lib = NoteLibrary(path)
+    lib.add(NOTE_A, "tag")
+    lib.add(NOTE_A_VARIANT, "tag")
+    assert not path.exists()
+    lib.flush()
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_flush_compacts_hit_heavy_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(note_library, "COMPACT_MIN_LINES", 4)
+    path = tmp_path / "library.jsonl"
+    lib = NoteLibrary(path)
+    lib.add(NOTE_A, "tag")
+    for _ in range(9):
+        lib.add(NOTE_A_VARIANT, "tag")
+    lib.flush()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["hits"] == 10
+    assert NoteLibrary(path).records()[0]["hits"] == 10
+
+
+def test_near_duplicate_bumps_existing(tmp_path):
+    lib = NoteLibrary(tmp_path / "library.jsonl")
+    assert lib.add(NOTE_A, "male_default")
+    assert not lib.add(NOTE_A_VARIANT, "male_default")
+    assert lib.add(NOTE_B, "non_binary")
+    assert len(lib) == 2
+    assert lib.records()[0]["hits"] == 2
+
+
+def test_reload_restores_hits(tmp_path):
+    path = tmp_path / "library.jsonl"
+    lib = NoteLibrary(path)
+    lib.add(NOTE_A, "tag")
+    lib.add(NOTE_A_VARIANT, "tag")
+    lib.add(NOTE_B, "tag")
+    lib.add(NOTE_B, "tag")
+    lib.add(NOTE_B, "tag")
+    lib.flush()
+
+    reloaded = NoteLibrary(path)
+    hits = {r["text"]: r["hits"] for r in reloaded.records()}
+    assert hits == {NOTE_A: 2, NOTE_B: 3}
+    assert reloaded.best_for_tag("tag") == NOTE_B
+
+
+def test_seed_then_add_then_reload(tmp_path):
+    path = tmp_path / "library.jsonl"
+    lib = NoteLibrary(path)
+    lib.add(NOTE_B, "b")
+    # 快照的筆記排在本地筆記前面被命中，也不能讓 hit 指到別則
+    lib.seed([_snapshot_record(NOTE_C, "c", 5), _snapshot_record(NOTE_A, "a", 1)])
+    lib.add(NOTE_B, "b")
+    lib.add(NOTE_A_VARIANT, "a")
+    lib.flush()
+
+    reloaded = NoteLibrary(path)
+    hits = {r["text"]: r["hits"] for r in reloaded.records()}
+    # 沒被用到的快照筆記不落地；被用到的連同快照裡的 hits 一起寫進去
+    assert hits == {NOTE_B: 2, NOTE_A: 2}
+
+
+def test_legacy_index_hits_still_load(tmp_path):
+    path = tmp_path / "library.jsonl"
+    sig = minhash(char_shingles(NOTE_A))
+    import base64
+    lines = [
+        {"op": "add", "text": NOTE_A, "tag": "a",
+         "sig": base64.b64encode(sig.tobytes()).decode("ascii")},
+        {"op": "hit", "id": 0},
+    ]
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lines), encoding="utf-8")
+    assert NoteLibrary(path).records()[0]["hits"] == 2
+
+
+def test_is_near_duplicate():
+    assert note_library.is_near_duplicate(NOTE_A_VARIANT, [NOTE_B, NOTE_A])
+    assert not note_library.is_near_duplicate(NOTE_C, [NOTE_A, NOTE_B])
+
+
+def test_merge_adds_only_what_each_fork_gained(tmp_path):
+    shared = NoteLibrary(tmp_path / "library.jsonl")
+    shared.add(NOTE_A, "a")
+    shared.add(NOTE_A_VARIANT, "a")
+    shared.flush()
+
+    forks = []
+    for i, extra in enumerate((NOTE_B, NOTE_C)):
+        fork = NoteLibrary(tmp_path / f"library_w{i}.jsonl")
+        fork.seed(shared.records())
+        fork.add(NOTE_A_VARIANT, "a")
+        fork.add(NOTE_B, "b")
+        fork.add(extra, "x")
+        forks.append(fork.records())
+
+    shared.merge(forks)
+    shared.compact()
+    hits = {r["text"]: r["hits"] for r in NoteLibrary(tmp_path / "library.jsonl").records()}
+    assert hits == {NOTE_A: 4, NOTE_B: 3, NOTE_C: 1}
+
+
+def test_append_note_skips_exact_duplicates(tmp_path, monkeypatch):
+    import game
+
+    lib = NoteLibrary(tmp_path / "library.jsonl")
+    monkeypatch.setattr(game, "NOTE_LIBRARY", lib)
+    state = {"notes": []}
+    game.append_note(state, NOTE_A, "a")
+    game.append_note(state, NOTE_A, "a")
+    game.append_note(state, NOTE_A_VARIANT, "a")
+    game.append_note(state, NOTE_B, "b")
+    # 一字不差的不收；近似重複的留在這一場，但不再替筆記庫加 hits
+    assert state["notes"] == [NOTE_A, NOTE_A_VARIANT, NOTE_B]
+    assert {r["text"]: r["hits"] for r in lib.records()} == {NOTE_A: 1, NOTE_B: 1}
@@ -0,0 +1,25 @@
+import json
+
+import content_store
+import pregen
+
+
+def test_ingest_skips_malformed_lines(tmp_path):
+    good = {"custom_id": "newyear-0", "content": json.dumps(
+        {"question": "現在薪水多少啊？", "difficulty": "medium"}, ensure_ascii=False)}
+    other = {"custom_id": "newyear-1", "content": json.dumps(
+        {"question": "什麼時候要結婚？", "difficulty": "high"}, ensure_ascii=False)}
+    results = tmp_path / "results.jsonl"
+    results.write_text("\n".join([
+        json.dumps(good, ensure_ascii=False),
+        '{"custom_id": "newyear-2", "content": "寫到一半',
+        "[1, 2, 3]",
+        "",
+        json.dumps(good, ensure_ascii=False),
+        json.dumps(other, ensure_ascii=False),
+    ]) + "\n", encoding="utf-8")
+
+    store = content_store.ContentStore(tmp_path / "store")
+    stats = pregen.ingest([results], store)
+    assert stats == {"added": 2, "duplicate": 1, "invalid": 2}
+    assert store.count("newyear") == 2
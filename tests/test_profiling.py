@@ -0,0 +1,111 @@
+import json
+import textwrap
+import tracemalloc
+
+import pytest
+
+import profiling
+
+GAME = "/srv/app/game.py"
+
+
+@pytest.mark.parametrize("frames, thread, expected", [
+    # 由內往外：最內層 game.py 函式當呼叫位置，最外層 play_stage_* 當關卡
+    ([("/usr/lib/python3/json/decoder.py", 10, "decode"),
+      (GAME, 612, "generate_outcome_text"),
+      (GAME, 1030, "play_stage_3_job"),
+      (GAME, 1900, "main")],
+     "MainThread", ("play_stage_3_job", "generate_outcome_text:612")),
+    ([(GAME, 300, "call_llm")], "MainThread", ("關卡外", "call_llm:300")),
+    ([(GAME, 300, "call_llm")], "speculate_1", ("關卡外（speculate）", "call_llm:300")),
+    ([("/usr/lib/python3/threading.py", 320, "wait")],
+     "ThreadPoolExecutor-3_0", ("關卡外（ThreadPoolExecutor）", "threading.py:wait")),
+    ([], "MainThread", ("關卡外", "?:?")),
+])
+def test_attribute(frames, thread, expected):
+    assert profiling._attribute(frames, thread) == expected
+
+
+def test_thread_group_strips_counters():
+    assert profiling._thread_group("ThreadPoolExecutor-3_0") == "ThreadPoolExecutor"
+    assert profiling._thread_group("w1_2") == "w1"   # supervisor worker 的執行緒前綴保留 worker 編號
+    assert profiling._thread_group("Thread-7 (worker)") == "Thread"
+    assert profiling._thread_group("MainThread") == "MainThread"
+
+
+def test_function_at_prefers_innermost(tmp_path, monkeypatch):
+    src = tmp_path / "game.py"
+    src.write_text(textwrap.dedent("""\
+        X = 1
+
+        def outer():
+            a = 1
+
+            def inner():
+                return a
+
+            return inner
+        """), encoding="utf-8")
+    monkeypatch.setattr(profiling, "_func_index", {})
+    path = str(src)
+    assert profiling._function_at(path, 1) is None
+    assert profiling._function_at(path, 4) == "outer"
+    assert profiling._function_at(path, 7) == "inner"
+    assert profiling._function_at(path, 9) == "outer"
+    # 沒帶函式名的 frame（tracemalloc）靠行號補上
+    assert profiling._attribute([(path, 7, None)], "MainThread") == ("關卡外", "inner:7")
+
+
+def _report(cpu, alloc):
+    return {"cpu": [{"stage": s, "site": x, "pct": p} for s, x, p in cpu],
+            "alloc": [{"stage": s, "site": x, "kib": k} for s, x, k in alloc]}
+
+
+def test_diff_reports_is_stable():
+    old = _report([("s3", "a:1", 50.0), ("s4", "b:2", 30.0), ("s5", "c:3", 20.0)],
+                  [("s3", "a:1", 10.0)])
+    new = _report([("s5", "c:3", 25.0), ("s3", "a:1", 45.0), ("s6", "d:4", 30.0)],
+                  [("s3", "a:1", 10.05), ("s4", "b:2", 2.0)])
+    lines = profiling.diff_reports(old, new)
+    # 變化大的在前；一樣大時依 (關卡, 位置) 排；小於顯示精度的不列
+    assert lines == [
+        "== CPU 佔比變化（百分點） ==",
+        " -30.00  s4 | b:2",
+        " +30.00  s6 | d:4",
+        "  -5.00  s3 | a:1",
+        "  +5.00  s5 | c:3",
+        "",
+        "== 配置增加變化（KiB） ==",
+        "      +2.0  s4 | b:2",
+    ]
+    shuffled = {key: list(reversed(value)) for key, value in new.items()}
+    assert profiling.diff_reports(old, shuffled) == lines
+
+
+def test_session_stops_sampler_before_tracemalloc(tmp_path, monkeypatch):
+    session = profiling.ProfileSession(tmp_path / "prof", interval_s=0.001)
+    real_stop = tracemalloc.stop
+    alive_at_stop = []
+
+    def checking_stop():
+        alive_at_stop.append(session.cpu._thread.is_alive())
+        real_stop()
+
+    monkeypatch.setattr(tracemalloc, "stop", checking_stop)
+    session.start()
+    kept = [bytearray(1024) for _ in range(64)]
+    path = session.stop()
+    assert alive_at_stop == [False]
+    assert not tracemalloc.is_tracing()
+    assert session.stop() is None
+
+    report = json.loads(path.read_text(encoding="utf-8"))
+    assert report["tracemalloc_peak_kib"] >= 64
+    assert any(r["site"].startswith("test_profiling.py:") for r in report["alloc"])
+    assert path.with_suffix(".txt").exists()
+    del kept
+
+
+def test_stop_before_start_writes_nothing(tmp_path):
+    assert profiling.ProfileSession(tmp_path / "prof").stop() is None
+    assert not (tmp_path / "prof").exists()
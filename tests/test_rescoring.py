@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import analytics  # noqa: E402
+import rescoring  # noqa: E402
+
+STAGE_NAMES = ["第一關：出生", "第二關：選科系", "第三關：第一份工作", "第四關：結婚",
+               "第五關：生小孩", "第六關：過年大拷問", "第七關：親戚稱謂"]
+
+
+def _run(changes, tags, end_flag, hp0=100):
+    logs, hp = [], hp0
+    for turn, (change, tag) in enumerate(zip(changes, tags), start=1):
+        hp += change
+        logs.append({"turn": turn, "stage": STAGE_NAMES[turn - 1], "hp_change": change,
+                     "hp_after": max(hp, 0), "tag": tag})
+    return {"hp": max(hp, 0), "turn": len(logs), "notes": [], "logs": logs,
+            "world_seed": 0, "end_flag": end_flag}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = analytics.ColumnStore(tmp_path / "store")
+    store.append_states([
+        # 0：七關都撐過
+        _run([-10, -20, 5, 0, -25, 3, 5], ["male_default", "major_mid", "job_x", "partner_x",
+                                           "child_none", "newyear", "kinship"], "win"),
+        # 1：第二關就死（科系 -99）
+        _run([-10, -99], ["male_default", "major_bad"], "lose"),
+        # 2：第三關死
+        _run([-10, 10, -100], ["male_default", "major_high_status", "job_x"], "lose"),
+    ])
+    return store
+
+
+def test_segmented_hp_restarts_each_run():
+    run_id = np.array([0, 0, 1, 1, 1, 3])
+    delta = np.array([-10, 5, -20, -20, 30, -7])
+    hp = rescoring.segmented_hp(run_id, delta, 100, 4)
+    assert hp.tolist() == [90, 95, 80, 60, 90, 93]
+
+
+def test_identity_table_reproduces_archived_outcomes(store):
+    original = store.column("run_end_flag").tolist()
+    result = rescoring.rescore(store, {"initial_hp": 100})
+    assert result["end_flag"].tolist() == original == [1, 2, 2]
+    assert result["death_stage"].tolist() == [0, 2, 3]
+    assert result["hp_after"].tolist() == store.column("hp_after").tolist()
+
+
+def test_harsher_tag_score_kills_earlier(store):
+    result = rescoring.rescore(store, {"tag_hp": {"child_none": -200}})
+    assert result["end_flag"].tolist() == [2, 2, 2]
+    assert result["death_stage"].tolist() == [5, 2, 3]
+    # 死掉之後的關卡標成 -1
+    assert result["hp_after"][:7].tolist() == [90, 70, 75, 75, 0, -1, -1]
+
+
+def test_surviving_an_archived_death_is_unknown(store):
+    result = rescoring.rescore(store, {"tag_hp": {"major_bad": 0}})
+    assert result["end_flag"].tolist() == [1, rescoring.UNKNOWN_FLAG, 2]
+    summary = rescoring.compare(store, {"tag_hp": {"major_bad": 0}})
+    assert summary["transitions"] == {"lose→無法判定": 1}
+    assert summary["after"]["win_rate_low"] == pytest.approx(1 / 3)
+    assert summary["after"]["win_rate_high"] == pytest.approx(2 / 3)
+
+
+def test_hidden_hp_scaling_only_touches_stages_3_and_4(store):
+    delta = rescoring.rescore_deltas(store, {"hidden_hp": {"scale": 2.0, "min": -45}})
+    stage = store.column("stage_id")
+    original = store.column("hp_change")
+    changed = delta != original
+    assert set(stage[changed].tolist()) <= {3, 4}
+    assert delta[(stage == 3)].tolist() == [10, -45]
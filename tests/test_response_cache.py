@@ -0,0 +1,75 @@
+from response_cache import ResponseCache
+
+T, Q = "newyear_answer_style", "現在薪水多少啊？"
+
+
+def _cache(capacity, path=None):
+    return ResponseCache(path, capacity=capacity, near_threshold=1.0)
+
+
+def _keys(cache):
+    return sorted(answer for _, _, answer, _, _ in cache.entries())
+
+
+def test_evicts_least_frequently_used():
+    cache = _cache(3)
+    for answer in ("還好啦", "不知道", "保密"):
+        cache.put(T, Q, answer, answer)
+    cache.get(T, Q, "還好啦")
+    cache.get(T, Q, "還好啦")
+    cache.get(T, Q, "不知道")
+    cache.put(T, Q, "很多", "很多")
+    assert _keys(cache) == sorted(["還好啦", "不知道", "很多"])
+
+
+def test_same_frequency_evicts_oldest():
+    cache = _cache(2)
+    cache.put(T, Q, "甲", 1)
+    cache.put(T, Q, "乙", 2)
+    cache.put(T, Q, "丙", 3)
+    assert _keys(cache) == sorted(["乙", "丙"])
+    cache.get(T, Q, "乙")
+    cache.put(T, Q, "丁", 4)
+    assert _keys(cache) == sorted(["乙", "丁"])
+
+
+def test_new_entry_resets_min_frequency():
+    cache = _cache(2)
+    cache.put(T, Q, "甲", 1)
+    cache.get(T, Q, "甲")
+    cache.put(T, Q, "乙", 2)   # 甲 的次數是 2，新來的 乙 是 1，下次要丟的是 乙
+    cache.put(T, Q, "丙", 3)
+    assert _keys(cache) == sorted(["甲", "丙"])
+
+
+def test_put_existing_key_keeps_frequency():
+    cache = _cache(2)
+    cache.put(T, Q, "甲", 1)
+    cache.get(T, Q, "甲")
+    cache.put(T, Q, "甲", 10)
+    cache.put(T, Q, "乙", 2)
+    cache.put(T, Q, "丙", 3)
+    assert cache.get(T, Q, "甲") == 10
+    assert _keys(cache) == sorted(["甲", "丙"])
+
+
+def test_frequencies_survive_save_and_load(tmp_path):
+    path = tmp_path / "response_cache.json"
+    cache = _cache(2, path)
+    cache.put(T, Q, "甲", 1)
+    cache.put(T, Q, "乙", 2)
+    cache.get(T, Q, "甲")
+    cache.save()
+
+    reloaded = _cache(2, path)
+    reloaded.put(T, Q, "丙", 3)
+    assert _keys(reloaded) == sorted(["甲", "丙"])
+
+
+def test_merge_takes_the_higher_frequency():
+    cache = _cache(3)
+    cache.put(T, Q, "甲", 1)
+    cache.put(T, Q, "乙", 2)
+    cache.merge([[T, "現在薪水多少啊", "乙", 2, 5], [T, "現在薪水多少啊", "丙", 3, 1]])
+    freq = {answer: f for _, _, answer, _, f in cache.entries()}
+    assert freq == {"甲": 1, "乙": 5, "丙": 1}
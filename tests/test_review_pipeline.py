@@ -0,0 +1,95 @@
+import json
+import re
+import time
+
+import pytest
+
+import game
+
+
+class StubLLM:
+    """分關回顧回「第N關回顧」；完整回顧回固定字串；fail_turns 裡的關卡丟例外、empty_turns 回空字串"""
+
+    def __init__(self):
+        self.fail_turns = set()
+        self.empty_turns = set()
+        self.reviews = 0
+
+    def __call__(self, system_prompt, user_prompt, temperature=0.7, seed_key=None):
+        if system_prompt != game.RECAP_SYSTEM_PROMPT:
+            self.reviews += 1
+            return "一次生成的完整回顧"
+        turn = json.loads(re.search(r"\{.*\}", user_prompt).group(0))["turn"]
+        # 前面的關卡故意比較慢，確認串接順序不受完成先後影響
+        time.sleep(0.01 * (4 - turn))
+        if turn in self.fail_turns:
+            raise RuntimeError("LLM 掛了")
+        return "" if turn in self.empty_turns else f"  第{turn}關回顧  "
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    stub = StubLLM()
+    monkeypatch.setattr(game, "call_llm", stub)
+    return stub
+
+
+def _state(turns, end_flag="win"):
+    return {"hp": 42, "end_flag": end_flag, "notes": [],
+            "logs": [{"turn": t, "stage": f"第{t}關"} for t in range(1, turns + 1)]}
+
+
+def _run(path, state):
+    pipeline = game.ReviewPipeline(path)
+    for entry in state["logs"]:
+        pipeline.submit(entry)
+    return pipeline.finish(state)
+
+
+def test_init_truncates_previous_recaps(tmp_path, llm):
+    path = tmp_path / "recaps.jsonl"
+    path.write_text('{"turn": 9, "recap": "上一輪的"}\n', encoding="utf-8")
+    game.ReviewPipeline(path)
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_stitches_recaps_in_stage_order(tmp_path, llm):
+    path = tmp_path / "recaps.jsonl"
+    review = _run(path, _state(3))
+    parts = review.split("\n\n")
+    assert parts[1:4] == ["第1關回顧", "第2關回顧", "第3關回顧"]
+    assert parts[0].startswith("在這個亞洲人生存大挑戰的旅程中")
+    assert "帶著 42 點 HP 撐完七關" in parts[-1]
+    assert llm.reviews == 0
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["turn"], r["recap"]) for r in records] == [(1, "第1關回顧"), (2, "第2關回顧"), (3, "第3關回顧")]
+
+
+def test_stitch_review_for_early_death():
+    state = _state(2, end_flag="lose")
+    assert game.stitch_review(state, ["甲", "乙"]).endswith(
+        "這一輪停在第 2 關，但能走到這裡已經很不容易。那些沒被長輩按讚的選擇，也都是你認真活過的證明。")
+
+
+def test_failed_stage_falls_back_to_full_review(tmp_path, llm, capsys):
+    llm.fail_turns = {2}
+    assert _run(tmp_path / "recaps.jsonl", _state(3)) == "一次生成的完整回顧"
+    assert llm.reviews == 1
+    assert "[警告] 分關回顧生成失敗" in capsys.readouterr().out
+
+
+def test_empty_recap_falls_back_to_full_review(tmp_path, llm):
+    llm.empty_turns = {3}
+    assert _run(tmp_path / "recaps.jsonl", _state(3)) == "一次生成的完整回顧"
+
+
+def test_nothing_submitted_falls_back_to_full_review(tmp_path, llm):
+    assert game.ReviewPipeline(tmp_path / "recaps.jsonl").finish(_state(0, "lose")) == "一次生成的完整回顧"
+
+
+def test_submit_copies_the_entry(tmp_path, llm):
+    pipeline = game.ReviewPipeline(tmp_path / "recaps.jsonl")
+    entry = {"turn": 1, "stage": "第1關"}
+    pipeline.submit(entry)
+    entry["turn"] = 99
+    assert pipeline.finish(_state(1)).split("\n\n")[1] == "第1關回顧"
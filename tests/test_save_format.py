@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import save_format
+
+
+def _state(hp=87, end_flag="win"):
+    return {
+        "hp": hp,
+        "turn": 7,
+        "notes": ["一出生就被預約責任。", "你可以先勾自己。"],
+        "logs": [{"stage": "stage1", "delta": -5}, {"stage": "stage2", "choice": "醫學系", "delta": 0}],
+        "world_seed": 20240101,
+        "end_flag": end_flag,
+        "gender": "male",
+    }
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "save.asav"
+    save_format.write_state(_state(), path)
+    assert save_format.read_state(path) == _state()
+    assert save_format.read_summary(path) == {
+        "hp": 87, "turn": 7, "world_seed": 20240101, "end_flag": "win", "n_notes": 2, "n_logs": 2,
+    }
+
+
+def test_single_log_decode():
+    view = save_format.StateView(save_format.encode_state(_state()))
+    assert view.log(1)["choice"] == "醫學系"
+    with pytest.raises(IndexError):
+        view.log(2)
+
+
+def test_summary_of_legacy_json(tmp_path):
+    path = tmp_path / "save_p1.json"
+    save_format.export_json(_state(end_flag=None), path)
+    summary = save_format.read_summary(path)
+    assert summary["end_flag"] is None
+    assert summary["n_logs"] == 2
+
+
+@pytest.mark.parametrize("content", [b"", b"ASAV\x01", b"PK\x03\x04" + b"\x00" * 64])
+def test_summary_rejects_short_or_foreign_files(tmp_path, content):
+    path = tmp_path / "bad.asav"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        save_format.read_summary(path)
+
+
+def test_truncated_snapshot(tmp_path):
+    raw = save_format.encode_state(_state())
+    path = tmp_path / "cut.asav"
+    path.write_bytes(raw[:-3])
+    # header 還在，摘要照樣讀得到；完整還原則要報錯
+    assert save_format.read_summary(path)["hp"] == 87
+    with pytest.raises(ValueError):
+        save_format.read_state(path)
+
+
+def test_archive_skips_partial_tail(tmp_path):
+    path = tmp_path / "saves.asar"
+    archive = save_format.SaveArchive(path)
+    archive.append_many([_state(hp=10), _state(hp=20)])
+    with path.open("ab") as f:
+        f.write(save_format.U32.pack(1000) + b"half")
+    with archive:
+        assert [s["hp"] for s in archive.summaries()] == [10, 20]
+        assert archive[1].to_state() == _state(hp=20)
+
+
+def test_archive_rejects_foreign_file(tmp_path):
+    path = tmp_path / "saves.asar"
+    path.write_text(json.dumps({"hp": 1}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        save_format.SaveArchive(path).open()
+    path.write_bytes(b"ASA")
+    with pytest.raises(ValueError):
+        save_format.SaveArchive(path).open()
@@ -0,0 +1,66 @@
+import io
+import itertools
+import pathlib
+import sys
+
+import pytest
+
+import game
+import llm_cache
+import note_library
+import response_cache
+import session_io
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "benchmarks"))
+from mock_llm import MockLLM  # noqa: E402
+
+INPUTS = ["male", "醫學系", "1", "2", "2", "還好啦", "舅媽"]
+
+
+class VaryingLLM(MockLLM):
+    """每次呼叫的內容都不一樣（旁白的 note 故意留空），只有走快取才重播得出同樣的紀錄"""
+
+    def __init__(self):
+        super().__init__()
+        self._n = itertools.count(1)
+
+    def content(self, system_prompt, user_prompt):
+        n = next(self._n)
+        if system_prompt == game.OUTCOME_SYSTEM_PROMPT:
+            return f'{{"result": "第 {n} 次生成的結果", "note": ""}}'
+        text = super().content(system_prompt, user_prompt)
+        return text if text.startswith("{") else f"第{n}次：{text}"
+
+
+@pytest.fixture
+def fresh_game(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(game, "LLM_CACHE", llm_cache.LLMCache(cache_dir / "llm_cache.jsonl"))
+    monkeypatch.setattr(game, "MAJOR_MEMO", llm_cache.LLMCache(cache_dir / "major_memo.jsonl"))
+    monkeypatch.setattr(game, "RESPONSE_CACHE", response_cache.ResponseCache(cache_dir / "response.json"))
+    monkeypatch.setattr(game, "NOTE_LIBRARY", note_library.NoteLibrary(tmp_path / "notes.jsonl"))
+    monkeypatch.setattr(game, "SPECULATOR", game.OutcomeSpeculator(0, 0))
+    monkeypatch.setattr(game, "LLM_BACKEND", VaryingLLM())
+
+
+def _play(seed):
+    with session_io.bind(session_io.ScriptedInput(INPUTS), io.StringIO()):
+        state = game.run_session(seed)
+    return state["logs"], state["notes"]
+
+
+def test_same_seed_replays_same_life(fresh_game, monkeypatch):
+    first = _play(seed=20240101)
+    assert game.LLM_BACKEND.calls > 0
+    calls = game.LLM_BACKEND.calls
+    # 第二輪之前筆記庫被其他玩家改過：固定 seed 的遊戲不能拿它來補 note
+    monkeypatch.setattr(game.NOTE_LIBRARY, "best_for_tag", lambda tag: "別的玩家留下的筆記")
+    second = _play(seed=20240101)
+    assert second == first
+    assert game.LLM_BACKEND.calls == calls   # 全部從 LLM_CACHE 重播，沒有再打 API
+
+
+def test_unseeded_games_do_not_replay(fresh_game):
+    first_logs, _ = _play(seed=None)
+    second_logs, _ = _play(seed=None)
+    assert [e["note"] for e in first_logs] != [e["note"] for e in second_logs]
@@ -0,0 +1,79 @@
+import pytest
+
+import content_store
+import llm_cache
+import response_cache
+import snapshot
+from note_library import NoteLibrary
+
+NEWYEAR = {"question": "現在薪水多少啊？", "difficulty": "medium"}
+
+
+@pytest.fixture
+def snap_path(tmp_path):
+    cache = llm_cache.LLMCache(tmp_path / "llm_cache.jsonl")
+    for i in range(50):
+        cache.put(f"key-{i}", f"內容 {i}")
+    memo = llm_cache.LLMCache(tmp_path / "major_memo.jsonl")
+    memo.put("哲學系", "major_mid")
+    responses = response_cache.ResponseCache(tmp_path / "response_cache.json")
+    responses.put("newyear_answer_style", "現在薪水多少？", "還好啦", "balanced")
+    notes = NoteLibrary(tmp_path / "library.jsonl")
+    notes.add("不是我不行，是世界太難搞。", "job_low_status")
+    store = content_store.ContentStore(tmp_path / "content")
+    store.add("newyear", NEWYEAR)
+
+    path = tmp_path / "warm.snap"
+    counts = snapshot.export_snapshot(path, "v1", llm_cache=cache, major_memo=memo,
+                                      response_cache=responses, content=store, notes=notes)
+    assert counts == {"llm_cache": 50, "major_memo": 1, "response_cache": 1, "notes": 1, "content": 1}
+    return path
+
+
+def test_round_trip(snap_path):
+    snap = snapshot.WarmSnapshot(snap_path)
+    try:
+        assert snap.prompt_version == "v1"
+        kv = snap.kv("llm_cache")
+        assert len(kv) == 50
+        assert all(kv.get(f"key-{i}") == f"內容 {i}" for i in range(50))
+        assert kv.get("key-50") is None
+        assert snap.kv("major_memo").items() == {"哲學系": "major_mid"}
+        assert snap.json_section("response_cache")[0][3] == "balanced"
+        [note] = snap.notes()
+        assert note["text"] == "不是我不行，是世界太難搞。"
+        assert len(note["sig"]) > 0
+        pool = snap.content_pool()
+        assert pool.count("newyear") == 1
+        pool.close()
+        assert snap.kv("missing") is None
+    finally:
+        snap.close()
+
+
+def test_seeded_caches_hit(snap_path, tmp_path):
+    snap = snapshot.WarmSnapshot(snap_path)
+    try:
+        cache = llm_cache.LLMCache(tmp_path / "fresh.jsonl")
+        cache.fallback = snap.kv("llm_cache")
+        assert cache.get("key-7") == "內容 7"
+        responses = response_cache.ResponseCache(None)
+        responses.seed(snap.json_section("response_cache"))
+        assert responses.get("newyear_answer_style", "現在薪水多少？", "還好啦") == "balanced"
+    finally:
+        snap.close()
+
+
+def test_truncated_snapshot(snap_path):
+    raw = snap_path.read_bytes()
+    for size in (0, 6, 20, len(raw) - 1):
+        snap_path.write_bytes(raw[:size])
+        with pytest.raises(ValueError):
+            snapshot.WarmSnapshot(snap_path)
+
+
+def test_foreign_file(tmp_path):
+    path = tmp_path / "foreign.snap"
+    path.write_bytes(b"AWCX" + b"\x01" * 64)
+    with pytest.raises(ValueError):
+        snapshot.WarmSnapshot(path)
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+import game
+
+
+@pytest.fixture
+def outcome_calls(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_outcome(**kwargs):
+        with lock:
+            calls.append(kwargs["player_choice"])
+        return {"result": f"結果：{kwargs['player_choice']}", "note": "筆記"}
+
+    monkeypatch.setattr(game, "generate_outcome_text", fake_outcome)
+    return calls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _speculator(width, per_hour, parallel=None, clock=None):
+    return game.OutcomeSpeculator(width, per_hour, parallel=parallel or width,
+                                  clock=clock or FakeClock())
+
+
+def _candidates(n=3):
+    return [{"player_choice": f"選項{i}"} for i in range(n)]
+
+
+def _gated(monkeypatch):
+    """第一個被呼叫的推測卡在 gate 上，讓後面的留在佇列裡"""
+    gate = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def fake_outcome(**kwargs):
+        calls.append(kwargs["player_choice"])
+        started.set()
+        gate.wait(5)
+        return {"result": f"結果：{kwargs['player_choice']}", "note": ""}
+
+    monkeypatch.setattr(game, "generate_outcome_text", fake_outcome)
+    return gate, started, calls
+
+
+def test_zero_budget_never_speculates(outcome_calls):
+    spec = _speculator(3, 0)
+    handle = spec.start("關卡", _candidates())
+    assert handle["futures"] == {}
+    assert spec.take(handle, 2)["result"] == "結果：選項2"
+    assert outcome_calls == ["選項2"]
+    assert spec.budget == 0
+
+
+def test_wasted_calls_are_charged(outcome_calls):
+    spec = _speculator(2, 2)
+    handle = spec.start("關卡", _candidates())
+    assert len(handle["futures"]) == 2
+    for fut in list(handle["futures"].values()):
+        fut.result()
+    # 選了沒推測到的選項：兩個推測都白跑了
+    spec.take(handle, 2)
+    assert spec.budget == 0
+    assert sorted(outcome_calls) == ["選項0", "選項1", "選項2"]
+    # 額度用完就不再推測
+    assert spec.start("關卡", _candidates())["futures"] == {}
+
+
+def test_chosen_speculation_is_refunded(outcome_calls):
+    spec = _speculator(2, 5)
+    handle = spec.start("關卡", _candidates())
+    for fut in list(handle["futures"].values()):
+        fut.result()
+    assert spec.take(handle, 0)["result"] == "結果：選項0"
+    # 只有沒被選中、又真的跑完的那一個算額外花費
+    assert spec.budget == 4
+    assert len(outcome_calls) == 2
+
+
+def test_cancel_refunds_queued_calls(monkeypatch):
+    gate, started, calls = _gated(monkeypatch)
+    spec = _speculator(3, 3, parallel=1)
+    handle = spec.start("關卡", _candidates())
+    assert spec.budget == 0
+    started.wait(5)
+    spec.cancel(handle)
+    gate.set()
+    # 只有第一個開始跑了；排隊中的兩個取消成功、退回預扣
+    assert spec.budget == 2
+    assert calls == ["選項0"]
+    assert handle["futures"] == {}
+
+
+def test_queued_choice_runs_live(monkeypatch):
+    gate, started, calls = _gated(monkeypatch)
+    spec = _speculator(2, 2, parallel=1)
+    handle = spec.start("關卡", _candidates())
+    started.wait(5)
+    # 選項1 還在排隊：取消後現場生成，不必等選項0 跑完
+    result = {}
+    taker = threading.Thread(target=lambda: result.update(spec.take(handle, 1)))
+    taker.start()
+    gate.set()
+    taker.join(5)
+    assert result["result"] == "結果：選項1"
+    assert sorted(calls) == ["選項0", "選項1"]
+    # 選項0 白跑（扣 1），選項1 被選中（退回）
+    assert spec.budget == 1
+
+
+def test_budget_caps_width(outcome_calls):
+    spec = _speculator(3, 1)
+    handle = spec.start("關卡", _candidates())
+    assert len(handle["futures"]) == 1
+    assert spec.budget == 0
+
+
+def test_budget_refills_over_time(outcome_calls):
+    clock = FakeClock()
+    spec = _speculator(2, 2, clock=clock)
+    handle = spec.start("關卡", _candidates())
+    for fut in list(handle["futures"].values()):
+        fut.result()
+    spec.take(handle, 2)
+    assert spec.budget == 0
+    # 每小時 2 次：半小時補回 1 次
+    clock.now = 1800
+    assert len(spec.start("關卡", _candidates())["futures"]) == 1
+    # 補回有上限，不會超過每小時額度
+    clock.now = 10 * 3600
+    spec._refill()
+    assert spec.budget == 2
+
+
+def test_take_learns_choice_ranking(outcome_calls):
+    spec = _speculator(1, 100)
+    for _ in range(2):
+        handle = spec.start("關卡", _candidates())
+        spec.take(handle, 2)
+    handle = spec.start("關卡", _candidates())
+    assert list(handle["futures"]) == [2]
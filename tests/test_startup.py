@@ -0,0 +1,94 @@
+import builtins
+import json
+import sys
+import types
+
+import pytest
+
+import game
+
+
+@pytest.fixture
+def no_env_key(monkeypatch):
+    monkeypatch.delenv(game.API_KEY_ENV, raising=False)
+    monkeypatch.setattr(game, "_api_key", None)
+
+
+def _write_config(key):
+    game.CONFIG_PATH.write_text(json.dumps({"openai_api_key": key}), encoding="utf-8")
+
+
+def test_env_key_wins_over_config(no_env_key, monkeypatch):
+    _write_config("sk-config")
+    monkeypatch.setenv(game.API_KEY_ENV, "  sk-env  ")
+    assert game.load_api_key() == "sk-env"
+
+
+def test_config_used_when_env_blank(no_env_key, monkeypatch):
+    monkeypatch.setenv(game.API_KEY_ENV, "   ")
+    _write_config(" sk-config ")
+    assert game.load_api_key() == "sk-config"
+
+
+def test_corrupt_config_warns(no_env_key, capsys):
+    game.CONFIG_PATH.write_text("{不是 JSON", encoding="utf-8")
+    assert game.load_api_key() == ""
+    assert "[警告] 設定檔" in capsys.readouterr().out
+
+
+def test_setup_prompts_only_as_last_resort(no_env_key, monkeypatch):
+    asked = []
+    monkeypatch.setattr(builtins, "input", lambda prompt="": asked.append(prompt) or " sk-typed ")
+    _write_config("sk-config")
+    game.setup_openai()
+    assert asked == [] and game._api_key == "sk-config"
+
+    game.CONFIG_PATH.unlink()
+    game.setup_openai()
+    assert asked == ["> "] and game._api_key == "sk-typed"
+
+
+def test_setup_without_any_key_fails(no_env_key, monkeypatch):
+    monkeypatch.setattr(builtins, "input", lambda prompt="": "")
+    with pytest.raises(RuntimeError):
+        game.setup_openai()
+
+
+def test_main_starts_warm_up_before_loading_snapshot(monkeypatch):
+    calls = []
+    for name in ("setup_openai", "warm_up_llm_backend", "load_warm_snapshot", "run_session"):
+        monkeypatch.setattr(game, name, lambda *a, _n=name, **kw: calls.append(_n))
+    game.main()
+    assert calls == ["setup_openai", "warm_up_llm_backend", "load_warm_snapshot", "run_session"]
+
+
+def test_warm_up_gives_each_thread_its_own_session(monkeypatch):
+    heads = []
+
+    class FakeAdapter:
+        def __init__(self, pool_maxsize):
+            self.pool_maxsize = pool_maxsize
+
+    class FakeSession:
+        def __init__(self):
+            self.mounts = {}
+
+        def mount(self, prefix, adapter):
+            self.mounts[prefix] = adapter
+
+        def head(self, url, timeout):
+            heads.append(url)
+
+    fake_requests = types.SimpleNamespace(Session=FakeSession,
+                                          adapters=types.SimpleNamespace(HTTPAdapter=FakeAdapter))
+    monkeypatch.setitem(sys.modules, "requests", fake_requests)
+    client = types.SimpleNamespace(api_base="https://api.example/v1")
+    monkeypatch.setattr(game, "_openai", client)
+
+    game.warm_up_llm_backend().join(5)
+    assert heads == ["https://api.example/v1"]
+    first, second = client.requestssession(), client.requestssession()
+    assert first is not second
+    adapter = first.mounts["https://"]
+    assert adapter.pool_maxsize == game.LLM_HTTP_POOL_SIZE
+    assert second.mounts == {"https://": adapter, "http://": adapter}
@@ -0,0 +1,162 @@
+import io
+import queue
+import sys
+import threading
+from collections import Counter
+
+import pytest
+
+import game
+import llm_cache
+import note_library
+import response_cache
+import session_io
+import supervisor
+
+NOTE_A = "你不是成績單附屬品，分數只是某一天的天氣。"
+NOTE_B = "長輩的期待是他們的行李，不一定要你來扛。"
+
+
+def test_hash_ring_routes_stably():
+    ring = supervisor.HashRing([0, 1, 2])
+    keys = [f"p{i:03d}" for i in range(200)]
+    first = [ring.node_for(k) for k in keys]
+    assert first == [ring.node_for(k) for k in keys]
+    # 節點順序不影響結果（不同行程建出來的環一樣）
+    assert first == [supervisor.HashRing([2, 0, 1]).node_for(k) for k in keys]
+
+
+def test_hash_ring_spreads_and_moves_few_keys():
+    keys = [f"session-{i}" for i in range(3000)]
+    ring = supervisor.HashRing([0, 1, 2, 3])
+    assert len(ring._ring) == 4 * supervisor.VIRTUAL_NODES
+    counts = Counter(ring.node_for(k) for k in keys)
+    assert set(counts) == {0, 1, 2, 3}
+    # 64 個虛擬節點：每個 worker 分到的量離平均不會差太遠
+    assert max(counts.values()) < 1.5 * len(keys) / 4
+    # 多加一個 worker：只有換到新 worker 的 key 會移動
+    grown = supervisor.HashRing([0, 1, 2, 3, 4])
+    moved = [k for k in keys if grown.node_for(k) != ring.node_for(k)]
+    assert all(grown.node_for(k) == 4 for k in moved)
+    assert len(moved) < 0.35 * len(keys)
+
+
+def test_worker_files_match_only_numbered_copies(tmp_path):
+    base = tmp_path / "cache" / "llm_cache.jsonl"
+    base.parent.mkdir()
+    for name in ("llm_cache.jsonl", "llm_cache_w0.jsonl", "llm_cache_w12.jsonl",
+                 "llm_cache_wx.jsonl", "llm_cache_w1.json", "other_w1.jsonl"):
+        (base.parent / name).write_text("")
+    assert supervisor.worker_path(base, 3).name == "llm_cache_w3.jsonl"
+    assert [p.name for p in supervisor.worker_files(base)] == ["llm_cache_w0.jsonl", "llm_cache_w12.jsonl"]
+    assert supervisor.worker_files(tmp_path / "missing" / "x.json") == []
+
+
+@pytest.fixture
+def shared_caches(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    llm = llm_cache.LLMCache(cache_dir / "llm_cache.jsonl")
+    llm.put("shared", "共用")
+    memo = llm_cache.LLMCache(cache_dir / "major_memo.jsonl")
+    responses = response_cache.ResponseCache(cache_dir / "response_cache.json")
+    responses.put("style", "考得怎樣", "還好啦", {"hp": -1})
+    responses.save()
+    notes = note_library.NoteLibrary(tmp_path / "notes" / "library.jsonl")
+    notes.add(NOTE_A, "tag")
+    notes.flush()
+    shared = {"LLM_CACHE": llm, "MAJOR_MEMO": memo, "RESPONSE_CACHE": responses, "NOTE_LIBRARY": notes}
+    for name, value in shared.items():
+        monkeypatch.setattr(game, name, value)
+    return shared
+
+
+def _as_worker(worker_id, shared, work):
+    supervisor._use_worker_caches(worker_id)
+    try:
+        work()
+        game.RESPONSE_CACHE.save()
+        game.NOTE_LIBRARY.flush()
+    finally:
+        for name, value in shared.items():
+            setattr(game, name, value)
+
+
+def test_merge_worker_caches_folds_and_removes_copies(shared_caches):
+    def worker0():
+        assert game.LLM_CACHE.get("shared") == "共用"   # 共用的那份當 fallback
+        game.LLM_CACHE.put("k0", "零")
+        game.MAJOR_MEMO.put("哲學系", "文組")
+        game.RESPONSE_CACHE.get("style", "考得怎樣", "還好啦")
+        game.NOTE_LIBRARY.add(NOTE_A, "tag")
+
+    def worker1():
+        game.LLM_CACHE.put("k1", "一")
+        game.RESPONSE_CACHE.put("style", "考得怎樣", "很好啊", {"hp": -5})
+        game.NOTE_LIBRARY.add(NOTE_A, "tag")
+        game.NOTE_LIBRARY.add(NOTE_B, "tag")
+
+    _as_worker(0, shared_caches, worker0)
+    _as_worker(1, shared_caches, worker1)
+    # 上一次（worker 數不同）留下來的檔案也要一起併掉
+    llm_cache.LLMCache(supervisor.worker_path(game.LLM_CACHE.path, 7)).put("k7", "七")
+
+    supervisor.Supervisor(workers=2, pool_path=None).merge_worker_caches()
+
+    llm = llm_cache.LLMCache(game.LLM_CACHE.path)
+    assert llm.items() == {"shared": "共用", "k0": "零", "k1": "一", "k7": "七"}
+    assert llm_cache.LLMCache(game.MAJOR_MEMO.path).items() == {"哲學系": "文組"}
+    entries = {e[2]: e[4] for e in response_cache.ResponseCache(game.RESPONSE_CACHE.path).entries()}
+    assert entries == {"還好啦": 2, "很好啊": 1}
+    hits = {r["text"]: r["hits"] for r in note_library.NoteLibrary(game.NOTE_LIBRARY.path).records()}
+    # 兩個 worker 各多寫一次 A：基準 1 + 1 + 1
+    assert hits == {NOTE_A: 3, NOTE_B: 1}
+    for obj in shared_caches.values():
+        assert supervisor.worker_files(obj.path) == []
+
+
+class FakeProc:
+    def __init__(self, alive=True, exitcode=None):
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.alive
+
+
+def test_collect_stops_waiting_for_dead_worker(monkeypatch, capsys):
+    monkeypatch.setattr(supervisor, "WORKER_POLL_SECONDS", 0.01)
+    outbox = queue.Queue()
+    outbox.put({"session_id": "p1", "worker": 0, "ok": True})
+    outbox.put({"worker": 0, "done": True})
+    procs = [FakeProc(), FakeProc(alive=False, exitcode=-9)]
+    results = supervisor.Supervisor(workers=2, pool_path=None)._collect(procs, outbox)
+    assert [r["session_id"] for r in results] == ["p1"]
+    assert "worker 1 意外結束（exitcode -9）" in capsys.readouterr().out
+
+
+def test_session_io_keeps_threads_apart(monkeypatch):
+    real_out = io.StringIO()
+    monkeypatch.setattr(sys, "stdin", io.StringIO("終端機\n"))
+    monkeypatch.setattr(sys, "stdout", real_out)
+    outputs = {}
+
+    def player(name):
+        with session_io.bind(session_io.ScriptedInput([f"{name}的答案"])) as out:
+            answer = input(f"{name}請回答：")
+            print(f"{name}收到：{answer}")
+            with pytest.raises(EOFError):
+                input()
+        outputs[name] = out.getvalue()
+
+    threads = [threading.Thread(target=player, args=(n,)) for n in ("甲", "乙")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    # 沒綁定的執行緒照常走真正的 stdin / stdout
+    print("主執行緒")
+    assert input() == "終端機"
+
+    assert outputs["甲"] == "甲請回答：甲收到：甲的答案\n"
+    assert outputs["乙"] == "乙請回答：乙收到：乙的答案\n"
+    assert real_out.getvalue() == "主執行緒\n"
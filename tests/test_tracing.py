@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+import game
+import metrics
+import tracing
+
+
+@pytest.fixture
+def ring():
+    tracing.configure("ring")
+    tracing._ring.clear()
+    yield tracing.recent
+    tracing.configure(None)
+    tracing._ring.clear()
+
+
+def _by_name(records):
+    return {r["name"]: r for r in records}
+
+
+def test_disabled_span_is_noop():
+    tracing.configure(None)
+    with tracing.span("x") as sp:
+        sp.set(a=1)
+    assert tracing.span("y") is tracing.span("z")
+    fn = lambda: None  # noqa: E731
+    assert tracing.bind_context(fn) is fn
+
+
+def test_nested_spans_share_trace(ring):
+    with tracing.span("stage", turn=1):
+        with tracing.span("llm.call", site="s") as inner:
+            tracing.annotate(parse="clean")
+            assert tracing.inherited("turn") == 1
+        inner_id = inner.span_id
+    with tracing.span("save_state"):
+        pass
+    spans = _by_name(ring())
+    stage, call, save = spans["stage"], spans["llm.call"], spans["save_state"]
+    assert stage["parent"] is None and stage["trace"] == stage["id"]
+    assert call["id"] == inner_id
+    assert call["parent"] == stage["id"] and call["trace"] == stage["trace"]
+    assert call["parse"] == "clean"
+    # 另一個最外層的 span 開新的 trace
+    assert save["parent"] is None and save["trace"] == save["id"] != stage["trace"]
+
+
+def test_span_records_error(ring):
+    with pytest.raises(KeyError):
+        with tracing.span("boom"):
+            raise KeyError("x")
+    assert ring()[-1]["error"] == "KeyError"
+
+
+def test_bind_context_parents_spans_in_other_threads(ring):
+    def work():
+        with tracing.span("speculate"):
+            pass
+
+    with tracing.span("stage", turn=3):
+        thread = threading.Thread(target=tracing.bind_context(work), name="spec-1")
+        thread.start()
+        thread.join(5)
+        # 沒綁定的背景工作不掛在關卡底下
+        plain = threading.Thread(target=work)
+        plain.start()
+        plain.join(5)
+    spans = ring()
+    stage = _by_name(spans)["stage"]
+    bound, unbound = [s for s in spans if s["name"] == "speculate"]
+    assert bound["parent"] == stage["id"] and bound["trace"] == stage["trace"]
+    assert bound["thread"] == "spec-1"
+    assert unbound["parent"] is None
+
+
+def test_flame_by_stage_groups_paths():
+    spans = [
+        {"name": "stage", "id": "1", "parent": None, "turn": 3, "chapter": "工作", "dur_ms": 100.0},
+        {"name": "llm.json", "id": "2", "parent": "1", "dur_ms": 60.0},
+        {"name": "llm.call", "id": "3", "parent": "2", "site": "generate_job_options", "dur_ms": 55.0},
+        {"name": "llm.call", "id": "4", "parent": "1", "site": "generate_outcome_text", "dur_ms": 30.0},
+        {"name": "llm.call", "id": "5", "parent": "1", "site": "generate_outcome_text", "dur_ms": 10.0},
+        {"name": "save_state", "id": "6", "parent": None, "dur_ms": 5.0},
+    ]
+    groups = tracing.flame_by_stage(spans)
+    assert groups["第 3 關 工作"] == {
+        (): [100.0, 1],
+        ("llm.json",): [60.0, 1],
+        ("llm.json", "llm.call[generate_job_options]"): [55.0, 1],
+        ("llm.call[generate_outcome_text]",): [40.0, 2],
+    }
+    assert groups["關卡外"] == {("save_state",): [5.0, 1]}
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    monkeypatch.setattr(game, "LLM_BACKEND", lambda **kw: {"choices": [{"message": {"content": " 好 "}}]})
+    sites = []
+    real = tracing.call_site
+
+    def counting(skip=()):
+        sites.append(real(tuple(skip) + ("counting",)))
+        return sites[-1]
+
+    monkeypatch.setattr(tracing, "call_site", counting)
+    return sites
+
+
+def test_call_site_skipped_when_nobody_watches(stub_backend, monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    tracing.configure(None)
+    assert game.call_llm("系統", "問題") == "好"
+    assert stub_backend == []
+
+
+def ask_from_named_site():
+    return game.call_llm_json("系統", "問題")
+
+
+def test_call_site_recorded_when_tracing(stub_backend, ring, monkeypatch):
+    monkeypatch.setattr(game, "LLM_BACKEND", lambda **kw: {"choices": [{"message": {"content": "{}"}}]})
+    assert ask_from_named_site() == {}
+    assert stub_backend == ["ask_from_named_site"]
+    assert _by_name(ring())["llm.call"]["site"] == "ask_from_named_site"
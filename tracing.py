@@ -0,0 +1,305 @@
+"""
+結構化追蹤：關卡、LLM 呼叫、存檔各自一個 span
+
+一輪遊戲慢，可能慢在 call_llm、call_llm_json 的 JSON 修補、親戚稱謂題的重出，
+或 save_state 的磁碟 I/O。這裡把每一段包成 span（名稱、開始時間、耗時、屬性、父 span），
+結束時丟進記憶體 ring buffer，並可另外寫成 JSONL。
+
+開關（環境變數 GAME_TRACE，或程式裡呼叫 configure）：
+  GAME_TRACE=ring           只保留在 ring buffer（recent() 取回）
+  GAME_TRACE=<檔案.jsonl>   ring buffer + 寫檔
+沒開時 span() 直接回傳同一個什麼都不做的物件，成本只有一次全域變數判斷。
+
+報表：
+  python tracing.py report <trace.jsonl> [--top 12]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+TRACE_ENV = "GAME_TRACE"
+RING_SIZE = 4096
+
+_enabled = False
+_ring: deque = deque(maxlen=RING_SIZE)
+_export_file = None
+_export_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+_PID = os.getpid()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Span:
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "trace_id", "start", "_t0")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self.span_id = f"{_PID}.{next(_ids)}"
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur_ms = (time.perf_counter() - self._t0) * 1000
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        record = {
+            "name": self.name,
+            "trace": self.trace_id,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "start": round(self.start, 6),
+            "dur_ms": round(dur_ms, 3),
+            "thread": threading.current_thread().name,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        _emit(record)
+        return False
+
+
+def _emit(record: Dict[str, Any]):
+    _ring.append(record)
+    if _export_file is not None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with _export_lock:
+            _export_file.write(line)
+            _export_file.flush()
+
+
+# ======== 對外 API ========
+
+def configure(target: Optional[str]):
+    """None / "" 關閉；"ring" 只留記憶體；其他字串當成 JSONL 輸出路徑"""
+    global _enabled, _export_file
+    with _export_lock:
+        if _export_file is not None:
+            _export_file.close()
+            _export_file = None
+        _enabled = bool(target)
+        if target and target != "ring":
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            _export_file = open(target, "a", encoding="utf-8")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attrs):
+    """with tracing.span("save_state", fmt="json") as s: ... s.set(bytes=123)"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def annotate(**attrs):
+    """替目前這條執行緒最內層的 span 補屬性（沒開或不在 span 裡就什麼都不做）"""
+    if not _enabled:
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].attrs.update(attrs)
+
+
+def inherited(key: str, default: Any = None) -> Any:
+    """由內往外找目前 span 鏈上第一個有 key 的屬性（例如重試的 attempt）"""
+    for sp in reversed(_stack()):
+        if key in sp.attrs:
+            return sp.attrs[key]
+    return default
+
+
+def bind_context(fn):
+    """
+    讓丟到背景執行緒的工作（推測式旁白、分關回顧）掛回目前的 span 底下。
+    沒開追蹤時原封不動回傳 fn。
+    """
+    if not _enabled:
+        return fn
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    if parent is None:
+        return fn
+
+    def _run(*args, **kwargs):
+        inner = _stack()
+        inner.append(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            inner.remove(parent)
+
+    return _run
+
+
+def call_site(skip: tuple = ()) -> str:
+    """往上找第一個不在 skip 裡的函式名稱，當成 LLM 呼叫的來源（指標也會用到）"""
+    frame = sys._getframe(1)
+    while frame is not None and (frame.f_code.co_name in skip
+                                 or frame.f_globals.get("__name__") == __name__):
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "?"
+
+
+def recent() -> List[Dict[str, Any]]:
+    return list(_ring)
+
+
+configure(os.environ.get(TRACE_ENV, "").strip() or None)
+
+
+# ======== 報表 ========
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue  # 寫到一半的最後一行
+    return spans
+
+
+def _label(record: Dict[str, Any]) -> str:
+    if record["name"] == "llm.call":
+        return f"llm.call[{record.get('site', '?')}]"
+    return record["name"]
+
+
+def flame_by_stage(spans: List[Dict[str, Any]]) -> Dict[str, Dict[tuple, List[float]]]:
+    """
+    依所屬關卡分組，把每個 span 的耗時累加到「從關卡 span 往下的名稱路徑」上。
+    回傳 {分組: {路徑: [總耗時 ms, 次數]}}；關卡 span 本身的路徑是 ()，
+    不在任何關卡底下的 span 歸到「關卡外」。
+    """
+    by_id = {s["id"]: s for s in spans}
+    groups: Dict[str, Dict[tuple, List[float]]] = {}
+    for record in spans:
+        path = []
+        group = "關卡外"
+        node = record
+        while node is not None:
+            if node["name"] == "stage":
+                group = f"第 {node.get('turn')} 關 {node.get('chapter', '')}".strip()
+                break
+            path.append(_label(node))
+            node = by_id.get(node.get("parent"))
+        acc = groups.setdefault(group, {}).setdefault(tuple(reversed(path)), [0.0, 0])
+        acc[0] += record["dur_ms"]
+        acc[1] += 1
+    return groups
+
+
+def print_report(spans: List[Dict[str, Any]], top: int = 12, width: int = 30):
+    groups = flame_by_stage(spans)
+    for group in sorted(groups, key=lambda g: (g == "關卡外", g)):
+        paths = groups[group]
+        children: Dict[tuple, List[tuple]] = {}
+        for key in paths:
+            if key:
+                children.setdefault(key[:-1], []).append(key)
+        total_ms, total_n = paths.get((), [0.0, 0])
+        if not total_n:
+            total_ms = sum(paths[k][0] for k in children.get((), []))
+        head = f"===== {group}：總計 {total_ms:.1f} ms"
+        if total_n:
+            head += f"，{total_n} 次，平均 {total_ms / total_n:.1f} ms"
+        print(head + " =====")
+
+        lines = []
+
+        def walk(key: tuple):
+            for child in sorted(children.get(key, []), key=lambda k: -paths[k][0]):
+                if len(lines) >= top:
+                    return
+                ms, count = paths[child]
+                self_ms = ms - sum(paths[c][0] for c in children.get(child, []))
+                # 推測式旁白等背景工作跟關卡本身是平行跑的，加總可能超過關卡耗時
+                share = min(1.0, ms / total_ms) if total_ms else 0.0
+                lines.append(f"{'  ' * (len(child) - 1)}{child[-1]:<36} {ms:9.1f} ms  {count:4d} 次  "
+                             f"self {max(0.0, self_ms):8.1f}  {'█' * max(1, int(share * width))}")
+                walk(child)
+
+        walk(())
+        for line in lines:
+            print(line)
+        print()
+
+    llm = [s for s in spans if s["name"] == "llm.call"]
+    if llm:
+        print("===== LLM 呼叫（依來源） =====")
+        by_site: Dict[str, List[float]] = {}
+        for s in llm:
+            acc = by_site.setdefault(s.get("site", "?"), [0, 0.0, 0, 0, 0])
+            acc[0] += 1
+            acc[1] += s["dur_ms"]
+            acc[2] += int(s.get("prompt_tokens") or 0)
+            acc[3] += int(s.get("completion_tokens") or 0)
+            acc[4] += 1 if s.get("cached") else 0
+        for site, (n, ms, p_tok, c_tok, cached) in sorted(by_site.items(), key=lambda kv: -kv[1][1]):
+            print(f"{site:<32} {n:4d} 次  {ms:9.1f} ms  平均 {ms / n:7.1f} ms  "
+                  f"tokens {p_tok}/{c_tok}  快取 {cached}")
+        outcomes: Dict[str, int] = {}
+        for s in spans:
+            if s["name"] == "llm.json":
+                outcomes[s.get("parse", "?")] = outcomes.get(s.get("parse", "?"), 0) + 1
+        if outcomes:
+            print("JSON 解析結果：" + "、".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追蹤報表")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_report = sub.add_parser("report", help="依關卡印出火焰圖式的耗時拆解")
+    p_report.add_argument("path")
+    p_report.add_argument("--top", type=int, default=12, help="每關最多列幾列")
+    args = parser.parse_args()
+    if args.cmd == "report":
+        print_report(load_spans(args.path), top=args.top)
+
+
+if __name__ == "__main__":
+    main()